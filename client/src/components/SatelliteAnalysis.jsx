@@ -1,4 +1,4 @@
-import { useState } from 'react'
+import { useState, useEffect } from 'react'
 import { motion, AnimatePresence } from 'framer-motion'
 import { toast } from 'react-hot-toast'
 import axios from 'axios'
@@ -62,18 +62,52 @@ const SatelliteAnalysis = () => {
       if (dateBefore) formData.append('date_before', dateBefore)
       if (dateAfter) formData.append('date_after', dateAfter)
 
-      const response = await axios.post(`${API_URL}/api/satellite/analyze`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-        timeout: 180000, // 3 minutes
+      // Stage events arrive as Server-Sent Events while the analysis runs
+      const response = await fetch(`${API_URL}/api/satellite/analyze/stream`, {
+        method: 'POST',
+        body: formData,
       })
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}))
+        throw new Error(body.detail || 'Analysis failed')
+      }
 
-      setResults(response.data)
-      toast.success('Analysis complete!', { id: loadingToast })
+      const stageMessages = {
+        bands_loaded: 'Images loaded, running the model...',
+        inference_done: 'Model done, computing environmental indices...',
+        report_ready: 'Report ready, rendering visualization...',
+        visualization_ready: 'Visualization ready, saving results...',
+      }
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let finished = false
+      while (!finished) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const messages = buffer.split('\n\n')
+        buffer = messages.pop()
+        for (const message of messages) {
+          const event = message.match(/^event: (.*)$/m)?.[1]
+          const data = JSON.parse(message.match(/^data: (.*)$/m)?.[1] || 'null')
+          if (stageMessages[event]) {
+            toast.loading(stageMessages[event], { id: loadingToast })
+          } else if (event === 'complete') {
+            setResults(data)
+            toast.success('Analysis complete!', { id: loadingToast })
+            finished = true
+          } else if (event === 'error') {
+            throw new Error(data.detail)
+          }
+        }
+      }
+      // The explanation is fetched by the results view
+      reader.cancel()
+      if (!finished) throw new Error('Analysis stream ended early')
     } catch (error) {
       console.error('Analysis error:', error)
-      toast.error(error.response?.data?.detail || 'Analysis failed', { id: loadingToast })
+      toast.error(error.message || 'Analysis failed', { id: loadingToast })
     } finally {
       setIsAnalyzing(false)
     }
@@ -254,10 +288,36 @@ const SatelliteAnalysis = () => {
 // Results View Component
 const ResultsView = ({ results, onReset, apiUrl }) => {
   const { data, analysis_id, location, processing_time, mode } = results
-  const { metadata, vegetation_analysis, urban_analysis, water_analysis, summary, llm_explanations } = data
+  const { metadata, vegetation_analysis, urban_analysis, water_analysis, summary } = data
+  const [llm_explanations, setLlmExplanations] = useState(data.llm_explanations || null)
 
   const imageUrl = `${apiUrl}/api/satellite/results/${analysis_id}/image`
 
+  // Explanations are generated after the analysis returns; long-poll until ready
+  useEffect(() => {
+    if (llm_explanations) return
+    let cancelled = false
+    const poll = async () => {
+      while (!cancelled) {
+        try {
+          const response = await axios.get(
+            `${apiUrl}/api/satellite/results/${analysis_id}/explanation`,
+            { params: { wait: 20 }, timeout: 60000 }
+          )
+          if (response.data.status === 'ready') {
+            if (!cancelled) setLlmExplanations(response.data.explanations)
+            return
+          }
+        } catch (error) {
+          console.error('Explanation error:', error)
+          return
+        }
+      }
+    }
+    poll()
+    return () => { cancelled = true }
+  }, [analysis_id])
+
   return (
     <motion.div
       initial={{ opacity: 0 }}
@@ -0,0 +1,206 @@
+"""
+Admission control for analysis requests
+Each request reserves its estimated peak memory against a budget; requests that
+do not fit wait in a bounded FIFO queue and are rejected with Retry-After when
+the queue is full or the wait takes too long
+"""
+
+import asyncio
+import collections
+import math
+import os
+import time
+
+import rasterio
+from PIL import Image
+
+import config
+import metrics
+
+MB = 1024 * 1024
+
+
+class AdmissionRejected(Exception):
+    """Request not admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, status_code, detail, retry_after=None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def raster_size(file):
+    """
+    (height, width) of an uploaded image from its header, without decoding pixels
+
+    Args:
+        file: Readable binary file object (UploadFile.file); left at position 0
+    """
+    try:
+        with Image.open(file) as img:  # lazy: only the header is parsed
+            width, height = img.size
+    except Exception:
+        # Formats Pillow cannot parse (e.g. some compressed GeoTIFFs)
+        file.seek(0)
+        with rasterio.open(file) as src:
+            height, width = src.height, src.width
+    file.seek(0)
+    return height, width
+
+
+def estimate_analysis_bytes(height, width, tta=False, tile_size=None, batch_size=None):
+    """
+    Estimated peak memory of one analysis of a (height, width) scene pair
+
+    Scene-sized arrays (both band stacks, spectral indices, model outputs,
+    masks and visualization buffers) cost config.ADMISSION_BYTES_PER_PIXEL per
+    pixel. Model activations cost config.ADMISSION_MODEL_BYTES_PER_PIXEL per
+    pixel inferred at once: the whole scene, or one batch of tiles when tiling.
+    """
+    tile_size = config.INFERENCE_TILE_SIZE if tile_size is None else tile_size
+    batch_size = batch_size or config.INFERENCE_BATCH_SIZE
+    pixels = height * width
+    inferred_at_once = pixels if not tile_size else min(pixels, tile_size * tile_size * batch_size)
+    if tta:
+        inferred_at_once *= 8  # all flip/rot90 variants go through in one batch
+    return int(config.ADMISSION_BASE_MB * MB
+               + pixels * config.ADMISSION_BYTES_PER_PIXEL
+               + inferred_at_once * config.ADMISSION_MODEL_BYTES_PER_PIXEL)
+
+
+def default_memory_budget():
+    """config.ADMISSION_MEMORY_BUDGET_MB, or half of physical memory when unset"""
+    if config.ADMISSION_MEMORY_BUDGET_MB > 0:
+        return int(config.ADMISSION_MEMORY_BUDGET_MB * MB)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (ValueError, OSError, AttributeError):
+        return 4096 * MB
+
+
+class Ticket:
+    """Memory reserved for one admitted request; release() exactly once when done"""
+
+    def __init__(self, controller, cost):
+        self._controller = controller
+        self.cost = cost
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """Memory-budgeted admission with a bounded FIFO wait queue (one per API process)"""
+
+    def __init__(self, budget_bytes=None, max_queue=None, max_wait_seconds=None):
+        """
+        Args:
+            budget_bytes: Memory that admitted requests may reserve in total
+                          (default: default_memory_budget())
+            max_queue: Requests allowed to wait for memory (default: config.ADMISSION_QUEUE_SIZE)
+            max_wait_seconds: Longest wait before a 503 (default: config.ADMISSION_MAX_WAIT_SECONDS)
+        """
+        self.budget_bytes = budget_bytes or default_memory_budget()
+        self.max_queue = config.ADMISSION_QUEUE_SIZE if max_queue is None else max_queue
+        self.max_wait_seconds = max_wait_seconds or config.ADMISSION_MAX_WAIT_SECONDS
+        self.reserved_bytes = 0
+        self.running = 0
+        self._waiters = collections.deque()
+        # Moving average of analysis duration, for Retry-After
+        self._avg_seconds = 30.0
+
+    def _retry_after(self):
+        """Seconds until a new request would likely get in"""
+        ahead = len(self._waiters) + 1
+        return max(1, min(300, math.ceil(self._avg_seconds * ahead / max(1, self.running))))
+
+    def _update_metrics(self):
+        metrics.set_admission_state(self.reserved_bytes, len(self._waiters))
+
+    async def admit(self, cost):
+        """
+        Wait until cost bytes fit in the budget
+
+        Returns:
+            Ticket to release when the analysis is finished
+
+        Raises:
+            AdmissionRejected: 413 if the request can never fit, 429 if the wait
+                               queue is full, 503 if the wait timed out
+        """
+        if cost > self.budget_bytes:
+            metrics.record_admission_rejected('too_large')
+            raise AdmissionRejected(
+                413,
+                f"Estimated memory {cost / MB:.0f} MB exceeds the budget of "
+                f"{self.budget_bytes / MB:.0f} MB; use smaller scenes or enable tiling"
+            )
+
+        if not self._waiters and self.reserved_bytes + cost <= self.budget_bytes:
+            return self._grant(cost)
+
+        if len(self._waiters) >= self.max_queue:
+            metrics.record_admission_rejected('queue_full')
+            raise AdmissionRejected(429, "Too many analyses queued, retry later", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (cost, waiter)
+        self._waiters.append(entry)
+        self._update_metrics()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return waiter.result()  # granted just as the wait expired
+            metrics.record_admission_rejected('timeout')
+            raise AdmissionRejected(503, "Server busy, retry later", self._retry_after())
+        except asyncio.CancelledError:
+            # Client went away; hand back memory granted in the meantime
+            if waiter.done() and not waiter.cancelled():
+                waiter.result().release()
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                self._update_metrics()
+                self._wake()
+
+    def _grant(self, cost):
+        self.reserved_bytes += cost
+        self.running += 1
+        self._update_metrics()
+        return Ticket(self, cost)
+
+    def _release(self, ticket):
+        self.reserved_bytes -= ticket.cost
+        self.running -= 1
+        elapsed = time.monotonic() - ticket.admitted_at
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+        self._update_metrics()
+        self._wake()
+
+    def _wake(self):
+        """Admit waiters in FIFO order while the one at the head fits"""
+        while self._waiters:
+            cost, waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if self.reserved_bytes + cost > self.budget_bytes:
+                break
+            self._waiters.popleft()
+            waiter.set_result(self._grant(cost))
+
+    def status(self):
+        return {
+            "budget_mb": self.budget_bytes / MB,
+            "reserved_mb": self.reserved_bytes / MB,
+            "running": self.running,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue
+        }
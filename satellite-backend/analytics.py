@@ -0,0 +1,361 @@
+"""
+Columnar analytics store of analysis reports
+Every finished analysis becomes one flat row (metrics and stage timings) in a
+Parquet dataset partitioned by location and month, so fleet-level statistics
+read a few column chunks instead of thousands of JSON files
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+import config
+from regions import KINDS
+from spatial_index import normalise_date
+
+# Numeric report fields that become columns (names are unique across sections)
+METRIC_FIELDS = {
+    'vegetation_analysis': ['vegetation_increase_percent', 'vegetation_decrease_percent',
+                            'vegetation_stable_percent', 'mean_ndvi_change', 'mean_savi_change',
+                            'max_vegetation_gain', 'max_vegetation_loss'],
+    'urban_analysis': ['urbanization_percent', 'deurbanization_percent', 'urban_stable_percent',
+                       'construction_area_km2', 'demolition_area_km2', 'mean_ndbi_change'],
+    'water_analysis': ['water_increase_percent', 'water_decrease_percent', 'water_gain_area_km2',
+                       'water_loss_area_km2', 'mean_ndwi_change'],
+    'data_quality': ['total_pixels', 'valid_pixels', 'valid_pixel_percent'],
+    'model_predictions': ['total_change_percent', 'vegetation_increase_pixels',
+                          'vegetation_decrease_pixels', 'urban_construction_pixels',
+                          'urban_demolition_pixels'],
+    'thresholds': ['index_change', 'change_probability']
+}
+TILE_FIELDS = ['spectral_change_tiles', 'clouded_tiles', 'outside_roi_tiles', 'skipped_percent']
+# Top-level profiler stages (predict.py); each gets a <stage>_ms column
+STAGES = ['band_load', 'indices', 'cloud_mask', 'tile_selection', 'coarse_pass', 'inference',
+          'report', 'regions', 'visualization', 'disk_write', 'llm']
+PARTITIONS = ['location', 'month']
+
+
+def _build_schema():
+    fields = [
+        ('analysis_id', pa.string()),
+        ('created', pa.timestamp('s')),
+        ('date_before', pa.string()),
+        ('date_after', pa.string()),
+        ('tasks', pa.string()),
+        ('tta', pa.bool_()),
+        ('model_version', pa.string()),
+        ('processing_time_s', pa.float64()),
+        ('crs', pa.string()),
+        ('min_lon', pa.float64()),
+        ('min_lat', pa.float64()),
+        ('max_lon', pa.float64()),
+        ('max_lat', pa.float64())
+    ]
+    for names in METRIC_FIELDS.values():
+        fields += [(name, pa.float64()) for name in names]
+    fields += [(f'tile_{name}', pa.float64()) for name in TILE_FIELDS]
+    fields.append(('region_count', pa.int64()))
+    for kind in KINDS:
+        fields += [(f'region_{kind}_count', pa.int64()), (f'region_{kind}_area_m2', pa.float64())]
+    fields += [(f'{stage}_ms', pa.float64()) for stage in STAGES]
+    fields.append(('peak_rss_mb', pa.float64()))
+    return pa.schema(fields)
+
+
+if PYARROW_AVAILABLE:
+    # Columns stored in the files; location and month live in the directory names
+    SCHEMA = _build_schema()
+    PARTITION_SCHEMA = pa.schema([(name, pa.string()) for name in PARTITIONS])
+    STATS = {'count': pc.count, 'mean': pc.mean, 'min': pc.min, 'max': pc.max,
+             'sum': pc.sum, 'stddev': pc.stddev}
+
+
+def flatten_report(analysis_id, report, processing_time=None, created=None):
+    """
+    One flat row (SCHEMA columns plus location and month) from an analysis report
+
+    Args:
+        created: Analysis time (default: the report's analysis_date, else now)
+
+    Returns:
+        Dictionary of column values; missing metrics are None
+    """
+    metadata = report.get('metadata', {})
+    created = created or metadata.get('analysis_date')
+    created = datetime.fromisoformat(created) if isinstance(created, str) else (created or datetime.now())
+    date_before = normalise_date(metadata.get('date_before'))
+    date_after = normalise_date(metadata.get('date_after'))
+    model = report.get('model_predictions', {})
+    scene = report.get('footprint')
+    west, south, east, north = scene['bounds_wgs84'] if scene else (None,) * 4
+
+    row = {
+        'analysis_id': analysis_id,
+        'created': created.replace(microsecond=0),
+        'date_before': date_before,
+        'date_after': date_after,
+        'tasks': ','.join(model.get('tasks', [])) or None,
+        'tta': model.get('tta'),
+        'model_version': report.get('model', {}).get('version'),
+        'processing_time_s': processing_time,
+        'crs': scene['crs'] if scene else None,
+        'min_lon': west, 'min_lat': south, 'max_lon': east, 'max_lat': north,
+        'location': metadata.get('location') or 'Unknown',
+        # Month of the later image; the analysis time when the dates are unknown
+        'month': (date_after or date_before or created.strftime('%Y-%m-%d'))[:7]
+    }
+    for section, names in METRIC_FIELDS.items():
+        values = report.get(section, {})
+        for name in names:
+            row[name] = values.get(name)
+    tiles = model.get('tile_selection', {})
+    for name in TILE_FIELDS:
+        row[f'tile_{name}'] = tiles.get(name)
+
+    regions = report.get('regions', {})
+    row['region_count'] = regions.get('count')
+    for kind in KINDS:
+        by_kind = regions.get('by_kind', {}).get(kind)
+        row[f'region_{kind}_count'] = by_kind['count'] if by_kind else (0 if regions else None)
+        row[f'region_{kind}_area_m2'] = by_kind['area_m2'] if by_kind else (0.0 if regions else None)
+
+    profiling = report.get('profiling', {})
+    stages = profiling.get('stages', {})
+    for stage in STAGES:
+        row[f'{stage}_ms'] = stages[stage]['wall_ms'] if stage in stages else None
+    # Older reports recorded the process peak on every stage
+    peaks = [entry['peak_rss_mb'] for entry in stages.values() if entry.get('peak_rss_mb') is not None]
+    row['peak_rss_mb'] = profiling.get('peak_rss_mb', max(peaks) if peaks else None)
+    return row
+
+
+class AnalyticsStore:
+    """Append-only Parquet dataset (hive layout: location=<name>/month=<YYYY-MM>/*.parquet)"""
+
+    def __init__(self, root=None, compact_files=None):
+        """
+        Args:
+            root: Dataset folder (default: config.ANALYTICS_DIR)
+            compact_files: A partition with more files than this is merged into
+                           one file (default: config.ANALYTICS_COMPACT_FILES)
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("Please install: pip install pyarrow")
+        self.root = root or config.ANALYTICS_DIR
+        self.compact_files = config.ANALYTICS_COMPACT_FILES if compact_files is None else compact_files
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _partition_dir(self, location, month):
+        return os.path.join(self.root, f"location={quote(location, safe='')}", f"month={month}")
+
+    def add(self, analysis_id, report, processing_time=None, created=None):
+        """
+        Append an analysis (re-adding the same id replaces its row)
+
+        Returns:
+            The flat row that was written
+        """
+        row = flatten_report(analysis_id, report, processing_time, created)
+        partition_dir = self._partition_dir(row['location'], row['month'])
+        table = pa.Table.from_pylist([{name: row[name] for name in SCHEMA.names}], schema=SCHEMA)
+        with self._lock:
+            os.makedirs(partition_dir, exist_ok=True)
+            path = os.path.join(partition_dir, f"{analysis_id}.parquet")
+            # Written under a hidden name (skipped by dataset discovery) then renamed
+            tmp_path = os.path.join(partition_dir, f".{analysis_id}.parquet.tmp")
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+            if self.compact_files and len(self._files(partition_dir)) > self.compact_files:
+                self._compact_partition(partition_dir)
+        return row
+
+    @staticmethod
+    def _files(partition_dir):
+        return [name for name in os.listdir(partition_dir)
+                if name.endswith('.parquet') and not name.startswith('.')]
+
+    def _compact_partition(self, partition_dir):
+        """Merge a partition's files into one; the latest row per analysis id wins"""
+        # Merged parts first, then single-analysis files in write order
+        names = sorted(self._files(partition_dir),
+                       key=lambda name: (not name.startswith('part-'),
+                                         os.path.getmtime(os.path.join(partition_dir, name))))
+        table = pa.concat_tables([
+            pq.read_table(os.path.join(partition_dir, name), schema=SCHEMA) for name in names
+        ])
+        ids = table.column('analysis_id').to_numpy(zero_copy_only=False)
+        # Index of the last occurrence of each id, in original order
+        _, last = np.unique(ids[::-1], return_index=True)
+        table = table.take(np.sort(len(ids) - 1 - last))
+
+        name = f"part-{uuid.uuid4().hex[:12]}.parquet"
+        tmp_path = os.path.join(partition_dir, f".{name}.tmp")
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, os.path.join(partition_dir, name))
+        for old in names:
+            os.remove(os.path.join(partition_dir, old))
+        return len(names)
+
+    def compact(self):
+        """
+        Merge the files of every partition
+
+        Returns:
+            Number of files merged
+        """
+        merged = 0
+        with self._lock:
+            for location_dir in os.listdir(self.root):
+                for month_dir in os.listdir(os.path.join(self.root, location_dir)):
+                    partition_dir = os.path.join(self.root, location_dir, month_dir)
+                    if len(self._files(partition_dir)) > 1:
+                        merged += self._compact_partition(partition_dir)
+        return merged
+
+    def dataset(self):
+        # The explicit schema fills columns added after older files were written with nulls
+        return ds.dataset(
+            self.root, format='parquet', schema=pa.unify_schemas([SCHEMA, PARTITION_SCHEMA]),
+            partitioning=ds.HivePartitioning(PARTITION_SCHEMA, segment_encoding='uri')
+        )
+
+    def count(self):
+        return self.dataset().count_rows()
+
+    def query(self, metrics, stats=('count', 'mean'), group_by=(), location=None,
+              start=None, end=None):
+        """
+        Aggregate statistics of numeric columns
+
+        Args:
+            metrics: Column names (see SCHEMA)
+            stats: Any of count, mean, min, max, sum, stddev
+            group_by: Columns to group on (e.g. location, month, tasks)
+            location: Only this location
+            start, end: Dates (YYYY-MM-DD or YYYY-MM); rows whose later image
+                        falls in start..end match (the analysis month when undated)
+
+        Returns:
+            Dictionary with the number of matching analyses and one row per group
+            with <metric>_<stat> values
+        """
+        if not metrics:
+            raise ValueError("At least one metric is required")
+        columns = set(SCHEMA.names) | set(PARTITIONS)
+        for name in list(metrics) + list(group_by):
+            if name not in columns:
+                raise ValueError(f"Unknown column: {name}")
+        for name in metrics:
+            if name in PARTITIONS or not (pa.types.is_integer(SCHEMA.field(name).type)
+                                          or pa.types.is_floating(SCHEMA.field(name).type)):
+                raise ValueError(f"Column is not numeric: {name}")
+        for stat in stats:
+            if stat not in STATS:
+                raise ValueError(f"Unknown statistic: {stat} (use {', '.join(STATS)})")
+
+        # Partition filters prune whole directories before any file is opened
+        expression = None
+        conditions = []
+        if location:
+            conditions.append(ds.field('location') == location)
+        start_day, end_day = self._period_bound(start, '01'), self._period_bound(end, '31')
+        if start_day:
+            conditions.append(ds.field('month') >= start_day[:7])
+            conditions.append(ds.field('date_after').is_null() | (ds.field('date_after') >= start_day))
+        if end_day:
+            conditions.append(ds.field('month') <= end_day[:7])
+            conditions.append(ds.field('date_after').is_null() | (ds.field('date_after') <= end_day))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        table = self.dataset().to_table(
+            columns=sorted(set(metrics) | set(group_by) | {'date_after'}), filter=expression
+        )
+        if group_by:
+            result = table.group_by(list(group_by)).aggregate(
+                [(metric, stat) for metric in metrics for stat in stats]
+            ).sort_by([(name, 'ascending') for name in group_by])
+            rows = result.to_pylist()
+        else:
+            rows = [{f'{metric}_{stat}': STATS[stat](table.column(metric)).as_py()
+                     for metric in metrics for stat in stats}]
+        return {'analyses': table.num_rows, 'groups': rows}
+
+    @staticmethod
+    def _period_bound(value, day):
+        """YYYY-MM-DD from a date or YYYY-MM (first or last day of the month)"""
+        if not value:
+            return None
+        value = str(value).strip()
+        if len(value) == 7 and value[4] == '-':
+            return f"{value}-{day}"
+        return normalise_date(value)
+
+    def rebuild(self, upload_dir):
+        """
+        Add every finished analysis saved under the API upload folder
+
+        Returns:
+            Number of analyses added
+        """
+        added = 0
+        for entry in sorted(os.listdir(upload_dir)):
+            response_path = os.path.join(upload_dir, entry, 'response.json')
+            if not os.path.exists(response_path):
+                continue
+            with open(response_path) as f:
+                response = json.load(f)
+            if response.get('status') != 'success':
+                continue
+            self.add(response['analysis_id'], response['data'], response.get('processing_time'))
+            added += 1
+        return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild, compact or query the analytics dataset')
+    parser.add_argument('--root', default=config.ANALYTICS_DIR, help='Dataset folder')
+    parser.add_argument('--rebuild', metavar='UPLOADS',
+                        help='Add every analysis under this API upload folder (e.g. backend/uploads)')
+    parser.add_argument('--compact', action='store_true', help='Merge the files of every partition')
+    parser.add_argument('--metric', action='append', default=[], help='Column to aggregate (repeatable)')
+    parser.add_argument('--stats', default='count,mean,min,max')
+    parser.add_argument('--group-by', default='', help='Comma-separated columns, e.g. location,month')
+    parser.add_argument('--location')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.root)
+    if args.rebuild:
+        print(f"✅ Added {store.rebuild(args.rebuild)} analyses to {args.root}")
+    if args.compact:
+        print(f"✅ Merged {store.compact()} files")
+    if args.metric:
+        query_start = time.perf_counter()
+        result = store.query(args.metric, args.stats.split(','),
+                             [name for name in args.group_by.split(',') if name],
+                             args.location, args.start, args.end)
+        print(json.dumps(result, indent=2, default=str))
+        print(f"⏱️  {(time.perf_counter() - query_start) * 1000:.1f} ms over {result['analyses']} analyses")
+
+
+if __name__ == '__main__':
+    main()
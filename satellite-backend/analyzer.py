@@ -6,6 +6,9 @@ import rasterio
 from datetime import datetime
 import json
 
+import config
+from histograms import QuantizedHistogram, RANGES
+
 class EnvironmentalAnalyzer:
     def __init__(self):
         # Sentinel-2 band wavelengths (nm)
@@ -55,75 +58,171 @@ class EnvironmentalAnalyzer:
             'savi': savi
         }
     
-    def analyze_vegetation_change(self, indices1, indices2):
-        """Analyze vegetation changes"""
-        ndvi_diff = indices2['ndvi'] - indices1['ndvi']
-        savi_diff = indices2['savi'] - indices1['savi']
+    @staticmethod
+    def combine_masks(*masks):
+        """Pixels usable under every given mask (None entries are ignored), or None"""
+        masks = [mask for mask in masks if mask is not None]
+        if not masks:
+            return None
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+    
+    def _valid(self, values, valid_mask):
+        """Flatten values to the usable pixels only"""
+        return values.ravel() if valid_mask is None else values[valid_mask]
+    
+    def _stat(self, fn, values):
+        """Apply a reduction, returning 0.0 when no pixel is usable"""
+        return float(fn(values)) if values.size else 0.0
+    
+    def _vegetation_figures(self, increase, decrease, total):
+        """Percentages from pixel counts (shared with rethreshold)"""
+        total_pixels = max(total, 1)
+        return {
+            'vegetation_increase_percent': (increase / total_pixels) * 100,
+            'vegetation_decrease_percent': (decrease / total_pixels) * 100,
+            'vegetation_stable_percent': ((total - increase - decrease) / total_pixels) * 100
+        }
+    
+    def _urban_figures(self, increase, decrease, total):
+        total_pixels = max(total, 1)
+        return {
+            'urbanization_percent': (increase / total_pixels) * 100,
+            'deurbanization_percent': (decrease / total_pixels) * 100,
+            'urban_stable_percent': ((total - increase - decrease) / total_pixels) * 100,
+            'construction_area_km2': (increase * 100) / 1e6,  # Assuming 10m resolution
+            'demolition_area_km2': (decrease * 100) / 1e6
+        }
+    
+    def _water_figures(self, increase, decrease, total):
+        total_pixels = max(total, 1)
+        return {
+            'water_increase_percent': (increase / total_pixels) * 100,
+            'water_decrease_percent': (decrease / total_pixels) * 100,
+            'water_gain_area_km2': (increase * 100) / 1e6,
+            'water_loss_area_km2': (decrease * 100) / 1e6
+        }
+    
+    def analyze_vegetation_change(self, indices1, indices2, valid_mask=None, threshold=None):
+        """Analyze vegetation changes (only over pixels in valid_mask when given)"""
+        threshold = config.INDEX_CHANGE_THRESHOLD if threshold is None else threshold
+        ndvi_diff = self._valid(indices2['ndvi'] - indices1['ndvi'], valid_mask)
+        savi_diff = self._valid(indices2['savi'] - indices1['savi'], valid_mask)
         
         # Classify changes
-        vegetation_increase = np.sum(ndvi_diff > 0.1)
-        vegetation_decrease = np.sum(ndvi_diff < -0.1)
-        vegetation_stable = np.sum(np.abs(ndvi_diff) <= 0.1)
-        
-        total_pixels = ndvi_diff.size
+        vegetation_increase = int(np.sum(ndvi_diff > threshold))
+        vegetation_decrease = int(np.sum(ndvi_diff < -threshold))
         
         return {
-            'vegetation_increase_percent': (vegetation_increase / total_pixels) * 100,
-            'vegetation_decrease_percent': (vegetation_decrease / total_pixels) * 100,
-            'vegetation_stable_percent': (vegetation_stable / total_pixels) * 100,
-            'mean_ndvi_change': float(np.mean(ndvi_diff)),
-            'mean_savi_change': float(np.mean(savi_diff)),
-            'max_vegetation_gain': float(np.max(ndvi_diff)),
-            'max_vegetation_loss': float(np.min(ndvi_diff))
+            **self._vegetation_figures(vegetation_increase, vegetation_decrease, ndvi_diff.size),
+            'mean_ndvi_change': self._stat(np.mean, ndvi_diff),
+            'mean_savi_change': self._stat(np.mean, savi_diff),
+            'max_vegetation_gain': self._stat(np.max, ndvi_diff),
+            'max_vegetation_loss': self._stat(np.min, ndvi_diff)
         }
     
-    def analyze_urban_change(self, indices1, indices2):
-        """Analyze urban/built-up area changes"""
-        ndbi_diff = indices2['ndbi'] - indices1['ndbi']
+    def analyze_urban_change(self, indices1, indices2, valid_mask=None, threshold=None):
+        """Analyze urban/built-up area changes (only over pixels in valid_mask when given)"""
+        threshold = config.INDEX_CHANGE_THRESHOLD if threshold is None else threshold
+        ndbi_diff = self._valid(indices2['ndbi'] - indices1['ndbi'], valid_mask)
         
         # Classify changes
-        urbanization = np.sum(ndbi_diff > 0.1)
-        deurbanization = np.sum(ndbi_diff < -0.1)
-        urban_stable = np.sum(np.abs(ndbi_diff) <= 0.1)
+        urbanization = int(np.sum(ndbi_diff > threshold))
+        deurbanization = int(np.sum(ndbi_diff < -threshold))
         
-        total_pixels = ndbi_diff.size
+        return {
+            **self._urban_figures(urbanization, deurbanization, ndbi_diff.size),
+            'mean_ndbi_change': self._stat(np.mean, ndbi_diff)
+        }
+    
+    def analyze_water_change(self, indices1, indices2, valid_mask=None, threshold=None):
+        """Analyze water body changes (only over pixels in valid_mask when given)"""
+        threshold = config.INDEX_CHANGE_THRESHOLD if threshold is None else threshold
+        ndwi_diff = self._valid(indices2['ndwi'] - indices1['ndwi'], valid_mask)
+        
+        water_increase = int(np.sum(ndwi_diff > threshold))
+        water_decrease = int(np.sum(ndwi_diff < -threshold))
         
         return {
-            'urbanization_percent': (urbanization / total_pixels) * 100,
-            'deurbanization_percent': (deurbanization / total_pixels) * 100,
-            'urban_stable_percent': (urban_stable / total_pixels) * 100,
-            'mean_ndbi_change': float(np.mean(ndbi_diff)),
-            'construction_area_km2': (urbanization * 100) / 1e6,  # Assuming 10m resolution
-            'demolition_area_km2': (deurbanization * 100) / 1e6
+            **self._water_figures(water_increase, water_decrease, ndwi_diff.size),
+            'mean_ndwi_change': self._stat(np.mean, ndwi_diff)
+        }
+    
+    def diff_histograms(self, indices1, indices2, valid_mask=None):
+        """
+        Quantized histograms of the NDVI, NDBI and NDWI differences over the
+        pixels in valid_mask, for rethreshold
+        """
+        return {
+            f'{name}_diff': QuantizedHistogram.from_values(
+                self._valid(indices2[name] - indices1[name], valid_mask), *RANGES[f'{name}_diff']
+            )
+            for name in ('ndvi', 'ndbi', 'ndwi')
         }
     
-    def analyze_water_change(self, indices1, indices2):
-        """Analyze water body changes"""
-        ndwi_diff = indices2['ndwi'] - indices1['ndwi']
+    def rethreshold(self, report, histograms, ndvi=None, ndbi=None, ndwi=None, change=None):
+        """
+        Recompute the threshold-dependent figures of a report from its histograms
         
-        water_increase = np.sum(ndwi_diff > 0.1)
-        water_decrease = np.sum(ndwi_diff < -0.1)
+        Args:
+            report: Report produced by generate_report (left unchanged)
+            histograms: Output of diff_histograms (or histograms.load_histograms)
+            ndvi, ndbi, ndwi: New |difference| thresholds (default: config.INDEX_CHANGE_THRESHOLD)
+            change: New change probability threshold (default: config.CHANGE_THRESHOLD),
+                    applied when the report has a change_probability histogram
         
-        total_pixels = ndwi_diff.size
+        Returns:
+            Dictionary with updated vegetation_analysis, urban_analysis,
+            water_analysis, summary and (with the change head) model_predictions;
+            means and extremes are carried over
+        """
+        def counts(name, threshold):
+            threshold = config.INDEX_CHANGE_THRESHOLD if threshold is None else threshold
+            histogram = histograms[f'{name}_diff']
+            return histogram.count_above(threshold), histogram.count_below(-threshold), histogram.total
         
-        return {
-            'water_increase_percent': (water_increase / total_pixels) * 100,
-            'water_decrease_percent': (water_decrease / total_pixels) * 100,
-            'mean_ndwi_change': float(np.mean(ndwi_diff)),
-            'water_gain_area_km2': (water_increase * 100) / 1e6,
-            'water_loss_area_km2': (water_decrease * 100) / 1e6
+        veg = {**report['vegetation_analysis'], **self._vegetation_figures(*counts('ndvi', ndvi))}
+        urban = {**report['urban_analysis'], **self._urban_figures(*counts('ndbi', ndbi))}
+        water = {**report['water_analysis'], **self._water_figures(*counts('ndwi', ndwi))}
+        result = {
+            'vegetation_analysis': veg,
+            'urban_analysis': urban,
+            'water_analysis': water,
+            'summary': self._generate_summary(veg, urban, water)
         }
+        
+        probability = histograms.get('change_probability')
+        if probability is not None and 'model_predictions' in report:
+            threshold = config.CHANGE_THRESHOLD if change is None else change
+            changed = probability.count_above(threshold)
+            result['model_predictions'] = {
+                **report['model_predictions'],
+                'total_change_percent': changed / max(probability.total, 1) * 100
+            }
+        return result
     
-    def generate_report(self, bands1, bands2, date1, date2, location="Unknown"):
-        """Generate comprehensive environmental change report"""
+    def generate_report(self, bands1, bands2, date1, date2, location="Unknown",
+                        indices1=None, indices2=None, valid_mask=None, roi_mask=None):
+        """Generate comprehensive environmental change report
+        
+        indices1/indices2 may be passed in when the caller already computed them
+        with calculate_indices, to avoid doing the work twice. valid_mask is a
+        boolean (H, W) map of usable pixels (e.g. cloud-free); all percentages
+        and areas are then computed over those pixels only. roi_mask restricts
+        the analysis to a region of interest the same way; data quality is then
+        reported relative to the ROI rather than the whole array.
+        """
         # Calculate indices
-        indices1 = self.calculate_indices(bands1)
-        indices2 = self.calculate_indices(bands2)
+        if indices1 is None:
+            indices1 = self.calculate_indices(bands1)
+        if indices2 is None:
+            indices2 = self.calculate_indices(bands2)
+        
+        analysis_mask = self.combine_masks(valid_mask, roi_mask)
         
         # Analyze changes
-        veg_analysis = self.analyze_vegetation_change(indices1, indices2)
-        urban_analysis = self.analyze_urban_change(indices1, indices2)
-        water_analysis = self.analyze_water_change(indices1, indices2)
+        veg_analysis = self.analyze_vegetation_change(indices1, indices2, analysis_mask)
+        urban_analysis = self.analyze_urban_change(indices1, indices2, analysis_mask)
+        water_analysis = self.analyze_water_change(indices1, indices2, analysis_mask)
         
         # Generate report
         report = {
@@ -137,11 +236,28 @@ class EnvironmentalAnalyzer:
             'vegetation_analysis': veg_analysis,
             'urban_analysis': urban_analysis,
             'water_analysis': water_analysis,
+            'data_quality': self._data_quality(
+                indices1['ndvi'].size if roi_mask is None else int(np.sum(roi_mask)), analysis_mask,
+                cloud_masked=valid_mask is not None
+            ),
             'summary': self._generate_summary(veg_analysis, urban_analysis, water_analysis)
         }
         
         return report
     
+    def _data_quality(self, total_pixels, valid_mask, cloud_masked=False):
+        """
+        Share of the scene the statistics were computed over; with cloud_masked,
+        percentages and areas count valid (cloud-free) pixels only
+        """
+        valid_pixels = total_pixels if valid_mask is None else int(np.sum(valid_mask))
+        return {
+            'total_pixels': int(total_pixels),
+            'valid_pixels': valid_pixels,
+            'valid_pixel_percent': valid_pixels / max(total_pixels, 1) * 100,
+            'cloud_mask_applied': cloud_masked
+        }
+    
     def _generate_summary(self, veg, urban, water):
         """Generate human-readable summary"""
         summary = []
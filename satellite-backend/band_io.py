@@ -0,0 +1,194 @@
+"""
+Band stack input
+A date is either a folder with one file per band ({band_name}.tif x 13) or a
+single multi-band GeoTIFF/COG, read in one pass with block-aligned windows
+"""
+
+import os
+import re
+import warnings
+
+import numpy as np
+import rasterio
+from rasterio.errors import NotGeoreferencedWarning, RasterioIOError
+from rasterio.windows import Window
+
+import config
+
+# Name of a multi-band file inside a band folder (API uploads, RGB conversion)
+MULTIBAND_FILE = 'bands.tif'
+MULTIBAND_EXTENSIONS = ('.tif', '.tiff')
+# GeoTIFF tag ImageConverter puts on synthetic bands made from RGB images; their
+# cirrus/SWIR bands carry no cloud signal, so cloud masking defaults to off for them
+SOURCE_TAG = 'SOURCE'
+RGB_SOURCE = 'rgb'
+
+_BAND_NAME = re.compile(r'^B0*(\d{1,2}A?)$')
+
+
+def normalise_band_name(name):
+    """'B01' for 'B1', 'b01' or 'B01'; 'B8A' for 'b8a'; None for anything else"""
+    match = _BAND_NAME.match(str(name or '').strip().upper())
+    if not match:
+        return None
+    number = match.group(1)
+    return f"B{number}" if number.endswith('A') else f"B{number.zfill(2)}"
+
+
+def parse_band_order(value):
+    """
+    Band names of a multi-band file in file order, e.g. "B01,B02,...,B8A"
+
+    Raises:
+        ValueError: Unknown names, duplicates or bands missing from config.BAND_NAMES
+    """
+    names = [normalise_band_name(name) for name in str(value).split(',')]
+    if None in names or len(set(names)) != len(names):
+        raise ValueError("Band order must list distinct band names, e.g. B01,B02,...,B12,B8A")
+    missing = [name for name in config.BAND_NAMES if name not in names]
+    if missing:
+        raise ValueError(f"Band order is missing {', '.join(missing)}")
+    return names
+
+
+def band_source(path):
+    """
+    Where the bands of one date are stored
+
+    Args:
+        path: Folder with {band_name}.tif files or a multi-band file, a folder
+              holding a single multi-band file, or a multi-band file
+
+    Returns:
+        ('bands', folder) or ('multiband', file path)
+    """
+    if os.path.isfile(path):
+        return 'multiband', path
+    if all(os.path.exists(os.path.join(path, f"{name}.tif")) for name in config.BAND_NAMES):
+        return 'bands', path
+    if os.path.exists(os.path.join(path, MULTIBAND_FILE)):
+        return 'multiband', os.path.join(path, MULTIBAND_FILE)
+    rasters = [name for name in os.listdir(path) if name.lower().endswith(MULTIBAND_EXTENSIONS)]
+    if len(rasters) == 1:
+        return 'multiband', os.path.join(path, rasters[0])
+    raise FileNotFoundError(
+        f"{path} holds neither the {len(config.BAND_NAMES)} band files nor a single multi-band file"
+    )
+
+
+def reference_file(path):
+    """File whose CRS, transform and size describe the date (first band or the multi-band file)"""
+    kind, source = band_source(path)
+    return os.path.join(source, f"{config.BAND_NAMES[0]}.tif") if kind == 'bands' else source
+
+
+def converted_from_rgb(path):
+    """True when the date's bands were synthesised from an RGB image (see SOURCE_TAG)"""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', NotGeoreferencedWarning)
+            with rasterio.open(reference_file(path)) as src:
+                return src.tags().get(SOURCE_TAG) == RGB_SOURCE
+    except (OSError, RasterioIOError):
+        return False
+
+
+def band_indexes(src, band_order=None):
+    """
+    1-based band indexes of src in config.BAND_NAMES order
+
+    The mapping comes from band_order when given, else from band descriptions
+    naming every band (as written by ImageConverter or GDAL tools), else
+    config.MULTIBAND_ORDER for 13-band files.
+
+    Raises:
+        ValueError: The file's bands cannot be mapped to the 13 bands
+    """
+    if band_order is None:
+        described = [normalise_band_name(name) for name in src.descriptions]
+        if all(name in described for name in config.BAND_NAMES):
+            band_order = described
+        elif src.count == len(config.BAND_NAMES):
+            band_order = parse_band_order(config.MULTIBAND_ORDER)
+        else:
+            raise ValueError(
+                f"Multi-band file has {src.count} bands without band descriptions; "
+                f"expected {len(config.BAND_NAMES)} or a band order"
+            )
+    elif isinstance(band_order, str):
+        band_order = parse_band_order(band_order)
+    if len(band_order) > src.count:
+        raise ValueError(f"Band order lists {len(band_order)} bands, the file has {src.count}")
+    return [band_order.index(name) + 1 for name in config.BAND_NAMES]
+
+
+def read_bands(path, window=None, band_order=None):
+    """
+    Load all 13 bands of one date as reflectance
+
+    Args:
+        path: See band_source
+        window: Optional rasterio Window; only it is read
+        band_order: Band names of a multi-band file in file order (see band_indexes)
+
+    Returns:
+        (13, H, W) float32 array, clipped to 0-1 (digital numbers / 10000)
+    """
+    kind, source = band_source(path)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', NotGeoreferencedWarning)
+        if kind == 'bands':
+            bands = []
+            for band_name in config.BAND_NAMES:
+                with rasterio.open(os.path.join(source, f"{band_name}.tif")) as src:
+                    bands.append(src.read(1, window=window).astype(np.float32))
+            bands = np.stack(bands, axis=0)
+        else:
+            bands = _read_multiband(source, window, band_order)
+    bands /= 10000.0
+    np.clip(bands, 0, 1, out=bands)
+    return bands
+
+
+def _read_multiband(path, window, band_order):
+    """All bands of a multi-band file, in strips of whole blocks, into one float32 array"""
+    # GDAL decompresses the blocks of each read on all cores
+    with rasterio.open(path, num_threads='ALL_CPUS') as src:
+        indexes = band_indexes(src, band_order)
+        if window is None:
+            window = Window(0, 0, src.width, src.height)
+        col_off, row_off = int(window.col_off), int(window.row_off)
+        height, width = int(window.height), int(window.width)
+        bands = np.empty((len(indexes), height, width), dtype=np.float32)
+
+        # Strips start and end on block rows, so no block is decoded twice;
+        # pixel-interleaved files give every band from one decode per block
+        block_rows = src.block_shapes[0][0]
+        step = max(block_rows, config.BAND_READ_STRIP_ROWS // block_rows * block_rows)
+        edges = [row_off] + list(range((row_off // step + 1) * step, row_off + height, step)) + \
+            [row_off + height]
+        for start, stop in zip(edges[:-1], edges[1:]):
+            src.read(indexes, window=Window(col_off, start, width, stop - start),
+                     out=bands[:, start - row_off:stop - row_off])
+    return bands
+
+
+def check_multiband(path, band_order=None):
+    """
+    Validate a multi-band file and, with band_order, record it in the band
+    descriptions so every later reader maps the bands the same way
+
+    Raises:
+        ValueError: Unreadable file or bands that cannot be mapped to the 13 bands
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', NotGeoreferencedWarning)
+        try:
+            src = rasterio.open(path, 'r+' if band_order else 'r')
+        except RasterioIOError as e:
+            raise ValueError("Not a readable GeoTIFF") from e
+        with src:
+            band_indexes(src, band_order)
+            if band_order:
+                for index, name in enumerate(parse_band_order(band_order), start=1):
+                    src.set_band_description(index, name)
@@ -0,0 +1,384 @@
+"""
+Pipelined batch prediction for many scene pairs listed in a manifest
+
+Stages run concurrently with bounded queues between them:
+    prefetch threads  -> load bands, indices, cloud mask, tile selection
+    inference stage   -> one thread, merges tiles of several pairs into each forward pass
+    analysis pool     -> report, visualization, result files and LLM explanations
+
+The model and LLM client are loaded once for the whole manifest. Completed pairs
+are appended to a checkpoint file, so an interrupted run resumes where it stopped.
+
+Manifest: CSV with a header or JSON Lines, one pair per row with the columns
+img1, img2 and optionally id, date1, date2, location.
+
+Usage:
+    python batch_predict.py --manifest pairs.csv --output-dir results/batch
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import torch
+
+import config
+from band_io import converted_from_rgb
+from model import resolve_tasks
+from tiling import TileBlender, tile_windows, context_window, pad_tile
+
+_DONE = object()
+
+
+def read_manifest(path):
+    """
+    Scene pairs from a CSV or JSON Lines manifest
+
+    Returns:
+        List of dicts with id, img1, img2, date1, date2 and location
+    """
+    with open(path, newline='') as f:
+        if path.endswith(('.jsonl', '.json')):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    pairs = []
+    seen = set()
+    for index, row in enumerate(rows):
+        if not row.get('img1') or not row.get('img2'):
+            raise ValueError(f"Manifest row {index + 1} needs img1 and img2")
+        pair_id = str(row.get('id') or f"{index:05d}_{os.path.basename(os.path.normpath(row['img1']))}")
+        if pair_id in seen:
+            raise ValueError(f"Duplicate pair id in manifest: {pair_id}")
+        seen.add(pair_id)
+        pairs.append({
+            'id': pair_id,
+            'img1': row['img1'],
+            'img2': row['img2'],
+            'date1': row.get('date1') or None,
+            'date2': row.get('date2') or None,
+            'location': row.get('location') or 'Unknown'
+        })
+    return pairs
+
+
+def load_checkpoint(path):
+    """Ids of the pairs already completed according to the checkpoint file"""
+    if not path or not os.path.exists(path):
+        return set()
+    completed = set()
+    with open(path) as f:
+        for line in f:
+            try:
+                completed.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                continue  # partially written last line of an interrupted run
+    return completed
+
+
+class BatchPipeline:
+    """Producer/consumer pipeline around one ChangeDetectionPredictor"""
+
+    def __init__(self, predictor, output_root, checkpoint_path=None, tasks=None, prefilter=None,
+                 cloud_mask=None, tta=None, prefetch_threads=None, analysis_workers=None,
+                 queue_size=None, pairs_per_step=None):
+        """
+        Args:
+            predictor: ChangeDetectionPredictor shared by all stages
+            output_root: Results go to output_root/<pair id>
+            checkpoint_path: JSON Lines file recording completed pairs
+                             (default: output_root/checkpoint.jsonl)
+            tasks, prefilter, cloud_mask, tta: As for ChangeDetectionPredictor.predict
+                (cloud_mask None decides per pair, skipping RGB-converted bands)
+            prefetch_threads: Band loading threads (default: config.BATCH_PREFETCH_THREADS)
+            analysis_workers: Report/visualization threads (default: config.BATCH_ANALYSIS_WORKERS)
+            queue_size: Loaded scenes waiting for inference, and inferred scenes waiting
+                        for analysis (default: config.BATCH_QUEUE_SIZE)
+            pairs_per_step: Pairs whose tiles are merged into the same forward batches
+                            (default: config.BATCH_PAIRS_PER_STEP)
+        """
+        self.predictor = predictor
+        self.output_root = output_root
+        self.checkpoint_path = checkpoint_path or os.path.join(output_root, 'checkpoint.jsonl')
+        self.tasks = resolve_tasks(tasks)
+        self.prefilter = config.PREFILTER_ENABLED if prefilter is None else prefilter
+        self.cloud_mask = cloud_mask
+        self.tta = config.TTA_ENABLED if tta is None else tta
+        self.prefetch_threads = prefetch_threads or config.BATCH_PREFETCH_THREADS
+        self.analysis_workers = analysis_workers or config.BATCH_ANALYSIS_WORKERS
+        self.queue_size = queue_size or config.BATCH_QUEUE_SIZE
+        self.pairs_per_step = pairs_per_step or config.BATCH_PAIRS_PER_STEP
+
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._failed = []
+        self._start = None
+        self._total = 0
+
+    def run(self, pairs, resume=True):
+        """
+        Process all pairs not yet in the checkpoint
+
+        Returns:
+            Summary dict with counts, failures and throughput
+        """
+        os.makedirs(self.output_root, exist_ok=True)
+        done = load_checkpoint(self.checkpoint_path) if resume else set()
+        todo = [pair for pair in pairs if pair['id'] not in done]
+        if done:
+            print(f"↩️  Resuming: {len(pairs) - len(todo)} of {len(pairs)} pairs already completed")
+        self._total = len(todo)
+        self._start = time.perf_counter()
+
+        pending = queue.Queue()
+        for pair in todo:
+            pending.put(pair)
+        for _ in range(self.prefetch_threads):
+            pending.put(_DONE)
+
+        loaded = queue.Queue(maxsize=self.queue_size)
+        prefetchers = [threading.Thread(target=self._prefetch, args=(pending, loaded), daemon=True)
+                       for _ in range(self.prefetch_threads)]
+        for thread in prefetchers:
+            thread.start()
+
+        # The semaphore bounds the scenes held by the analysis pool
+        analysis_slots = threading.Semaphore(self.queue_size)
+        with ThreadPoolExecutor(max_workers=self.analysis_workers) as pool:
+            finished_prefetchers = 0
+            while finished_prefetchers < self.prefetch_threads:
+                items, finished = self._next_step(loaded)
+                finished_prefetchers += finished
+                if not items:
+                    continue
+                try:
+                    predictions = self._infer(items)
+                except Exception as e:
+                    for pair, _ in items:
+                        self._fail(pair, 'inference', e)
+                    continue
+                for (pair, scene), maps in zip(items, predictions):
+                    analysis_slots.acquire()
+                    future = pool.submit(self._analyze, pair, scene, maps)
+                    future.add_done_callback(lambda _: analysis_slots.release())
+
+        for thread in prefetchers:
+            thread.join()
+
+        elapsed = time.perf_counter() - self._start
+        summary = {
+            'finished_at': datetime.now().isoformat(),
+            'pairs_in_manifest': len(pairs),
+            'skipped_from_checkpoint': len(pairs) - len(todo),
+            'completed': self._completed,
+            'failed': self._failed,
+            'elapsed_seconds': elapsed,
+            'pairs_per_second': self._completed / elapsed if elapsed > 0 else 0.0
+        }
+        with open(os.path.join(self.output_root, 'batch_summary.json'), 'w') as f:
+            json.dump(summary, f, indent=4)
+        return summary
+
+    def _prefetch(self, pending, loaded):
+        """Prefetch stage: read bands and compute everything needed before inference"""
+        while True:
+            pair = pending.get()
+            if pair is _DONE:
+                loaded.put(_DONE)
+                return
+            cloud_mask = self.cloud_mask
+            if cloud_mask is None:
+                cloud_mask = config.CLOUD_MASK_ENABLED and not converted_from_rgb(pair['img1'])
+            try:
+                scene = self.predictor.prepare_scene(pair['img1'], pair['img2'],
+                                                     self.prefilter, cloud_mask)
+            except Exception as e:
+                self._fail(pair, 'load', e)
+                continue
+            loaded.put((pair, scene))
+
+    def _next_step(self, loaded):
+        """
+        Wait for one loaded pair, then take whatever else is already waiting
+
+        Returns:
+            (items, number of prefetch threads that finished)
+        """
+        items = []
+        finished = 0
+        item = loaded.get()
+        while True:
+            if item is _DONE:
+                finished += 1
+            else:
+                items.append(item)
+            if len(items) >= self.pairs_per_step:
+                break
+            try:
+                item = loaded.get_nowait()
+            except queue.Empty:
+                break
+        return items, finished
+
+    def _infer(self, items):
+        """
+        Inference stage: run the model on several pairs at once
+
+        Tiles (or whole scenes when tiling is off) of all pairs are grouped by
+        input size and sent through the model in predictor.batch_size batches,
+        so small scenes share forward passes instead of running one by one.
+
+        Returns:
+            List of {task: (C, H, W) map} in the order of items
+        """
+        predictor = self.predictor
+        outputs = []
+        blenders = {}
+        groups = {}
+        for index, (_, scene) in enumerate(items):
+            _, height, width = scene['bands1'].shape
+            tile_mask = scene['tile_mask']
+            tile_size = predictor.prefilter.tile_size if tile_mask is not None else predictor.tile_size
+            outputs.append(predictor._no_change_maps(self.tasks, height, width))
+            if not tile_size:
+                scene_window = (0, height, 0, width)
+                groups.setdefault((height, width, 0), []).append((index, scene_window, scene_window))
+                continue
+            windows = tile_windows(height, width, tile_size)
+            if tile_mask is not None:
+                windows = [window for window, keep in zip(windows, tile_mask) if keep]
+            # Overlapping tiles are blended as in ChangeDetectionPredictor._run_model
+            blenders[index] = TileBlender(outputs[index], predictor.tile_overlap)
+            input_size = tile_size + 2 * predictor.tile_overlap
+            groups.setdefault((input_size, input_size, input_size), []).extend(
+                (index, window, context_window(window, height, width, predictor.tile_overlap))
+                for window in windows
+            )
+
+        for (_, _, input_size), jobs in groups.items():
+            for start in range(0, len(jobs), predictor.batch_size):
+                batch = jobs[start:start + predictor.batch_size]
+                tensors = []
+                for key in ('bands1', 'bands2'):
+                    crops = []
+                    for index, _, (y0, y1, x0, x1) in batch:
+                        crop = items[index][1][key][:, y0:y1, x0:x1]
+                        crops.append(pad_tile(crop, input_size) if input_size else crop)
+                    tensors.append(torch.from_numpy(np.stack(crops)).to(predictor.device))
+
+                predictions = predictor._forward(tensors[0], tensors[1], self.tasks, self.tta)
+                predictions = {task: out.cpu().numpy() for task, out in predictions.items()}
+                for i, (index, window, (y0, y1, x0, x1)) in enumerate(batch):
+                    tile = {task: out[i, :, :y1 - y0, :x1 - x0] for task, out in predictions.items()}
+                    if index in blenders:
+                        blenders[index].add(window, (y0, y1, x0, x1), tile)
+                    else:
+                        for task, out in tile.items():
+                            outputs[index][task][:] = out
+        for blender in blenders.values():
+            blender.finish()
+        return outputs
+
+    def _analyze(self, pair, scene, predictions):
+        """Analysis stage: report, visualization and result files for one pair"""
+        output_dir = os.path.join(self.output_root, pair['id'])
+        try:
+            self.predictor.build_report(
+                scene, predictions, self.tasks, pair['date1'], pair['date2'], pair['location'],
+                tta=self.tta, output_dir=output_dir
+            )
+        except Exception as e:
+            self._fail(pair, 'analysis', e)
+            return
+
+        with self._lock:
+            with open(self.checkpoint_path, 'a') as f:
+                f.write(json.dumps({
+                    'id': pair['id'],
+                    'output_dir': output_dir,
+                    'completed_at': datetime.now().isoformat()
+                }) + '\n')
+            self._completed += 1
+            self._report_progress(pair['id'])
+
+    def _fail(self, pair, stage, error):
+        with self._lock:
+            self._failed.append({'id': pair['id'], 'stage': stage, 'error': f"{type(error).__name__}: {error}"})
+            print(f"❌ {pair['id']} failed during {stage}: {error}")
+            self._report_progress(pair['id'])
+
+    def _report_progress(self, pair_id):
+        """Print throughput so far (called with the lock held)"""
+        processed = self._completed + len(self._failed)
+        elapsed = time.perf_counter() - self._start
+        rate = self._completed / elapsed if elapsed > 0 else 0.0
+        remaining = f"~{(self._total - processed) / rate:.0f}s left" if rate > 0 else "estimating"
+        print(f"📦 [{processed}/{self._total}] {pair_id} | {rate:.2f} pairs/s | "
+              f"elapsed {elapsed:.0f}s | {remaining}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch change detection over a manifest of scene pairs')
+    parser.add_argument('--manifest', required=True, help='CSV or JSONL with img1,img2[,id,date1,date2,location]')
+    parser.add_argument('--output-dir', default=os.path.join(config.RESULTS_DIR, 'batch'),
+                        help='Results go to <output-dir>/<pair id>')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Completed-pairs file (default: <output-dir>/checkpoint.jsonl)')
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help='Ignore the checkpoint and process every pair')
+    parser.add_argument('--model', default='models/best_model.pth', help='Path to trained model')
+    parser.add_argument('--tasks', default=None,
+                        help='Comma-separated model outputs to compute (change,vegetation,urban)')
+    parser.add_argument('--prefilter', action='store_true', default=None,
+                        help='Skip inference on tiles without spectral change')
+    parser.add_argument('--tta', action='store_true', default=None,
+                        help='Average predictions over flip/rot90 variants')
+    parser.add_argument('--no-cloud-mask', dest='cloud_mask', action='store_false', default=None,
+                        help='Do not exclude cloud/haze pixels')
+    parser.add_argument('--no-llm', action='store_true', help='Skip LLM explanations')
+    parser.add_argument('--prefetch-threads', type=int, default=None)
+    parser.add_argument('--analysis-workers', type=int, default=None)
+    parser.add_argument('--queue-size', type=int, default=None)
+    parser.add_argument('--pairs-per-step', type=int, default=None)
+    args = parser.parse_args()
+
+    from predict import ChangeDetectionPredictor
+
+    pairs = read_manifest(args.manifest)
+    predictor = ChangeDetectionPredictor(args.model)
+    if args.no_llm:
+        predictor.llm_explainer = None
+
+    pipeline = BatchPipeline(
+        predictor, args.output_dir,
+        checkpoint_path=args.checkpoint,
+        tasks=args.tasks,
+        prefilter=args.prefilter,
+        cloud_mask=args.cloud_mask,
+        tta=args.tta,
+        prefetch_threads=args.prefetch_threads,
+        analysis_workers=args.analysis_workers,
+        queue_size=args.queue_size,
+        pairs_per_step=args.pairs_per_step
+    )
+    print(f"🚀 Processing {len(pairs)} pairs from {args.manifest}")
+    summary = pipeline.run(pairs, resume=args.resume)
+
+    print("\n" + "=" * 80)
+    print("BATCH COMPLETE")
+    print("=" * 80)
+    print(f"Completed: {summary['completed']}  Failed: {len(summary['failed'])}  "
+          f"Skipped (checkpoint): {summary['skipped_from_checkpoint']}")
+    print(f"Throughput: {summary['pairs_per_second']:.2f} pairs/s over {summary['elapsed_seconds']:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
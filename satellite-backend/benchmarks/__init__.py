@@ -0,0 +1,4 @@
+"""Performance benchmarks for the satellite change detection backend
+
+Run from the satellite-backend directory, e.g. ``python -m benchmarks.heads``.
+"""
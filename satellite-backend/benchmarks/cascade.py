@@ -0,0 +1,87 @@
+"""Coarse-to-fine cascade versus full-resolution inference
+
+Reports speedup, the share of tiles refined and agreement with the full-resolution
+change map for each cascade factor and margin, on a synthetic scene with sparse change.
+
+Usage:
+    python -m benchmarks.cascade --model models/best_model.pth --size 2048
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_pair, disable_llm
+import config
+from predict import ChangeDetectionPredictor
+
+
+def compare(reference, candidate):
+    """Agreement of a candidate change-probability map with the full-resolution one"""
+    ref_changed = reference > config.CHANGE_THRESHOLD
+    cand_changed = candidate > config.CHANGE_THRESHOLD
+    union = (ref_changed | cand_changed).sum()
+    return {
+        'change_iou': float((ref_changed & cand_changed).sum() / union) if union else 1.0,
+        'change_recall': float((ref_changed & cand_changed).sum() / ref_changed.sum()) if ref_changed.sum() else 1.0,
+        'mean_abs_prob_error': float(np.mean(np.abs(reference - candidate)))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark coarse-to-fine cascade inference')
+    parser.add_argument('--model', default='models/best_model.pth', help='Path to trained model')
+    parser.add_argument('--size', type=int, default=2048, help='Synthetic scene size in pixels')
+    parser.add_argument('--changed-fraction', type=float, default=0.01)
+    parser.add_argument('--factors', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--margins', type=float, nargs='+', default=[0.05, 0.15, 0.3])
+    parser.add_argument('--output', default=None, help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    disable_llm()
+    predictor = ChangeDetectionPredictor(args.model)
+    bands1, bands2 = synthetic_pair(args.size, changed_fraction=args.changed_fraction)
+    tasks = ('change',)
+    tile_size = predictor.prefilter.tile_size
+
+    start = time.perf_counter()
+    reference = predictor._run_model(bands1, bands2, tasks, tile_size=tile_size)['change'][0]
+    full_time = time.perf_counter() - start
+
+    results = []
+    for factor in args.factors:
+        for margin in args.margins:
+            predictor.cascade_factor = factor
+            predictor.cascade_margin = margin
+            stats = {}
+            start = time.perf_counter()
+            base_maps, refine_mask = predictor._coarse_pass(bands1, bands2, tasks, None, stats)
+            change = predictor._run_model(bands1, bands2, tasks, tile_size=tile_size,
+                                          tile_mask=refine_mask, base_maps=base_maps)['change'][0]
+            elapsed = time.perf_counter() - start
+            results.append({
+                'factor': factor,
+                'margin': margin,
+                'seconds': elapsed,
+                'speedup': full_time / elapsed,
+                'refined_percent': 100 - stats['skipped_percent'],
+                **compare(reference, change)
+            })
+
+    print(f"\nFull resolution: {full_time:.2f}s ({args.size}x{args.size}, "
+          f"{args.changed_fraction * 100:.1f}% changed patches)")
+    print(f"{'factor':>6}{'margin':>8}{'refined':>9}{'speedup':>9}{'IoU':>7}{'recall':>8}")
+    print("-" * 47)
+    for r in results:
+        print(f"{r['factor']:>6}{r['margin']:>8.2f}{r['refined_percent']:>8.1f}%{r['speedup']:>8.2f}x"
+              f"{r['change_iou']:>7.3f}{r['change_recall']:>8.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'full_seconds': full_time, 'results': results}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
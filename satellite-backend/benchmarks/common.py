@@ -0,0 +1,96 @@
+"""Shared helpers for the benchmark scripts"""
+
+import os
+import sys
+import time
+import statistics
+
+import numpy as np
+import rasterio
+import torch
+
+# Benchmarks import the backend modules as top-level modules, like main.py does
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from model import ChangeDetectionModel
+
+
+# Typical top-of-atmosphere reflectance per band (BAND_NAMES order) for a few land covers
+LAND_COVER_REFLECTANCE = np.array([
+    # B01   B02   B03   B04   B05   B06   B07   B08   B09    B10    B11   B12   B8A
+    [0.12, 0.09, 0.08, 0.06, 0.10, 0.25, 0.30, 0.33, 0.10, 0.002, 0.18, 0.09, 0.34],  # vegetation
+    [0.14, 0.12, 0.12, 0.13, 0.15, 0.17, 0.19, 0.20, 0.07, 0.002, 0.26, 0.22, 0.21],  # built-up
+    [0.09, 0.07, 0.06, 0.04, 0.04, 0.03, 0.03, 0.02, 0.01, 0.001, 0.01, 0.01, 0.02],  # water
+    [0.15, 0.13, 0.14, 0.17, 0.19, 0.21, 0.23, 0.25, 0.08, 0.002, 0.32, 0.27, 0.26],  # bare soil
+], dtype=np.float32)
+
+
+def synthetic_pair(size, seed=0, changed_fraction=0.05):
+    """
+    Deterministic pair of (13, size, size) float32 scenes in the normalised [0, 1] range
+    
+    Pixels belong to patches of a few land-cover classes with realistic, cloud-free
+    reflectances; the after scene swaps the class of a few patches.
+    """
+    rng = np.random.default_rng(seed)
+    patch = 16
+    patches = -(-size // patch)
+    classes1 = rng.integers(0, len(LAND_COVER_REFLECTANCE), size=(patches, patches))
+    classes2 = classes1.copy()
+    changed = rng.random((patches, patches)) < changed_fraction
+    classes2[changed] = (classes1[changed] + 1) % len(LAND_COVER_REFLECTANCE)
+    
+    def render(classes):
+        class_map = np.kron(classes, np.ones((patch, patch), dtype=classes.dtype))[:size, :size]
+        bands = LAND_COVER_REFLECTANCE[class_map].transpose(2, 0, 1)
+        noise = rng.normal(1, 0.03, size=bands.shape).astype(np.float32)
+        return np.clip(bands * noise, 0, 1)
+    
+    return render(classes1), render(classes2)
+
+
+def write_band_folder(bands, folder):
+    """Write a (13, H, W) normalised stack as one uint16 GeoTIFF per band, like the Onera layout"""
+    os.makedirs(folder, exist_ok=True)
+    for band_name, band in zip(config.BAND_NAMES, bands):
+        data = (band * 10000).astype(np.uint16)
+        with rasterio.open(
+            os.path.join(folder, f"{band_name}.tif"), 'w', driver='GTiff',
+            height=data.shape[0], width=data.shape[1], count=1, dtype=data.dtype
+        ) as dst:
+            dst.write(data, 1)
+    return folder
+
+
+def disable_llm():
+    """Make sure benchmarks never call the external Gemini API"""
+    os.environ['GEMINI_API_KEY'] = ''
+
+
+def load_model(model_path=None, device='cpu'):
+    """ChangeDetectionModel in eval mode, with trained weights when a checkpoint is given"""
+    model = ChangeDetectionModel(in_channels=len(config.BAND_NAMES)).to(device)
+    if model_path:
+        checkpoint = torch.load(model_path, map_location=device)
+        model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return model
+
+
+def time_call(fn, repeats=5, warmup=1):
+    """Time fn() and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'mean_ms': statistics.mean(samples),
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'max_ms': max(samples),
+        'repeats': repeats
+    }
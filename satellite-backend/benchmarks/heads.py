@@ -0,0 +1,60 @@
+"""Latency of ChangeDetectionModel for every combination of output heads
+
+Usage:
+    python -m benchmarks.heads --size 512 --repeats 5
+"""
+
+import argparse
+import itertools
+import json
+
+import torch
+
+from benchmarks.common import synthetic_pair, load_model, time_call
+from model import TASKS
+
+
+def benchmark_heads(model, size, repeats=5, device='cpu'):
+    """Time a forward pass for each non-empty subset of TASKS"""
+    bands1, bands2 = synthetic_pair(size)
+    img1 = torch.from_numpy(bands1).unsqueeze(0).to(device)
+    img2 = torch.from_numpy(bands2).unsqueeze(0).to(device)
+    
+    results = []
+    for n in range(len(TASKS), 0, -1):
+        for tasks in itertools.combinations(TASKS, n):
+            def run():
+                with torch.no_grad():
+                    model(img1, img2, tasks=tasks)
+            results.append({'tasks': list(tasks), **time_call(run, repeats=repeats)})
+    
+    baseline = results[0]['median_ms']  # all heads
+    for result in results:
+        result['saving_percent'] = (1 - result['median_ms'] / baseline) * 100
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark selective head execution')
+    parser.add_argument('--size', type=int, default=512, help='Scene size in pixels')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--model', default=None, help='Optional checkpoint (random weights otherwise)')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this path')
+    args = parser.parse_args()
+    
+    model = load_model(args.model)
+    results = benchmark_heads(model, args.size, args.repeats)
+    
+    print(f"\nForward latency at {args.size}x{args.size} (median of {args.repeats})")
+    print("-" * 60)
+    for result in results:
+        print(f"{'+'.join(result['tasks']):<28} {result['median_ms']:>9.1f} ms   "
+              f"saving {result['saving_percent']:>5.1f}%")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Speedup and recall loss of the spectral-difference prefilter on the Onera test cities
+
+Recall is measured against the full-scene model output, and additionally against
+the Onera change labels when --labels-root is given
+(<labels-root>/<city>/cm/<city>-cm.tif, where 2 marks change).
+
+Usage:
+    python -m benchmarks.prefilter --model models/best_model.pth
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import rasterio
+
+from benchmarks.common import disable_llm
+import config
+from dataset import OneraDataset
+from predict import ChangeDetectionPredictor
+
+
+def _load_labels(labels_root, city):
+    path = os.path.join(labels_root, city, 'cm', f'{city}-cm.tif')
+    if not os.path.exists(path):
+        return None
+    with rasterio.open(path) as src:
+        return src.read(1) > 1
+
+
+def _recall(changed, reference):
+    total = reference.sum()
+    return float((changed & reference).sum() / total) if total else 1.0
+
+
+def benchmark_city(predictor, dataset, city, labels_root=None):
+    bands1 = dataset._load_bands(city, 1)
+    bands2 = dataset._load_bands(city, 2)
+    tile_size = predictor.prefilter.tile_size
+
+    start = time.perf_counter()
+    full = predictor._run_model(bands1, bands2, ('change',), tile_size=tile_size)['change'][0]
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, tile_mask = predictor.prefilter.select_tiles(bands1, bands2)
+    filtered = predictor._run_model(bands1, bands2, ('change',), tile_size=tile_size,
+                                    tile_mask=tile_mask)['change'][0]
+    filtered_time = time.perf_counter() - start
+
+    full_changed = full > config.CHANGE_THRESHOLD
+    filtered_changed = filtered > config.CHANGE_THRESHOLD
+    result = {
+        'city': city,
+        'shape': list(bands1.shape[1:]),
+        'tiles_total': int(tile_mask.size),
+        'tiles_inferred': int(tile_mask.sum()),
+        'full_seconds': full_time,
+        'prefilter_seconds': filtered_time,
+        'speedup': full_time / filtered_time,
+        'recall_vs_full_model': _recall(filtered_changed, full_changed)
+    }
+
+    labels = _load_labels(labels_root, city) if labels_root else None
+    if labels is not None:
+        result['recall_vs_labels_full'] = _recall(full_changed, labels)
+        result['recall_vs_labels_prefilter'] = _recall(filtered_changed, labels)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the spectral-difference prefilter')
+    parser.add_argument('--model', default='models/best_model.pth', help='Path to trained model')
+    parser.add_argument('--dataset-root', default=config.DATASET_ROOT)
+    parser.add_argument('--labels-root', default=None, help='Onera test labels folder')
+    parser.add_argument('--cities', nargs='+', default=config.TEST_CITIES)
+    parser.add_argument('--output', default=None, help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    disable_llm()
+    predictor = ChangeDetectionPredictor(args.model)
+    dataset = OneraDataset(args.cities, args.dataset_root)
+    if not dataset.samples:
+        print(f"❌ No Onera test cities found under {args.dataset_root}")
+        return
+
+    results = [benchmark_city(predictor, dataset, city, args.labels_root) for city in dataset.samples]
+
+    print(f"\n{'City':<14}{'tiles':>12}{'speedup':>10}{'recall':>9}")
+    print("-" * 45)
+    for r in results:
+        print(f"{r['city']:<14}{r['tiles_inferred']:>5}/{r['tiles_total']:<6}"
+              f"{r['speedup']:>9.2f}x{r['recall_vs_full_model'] * 100:>8.1f}%")
+    total_full = sum(r['full_seconds'] for r in results)
+    total_filtered = sum(r['prefilter_seconds'] for r in results)
+    print(f"\nOverall speedup: {total_full / total_filtered:.2f}x, "
+          f"mean recall vs full model: {np.mean([r['recall_vs_full_model'] for r in results]) * 100:.1f}%")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""Reproducible per-stage benchmark suite on synthetic 13-band scenes
+
+Generates deterministic synthetic GeoTIFF pairs (cached under benchmarks/data),
+times each pipeline stage and the end-to-end /api/analyze endpoint with the LLM
+stubbed out, writes the results as JSON and compares them against a baseline.
+
+Usage:
+    python -m benchmarks.suite --sizes 256 512 1024 --output results.json
+    python -m benchmarks.suite --preset full --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.15
+
+Exits with status 1 when a stage is slower than the baseline by more than the threshold,
+or fails where the baseline has a timing. A stage that fails (e.g. a scene too large
+for the admission budget) is recorded with its error and the run continues.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+
+from benchmarks.common import synthetic_pair, write_band_folder, disable_llm, load_model, time_call
+import config
+from model import resolve_tasks
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+# Scene sizes in pixels; 10980 is a full Sentinel-2 tile at 10 m
+SIZE_PRESETS = {
+    'quick': [256, 512],
+    'standard': [256, 512, 1024, 2048],
+    'full': [256, 512, 1024, 2048, 5490, 10980]
+}
+
+STAGES = ['load_image_bands', 'model_forward', 'generate_report', 'visualization',
+          'image_converter', 'api_analyze']
+
+
+class StubExplainer:
+    """Stands in for LLMExplainer so benchmarks never reach the network"""
+
+    def generate_explanation(self, analysis_report):
+        summary = '\n'.join(analysis_report.get('summary', []))
+        return {
+            'executive_summary': summary,
+            'detailed_analysis': '',
+            'environmental_impact': '',
+            'recommendations': '',
+            'key_insights': '',
+            'full_text': summary
+        }
+
+
+def scene_folders(size, seed=0):
+    """Before/after band folders for a synthetic scene, generated once and reused"""
+    root = DATA_DIR / f"{size}px_seed{seed}"
+    before, after = root / 'before', root / 'after'
+    if not (after / f"{config.BAND_NAMES[-1]}.tif").exists():
+        print(f"🛰️  Generating {size}x{size} synthetic scene pair...")
+        bands1, bands2 = synthetic_pair(size, seed=seed)
+        write_band_folder(bands1, str(before))
+        write_band_folder(bands2, str(after))
+    return str(before), str(after)
+
+
+def rgb_png(bands):
+    """8-bit RGB rendering of a normalised band stack (input for ImageConverter)"""
+    rgb = np.clip(bands[[3, 2, 1]].transpose(1, 2, 0) * 3 * 255, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _band_uploads(folder, field):
+    return [(field, (f"{name}.tif", open(os.path.join(folder, f"{name}.tif"), 'rb'), 'image/tiff'))
+            for name in config.BAND_NAMES]
+
+
+def _api_analyze(client, before, after):
+    """One /api/analyze request with the scene uploaded as 13 + 13 GeoTIFFs"""
+    import main
+
+    files = _band_uploads(before, 'before_images') + _band_uploads(after, 'after_images')
+    try:
+        response = client.post('/api/analyze', files=files,
+                               params={'location': 'benchmark', 'cloud_mask': 'false'})
+    finally:
+        for _, (_, handle, _) in files:
+            handle.close()
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/analyze returned {response.status_code}: {response.text[:200]}")
+
+    # Don't let repeated runs fill the upload and results folders
+    body = response.json()
+    for upload in main.UPLOAD_DIR.glob(f"{body['analysis_id']}_*"):
+        shutil.rmtree(upload, ignore_errors=True)
+    if body.get('result_folder'):
+        shutil.rmtree(main.BASE_DIR / 'results' / body['result_folder'], ignore_errors=True)
+
+
+def benchmark_size(size, predictor, client, stages, repeats, tile_size, work_dir):
+    """Time the selected stages on one scene size"""
+    before, after = scene_folders(size)
+    bands1 = predictor.load_image_bands(before)
+    bands2 = predictor.load_image_bands(after)
+    tasks = resolve_tasks()
+    # Whole-scene inference stops fitting in memory long before 10980 px
+    model_tile = tile_size if size > tile_size else 0
+    results = {}
+
+    def run(name, fn):
+        if name not in stages:
+            return
+        print(f"  ⏱️  {name}")
+        try:
+            results[name] = time_call(fn, repeats=repeats)
+        except Exception as e:
+            print(f"  ⚠️  {name} failed: {e}")
+            results[name] = {'error': str(e)[:300]}
+
+    run('load_image_bands', lambda: (predictor.load_image_bands(before),
+                                     predictor.load_image_bands(after)))
+    run('model_forward', lambda: predictor._run_model(bands1, bands2, tasks, tile_size=model_tile))
+
+    if {'generate_report', 'visualization'} & set(stages):
+        maps = predictor._run_model(bands1, bands2, tasks, tile_size=model_tile)
+        change_map = maps['change'][0]
+        vegetation_map = maps['vegetation']
+        urban_map = maps['urban']
+
+    run('generate_report', lambda: predictor.analyzer.generate_report(
+        bands1, bands2, 'Unknown', 'Unknown', 'benchmark'))
+    run('visualization', lambda: predictor.visualizer.create_change_visualization(
+        bands1, bands2, change_map, vegetation_map, urban_map,
+        output_path=os.path.join(work_dir, 'change_analysis.png')))
+
+    if 'image_converter' in stages:
+        from image_converter import ImageConverter
+        converter = ImageConverter()
+        png_path = os.path.join(work_dir, f'rgb_{size}.png')
+        with open(png_path, 'wb') as f:
+            f.write(rgb_png(bands1))
+        run('image_converter', lambda: converter.convert_rgb_to_multispectral(
+            png_path, os.path.join(work_dir, 'converted')))
+
+    if 'api_analyze' in stages:
+        # The API tiles like model_forward, and admission estimates with the same tile size
+        predictor.tile_size = config.INFERENCE_TILE_SIZE = model_tile
+        run('api_analyze', lambda: _api_analyze(client, before, after))
+    return results
+
+
+def environment():
+    """Host and software details stored with each result file"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': commit,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'cuda': torch.cuda.is_available()
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """
+    Compare median latencies with a baseline result file
+
+    Returns:
+        List of regressions (size, stage, baseline_ms, current_ms, ratio); current_ms
+        and ratio are None for a stage that failed
+    """
+    regressions = []
+    print(f"\nComparison with baseline from {baseline['environment'].get('timestamp', '?')} "
+          f"(threshold +{threshold:.0%})")
+    print("-" * 70)
+    for size, stages in results['results'].items():
+        for name, stats in stages.items():
+            reference = baseline['results'].get(size, {}).get(name)
+            if reference is None or 'error' in reference:
+                continue
+            if 'error' in stats:
+                print(f"❌ {size:>6}px {name:<18}{reference['median_ms']:>10.1f} → failed: {stats['error'][:60]}")
+                regressions.append((size, name, reference['median_ms'], None, None))
+                continue
+            base_ms, current_ms = reference['median_ms'], stats['median_ms']
+            ratio = current_ms / base_ms if base_ms else float('inf')
+            regressed = ratio > 1 + threshold and current_ms - base_ms > min_delta_ms
+            marker = '❌' if regressed else '✓'
+            print(f"{marker} {size:>6}px {name:<18}{base_ms:>10.1f} → {current_ms:>10.1f} ms  ({ratio:.2f}x)")
+            if regressed:
+                regressions.append((size, name, base_ms, current_ms, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage benchmark suite on synthetic scenes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=None, help='Scene sizes in pixels')
+    parser.add_argument('--preset', choices=sorted(SIZE_PRESETS), default='standard')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--tile-size', type=int, default=512,
+                        help='Tile size for model_forward on scenes larger than this')
+    parser.add_argument('--model', default=None, help='Optional checkpoint (random weights otherwise)')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this path')
+    parser.add_argument('--baseline', default=None, help='Result file to compare against')
+    parser.add_argument('--save-baseline', default=None, help='Also write the results here as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Allowed relative slowdown of the median before failing')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help='Ignore slowdowns smaller than this (timer noise on tiny stages)')
+    args = parser.parse_args()
+
+    disable_llm()
+    from predict import ChangeDetectionPredictor
+    predictor = ChangeDetectionPredictor(None, model=load_model(args.model))
+    predictor.llm_explainer = StubExplainer()
+
+    client = None
+    if 'api_analyze' in args.stages:
+        from fastapi.testclient import TestClient
+        import main as api
+        from explanations import ExplanationJobs
+        api.predictor = predictor
+        api.explanation_jobs = ExplanationJobs(predictor.llm_explainer)
+        client = TestClient(api.app)
+
+    sizes = args.sizes or SIZE_PRESETS[args.preset]
+    results = {'environment': environment(), 'repeats': args.repeats, 'results': {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            print(f"\n📏 {size}x{size}")
+            results['results'][str(size)] = benchmark_size(
+                size, predictor, client, args.stages, args.repeats, args.tile_size, work_dir)
+
+    print(f"\n{'size':>8}  {'stage':<18}{'median ms':>12}{'min ms':>12}")
+    print("-" * 52)
+    for size, stages in results['results'].items():
+        for name, stats in stages.items():
+            if 'error' in stats:
+                print(f"{size:>6}px  {name:<18}{'failed':>12}")
+                continue
+            print(f"{size:>6}px  {name:<18}{stats['median_ms']:>12.1f}{stats['min_ms']:>12.1f}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=4)
+            print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) regressed beyond {args.threshold:.0%} or failed")
+            raise SystemExit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Latency of batched test-time augmentation versus one forward pass per variant
+
+Usage:
+    python -m benchmarks.tta --size 256 --repeats 3
+"""
+
+import argparse
+import json
+
+import torch
+
+from benchmarks.common import synthetic_pair, load_model, time_call
+from tta import batched_tta, looped_tta, tta_transforms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batched TTA')
+    parser.add_argument('--size', type=int, default=256, help='Tile size in pixels')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--model', default=None, help='Optional checkpoint (random weights otherwise)')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    bands1, bands2 = synthetic_pair(args.size)
+    img1 = torch.from_numpy(bands1).unsqueeze(0)
+    img2 = torch.from_numpy(bands2).unsqueeze(0)
+
+    def plain():
+        with torch.no_grad():
+            model(img1, img2)
+
+    results = {
+        'variants': len(tta_transforms(square=True)),
+        'single_pass': time_call(plain, repeats=args.repeats),
+        'looped_tta': time_call(lambda: looped_tta(model, img1, img2), repeats=args.repeats),
+        'batched_tta': time_call(lambda: batched_tta(model, img1, img2), repeats=args.repeats)
+    }
+
+    single = results['single_pass']['median_ms']
+    print(f"\nTTA latency at {args.size}x{args.size}, {results['variants']} variants (median of {args.repeats})")
+    print("-" * 60)
+    for name in ('single_pass', 'looped_tta', 'batched_tta'):
+        median = results[name]['median_ms']
+        print(f"{name:<14}{median:>10.1f} ms   {median / single:>5.2f}x single pass")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Throughput and memory of the multi-process inference worker pool
+
+Usage:
+    python -m benchmarks.worker_pool --model models/best_model.pth --workers 1 2 4 --jobs 16
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import synthetic_pair, write_band_folder, disable_llm
+from worker_pool import InferenceWorkerPool
+
+
+def benchmark_pool(model_path, workers, jobs, size, tmp_dir):
+    """Scenes per second and per-worker memory for one pool size"""
+    bands1, bands2 = synthetic_pair(size)
+    before = write_band_folder(bands1, os.path.join(tmp_dir, 'before'))
+    after = write_band_folder(bands2, os.path.join(tmp_dir, 'after'))
+
+    pool = InferenceWorkerPool(model_path, num_workers=workers)
+    try:
+        kwargs = dict(img1_folder=before, img2_folder=after, location='benchmark', tasks=None)
+        # Warm-up: one job per worker
+        for future in [pool.submit(output_dir=os.path.join(tmp_dir, f'warm{i}'), **kwargs)
+                       for i in range(workers)]:
+            future.result()
+
+        start = time.perf_counter()
+        futures = [pool.submit(output_dir=os.path.join(tmp_dir, f'job{i}'), **kwargs)
+                   for i in range(jobs)]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+        memory = pool.memory_usage()
+    finally:
+        pool.shutdown()
+
+    return {
+        'workers': workers,
+        'threads_per_worker': pool.threads_per_worker,
+        'jobs': jobs,
+        'seconds': elapsed,
+        'scenes_per_second': jobs / elapsed,
+        'private_mb_per_worker': [m.get('private_mb') for m in memory.values()],
+        'shared_mb_per_worker': [m.get('shared_mb') for m in memory.values()]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the inference worker pool')
+    parser.add_argument('--model', required=True, help='Path to trained model')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--jobs', type=int, default=16)
+    parser.add_argument('--size', type=int, default=256, help='Scene size in pixels')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    disable_llm()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for workers in args.workers:
+            results.append(benchmark_pool(args.model, workers, args.jobs, args.size, tmp_dir))
+
+    base = results[0]['scenes_per_second'] / results[0]['workers']
+    print(f"\nWorker pool throughput ({args.jobs} scenes of {args.size}x{args.size})")
+    print("-" * 70)
+    for r in results:
+        print(f"{r['workers']:>2} workers × {r['threads_per_worker']:>2} threads  "
+              f"{r['scenes_per_second']:>6.2f} scenes/s  "
+              f"scaling {r['scenes_per_second'] / (base * r['workers']) * 100:>5.1f}%  "
+              f"private {max(filter(None, r['private_mb_per_worker']), default=0):>6.0f} MB/worker")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Cloud and haze masking for Sentinel-2 scenes"""
+
+import config
+from prefilter import tile_fractions
+
+BLUE = config.BAND_NAMES.index('B02')
+RED = config.BAND_NAMES.index('B04')
+CIRRUS = config.BAND_NAMES.index('B10')
+SWIR1 = config.BAND_NAMES.index('B11')
+
+
+class CloudMasker:
+    """Flags cirrus, opaque cloud and haze pixels with per-pixel band thresholds"""
+    
+    def __init__(self, cirrus_threshold=None, brightness_threshold=None,
+                 swir_threshold=None, haze_threshold=None):
+        self.cirrus_threshold = config.CIRRUS_THRESHOLD if cirrus_threshold is None else cirrus_threshold
+        self.brightness_threshold = config.CLOUD_BRIGHTNESS_THRESHOLD if brightness_threshold is None else brightness_threshold
+        self.swir_threshold = config.CLOUD_SWIR_THRESHOLD if swir_threshold is None else swir_threshold
+        self.haze_threshold = config.HAZE_THRESHOLD if haze_threshold is None else haze_threshold
+    
+    def cloud_mask(self, bands):
+        """Boolean (H, W) map, True where the pixel is cloud, cirrus or haze"""
+        blue, red = bands[BLUE], bands[RED]
+        
+        mask = bands[CIRRUS] > self.cirrus_threshold
+        mask |= ((blue > self.brightness_threshold) & (red > self.brightness_threshold)
+                 & (bands[SWIR1] > self.swir_threshold))
+        mask |= (blue - 0.5 * red) > self.haze_threshold
+        return mask
+    
+    def pair_mask(self, bands1, bands2):
+        """Pixels unusable in either date"""
+        return self.cloud_mask(bands1) | self.cloud_mask(bands2)
+    
+    def clear_tiles(self, mask, tile_size, max_fraction=None):
+        """
+        Tiles that still have usable pixels
+        
+        Returns:
+            Boolean array in tiling.tile_windows order, False for tiles whose
+            cloud fraction reaches max_fraction (default: config.CLOUD_MAX_TILE_FRACTION)
+        """
+        max_fraction = config.CLOUD_MAX_TILE_FRACTION if max_fraction is None else max_fraction
+        return tile_fractions(mask, tile_size) < max_fraction
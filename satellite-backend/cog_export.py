@@ -0,0 +1,138 @@
+"""
+Cloud-Optimized GeoTIFF export of the per-pixel change products
+Tiled, compressed GeoTIFFs with internal overviews and the input georeferencing,
+so GIS clients can read single windows or zoom levels over HTTP range requests
+"""
+
+import os
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
+
+import config
+from band_io import reference_file
+
+NODATA = 255  # uint8 products: 255 marks unusable (e.g. cloudy) pixels
+
+VEGETATION_CLASSES = {0: 'no_change', 1: 'vegetation_increase', 2: 'vegetation_decrease'}
+URBAN_CLASSES = {0: 'no_change', 1: 'urban_construction', 2: 'urban_demolition'}
+
+
+def read_georeference(image_folder):
+    """
+    CRS, affine transform and size of a band folder or multi-band file (from
+    its first band or the multi-band file)
+
+    Returns:
+        Dictionary with crs (None when not georeferenced), transform, height and width
+    """
+    with rasterio.open(reference_file(image_folder)) as src:
+        return {'crs': src.crs, 'transform': src.transform, 'height': src.height, 'width': src.width}
+
+
+def overview_factors(height, width, block_size=None):
+    """Power-of-two decimation factors until the overview fits in one block"""
+    block_size = block_size or config.COG_BLOCK_SIZE
+    factors = []
+    factor = 2
+    while max(height, width) / (factor // 2) > block_size:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def write_cog(path, array, georef=None, resampling=Resampling.nearest, tags=None):
+    """
+    Write a single-band uint8 array as a Cloud-Optimized GeoTIFF
+
+    The raster and its overviews are built in memory, then copied with the
+    overviews ahead of the full-resolution tiles (the COG layout).
+
+    Args:
+        path: Output .tif path
+        array: (H, W) uint8 array, NODATA for missing pixels
+        georef: Output of read_georeference, or None for a pixel grid
+        resampling: How overviews are computed (average for probabilities,
+                    nearest for classes)
+        tags: Optional metadata tags (e.g. class names, scale)
+    """
+    height, width = array.shape
+    block_size = config.COG_BLOCK_SIZE
+    profile = {
+        'driver': 'GTiff',
+        'height': height,
+        'width': width,
+        'count': 1,
+        'dtype': 'uint8',
+        'nodata': NODATA,
+        'crs': georef['crs'] if georef else None,
+        'transform': georef['transform'] if georef else rasterio.transform.IDENTITY
+    }
+
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dst:
+            dst.write(array, 1)
+            if tags:
+                dst.update_tags(**tags)
+            factors = overview_factors(height, width, block_size)
+            if factors:
+                dst.build_overviews(factors, resampling)
+                dst.update_tags(ns='rio_overview', resampling=resampling.name)
+
+        with memfile.open() as src:
+            rasterio.shutil.copy(
+                src, path, driver='GTiff',
+                tiled=True, blockxsize=block_size, blockysize=block_size,
+                compress=config.COG_COMPRESSION, predictor=2 if config.COG_COMPRESSION != 'none' else 1,
+                copy_src_overviews=True, interleave='band'
+            )
+
+
+def export_change_products(output_dir, change_map=None, vegetation_map=None, urban_map=None,
+                           georef=None, valid_mask=None):
+    """
+    Write the model outputs that were computed as COGs
+
+    Args:
+        output_dir: Result folder of the analysis
+        change_map: (H, W) change probability in [0, 1], or None
+        vegetation_map, urban_map: (3, H, W) class scores, or None
+        georef: Output of read_georeference for the input bands
+        valid_mask: Optional (H, W) bool mask of usable pixels; others are NODATA
+
+    Returns:
+        Dictionary of product name to file name, encoding and class names
+    """
+    products = {}
+
+    def masked(values):
+        if valid_mask is not None:
+            values[~valid_mask] = NODATA
+        return values
+
+    if change_map is not None:
+        # 0..250 keeps NODATA out of range and makes value / 250 the probability
+        probability = masked(np.rint(np.clip(change_map, 0, 1) * 250).astype(np.uint8))
+        write_cog(os.path.join(output_dir, 'change_probability.tif'), probability, georef,
+                  resampling=Resampling.average, tags={'scale': '0.004', 'units': 'probability'})
+        products['change_probability'] = {
+            'file': 'change_probability.tif', 'dtype': 'uint8', 'scale': 1 / 250, 'nodata': NODATA
+        }
+
+    for name, scores, classes in (('vegetation_class', vegetation_map, VEGETATION_CLASSES),
+                                  ('urban_class', urban_map, URBAN_CLASSES)):
+        if scores is None:
+            continue
+        labels = masked(np.argmax(scores, axis=0).astype(np.uint8))
+        write_cog(os.path.join(output_dir, f'{name}.tif'), labels, georef,
+                  resampling=Resampling.nearest,
+                  tags={f'class_{value}': label for value, label in classes.items()})
+        products[name] = {
+            'file': f'{name}.tif', 'dtype': 'uint8', 'nodata': NODATA,
+            'classes': {str(value): label for value, label in classes.items()}
+        }
+
+    return products
@@ -19,10 +19,31 @@ NUM_EPOCHS = 50
 LEARNING_RATE = 0.0001
 NUM_WORKERS = 4
 
+# Inference worker pool (0 = run inference in the API process)
+INFERENCE_WORKERS = int(os.getenv('SATELLITE_INFERENCE_WORKERS', '0'))
+INFERENCE_THREADS_PER_WORKER = int(os.getenv('SATELLITE_THREADS_PER_WORKER', '0'))  # 0 = cores / workers
+WORKER_START_METHOD = os.getenv('SATELLITE_WORKER_START_METHOD', 'forkserver')
+
+# Torch CPU threading (0 = leave torch defaults)
+INTRA_OP_THREADS = int(os.getenv('SATELLITE_INTRA_OP_THREADS', '0'))
+INTEROP_THREADS = int(os.getenv('SATELLITE_INTEROP_THREADS', '0'))
+
+# Tiled inference (0 = whole scene in one forward pass)
+INFERENCE_TILE_SIZE = int(os.getenv('SATELLITE_TILE_SIZE', '0'))
+INFERENCE_BATCH_SIZE = int(os.getenv('SATELLITE_TILE_BATCH_SIZE', '1'))
+# Context pixels inferred around each tile and then cropped away, so tile borders
+# do not show as seams (keep a multiple of 32, the model's downsampling factor)
+INFERENCE_TILE_OVERLAP = int(os.getenv('SATELLITE_TILE_OVERLAP', '32'))
+
 # Sentinel-2 band information
 BAND_NAMES = ['B01', 'B02', 'B03', 'B04', 'B05', 'B06', 'B07', 
               'B08', 'B09', 'B10', 'B11', 'B12', 'B8A']
 
+# Single-file input (band_io.py): band order of 13-band files without band
+# descriptions (comma-separated names in file order), and rows read per strip
+MULTIBAND_ORDER = os.getenv('SATELLITE_BAND_ORDER', ','.join(BAND_NAMES))
+BAND_READ_STRIP_ROWS = 1024
+
 # Selected bands for different analyses
 RGB_BANDS = [3, 2, 1]  # B04, B03, B02 (Red, Green, Blue)
 VEGETATION_BANDS = [7, 3, 2]  # B08 (NIR), B04 (Red), B03 (Green)
@@ -32,12 +53,113 @@ URBAN_BANDS = [11, 7, 3]  # B12 (SWIR), B08 (NIR), B04 (Red)
 CHANGE_THRESHOLD = 0.5
 VEGETATION_THRESHOLD = 0.3
 URBAN_THRESHOLD = 0.4
+INDEX_CHANGE_THRESHOLD = 0.1  # |dNDVI|, |dNDBI|, |dNDWI| above this counts as change in the report
+
+# Connected change regions (regions.py): patches smaller than this are dropped
+REGION_MIN_AREA_PIXELS = int(os.getenv('SATELLITE_REGION_MIN_AREA', '10'))
+REGION_CONNECTIVITY = 8
+
+# Histograms stored per analysis for re-thresholding without rerunning (histograms.py)
+HISTOGRAM_BIN_WIDTH = 0.001
+
+# Spectral-difference prefilter: skip model inference on tiles with negligible change
+PREFILTER_ENABLED = os.getenv('SATELLITE_PREFILTER', '0') == '1'
+PREFILTER_TILE_SIZE = 256
+PREFILTER_INDEX_THRESHOLD = 0.1  # |dNDVI|, |dNDBI| or |dNDWI| above this marks a pixel as changed
+PREFILTER_BAND_L1_THRESHOLD = 0.05  # mean absolute reflectance difference across the 13 bands
+PREFILTER_MIN_CHANGED_FRACTION = 0.002  # tiles with a larger share of changed pixels are inferred
+
+# Coarse-to-fine cascade: run the model on a downsampled scene first and refine at
+# full resolution only the tiles whose coarse change probability reaches
+# CHANGE_THRESHOLD - CASCADE_MARGIN (larger margin = closer to full-resolution quality)
+CASCADE_ENABLED = os.getenv('SATELLITE_CASCADE', '0') == '1'
+CASCADE_FACTOR = 4  # 2 or 4
+CASCADE_MARGIN = 0.15
+
+# Test-time augmentation: average over flip/rot90 variants, evaluated in one batched
+# forward pass (8 variants for square tiles, 4 flips for non-square scenes)
+TTA_ENABLED = os.getenv('SATELLITE_TTA', '0') == '1'
+
+# Cloud and haze masking (top-of-atmosphere reflectance, bands scaled to 0-1).
+# On by default: percentages and areas then cover valid (cloud-free) pixels only,
+# reported in data_quality, and scenes with any tile at least CLOUD_MAX_TILE_FRACTION
+# cloudy are inferred per tile. Set SATELLITE_CLOUD_MASK=0 for whole-scene statistics
+CLOUD_MASK_ENABLED = os.getenv('SATELLITE_CLOUD_MASK', '1') == '1'
+CIRRUS_THRESHOLD = 0.012  # B10 (SWIR-cirrus) is near zero for clear sky
+CLOUD_BRIGHTNESS_THRESHOLD = 0.3  # B02 and B04 both above this: opaque cloud
+CLOUD_SWIR_THRESHOLD = 0.2  # ...and B11 above this, which separates cloud from snow
+HAZE_THRESHOLD = 0.08  # Haze Optimized Transform: B02 - 0.5 * B04
+CLOUD_MAX_TILE_FRACTION = 0.99  # tiles at least this cloudy skip the model
+
+# LLM explanations: hard deadline per Gemini call (template text after it) and
+# concurrent calls; the API generates them in the background after responding
+LLM_TIMEOUT_SECONDS = float(os.getenv('SATELLITE_LLM_TIMEOUT', '20'))
+LLM_WORKERS = int(os.getenv('SATELLITE_LLM_WORKERS', '2'))
+# 'gemini', or 'local' for deterministic canned responses (offline load testing)
+LLM_BACKEND = os.getenv('SATELLITE_LLM_BACKEND', 'gemini')
+LLM_LOCAL_LATENCY_MS = float(os.getenv('SATELLITE_LLM_LOCAL_LATENCY_MS', '0'))
+
+# Persistent LLM response cache keyed by model, generation config and normalised prompt
+LLM_CACHE_ENABLED = os.getenv('SATELLITE_LLM_CACHE', '1') == '1'
+LLM_CACHE_PATH = os.getenv('SATELLITE_LLM_CACHE_PATH', os.path.join('outputs', 'llm_cache.sqlite'))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('SATELLITE_LLM_CACHE_TTL', str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv('SATELLITE_LLM_CACHE_MAX_MB', '50'))
+LLM_CACHE_DECIMALS = 2  # numbers in the prompt are rounded to this many decimals for the key
+
+# Admission control for analysis requests: estimated peak memory per request is
+# reserved against a budget (per API process); requests that don't fit wait in a
+# bounded queue and get 429 (queue full) or 503 (waited too long) with Retry-After
+ADMISSION_MEMORY_BUDGET_MB = float(os.getenv('SATELLITE_MEMORY_BUDGET_MB', '0'))  # 0 = half of RAM
+ADMISSION_QUEUE_SIZE = int(os.getenv('SATELLITE_ADMISSION_QUEUE', '8'))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv('SATELLITE_ADMISSION_MAX_WAIT', '120'))
+ADMISSION_BASE_MB = 150  # model, interpreter and figure overhead per request
+ADMISSION_BYTES_PER_PIXEL = 350  # band stacks, indices, outputs, masks, visualization
+ADMISSION_MODEL_BYTES_PER_PIXEL = 1200  # activations per pixel in one forward pass
+
+# Batch processing from a manifest (python batch_predict.py)
+BATCH_PREFETCH_THREADS = int(os.getenv('SATELLITE_BATCH_PREFETCH_THREADS', '2'))
+BATCH_ANALYSIS_WORKERS = int(os.getenv('SATELLITE_BATCH_ANALYSIS_WORKERS', '2'))
+BATCH_QUEUE_SIZE = int(os.getenv('SATELLITE_BATCH_QUEUE_SIZE', '4'))  # scenes held between stages
+BATCH_PAIRS_PER_STEP = int(os.getenv('SATELLITE_BATCH_PAIRS_PER_STEP', '4'))  # pairs merged per inference step
+
+# Change products written as Cloud-Optimized GeoTIFFs next to the PNG/JSON results
+COG_EXPORT_ENABLED = os.getenv('SATELLITE_COG_EXPORT', '1').lower() in ('1', 'true', 'yes')
+COG_BLOCK_SIZE = 512  # internal tile size; overviews are added until one tile covers the scene
+COG_COMPRESSION = os.getenv('SATELLITE_COG_COMPRESSION', 'deflate')
+
+# RGB to 13-band conversion (image_converter.py): rows converted at a time
+CONVERTER_STRIP_ROWS = int(os.getenv('SATELLITE_CONVERTER_STRIP_ROWS', '512'))
+
+# Spatial index of past analyses (footprints, dates, headline stats) for area searches
+SPATIAL_INDEX_PATH = os.getenv('SATELLITE_SPATIAL_INDEX', os.path.join('outputs', 'analyses.sqlite'))
+
+# Incremental site monitoring (monitoring.py): per-site last bands and cumulative change
+MONITOR_DIR = os.getenv('SATELLITE_MONITOR_DIR', os.path.join('outputs', 'sites'))
+
+# Columnar analytics store (analytics.py): one flat row per analysis in a Parquet
+# dataset partitioned by location and month; partitions with more small files than
+# ANALYTICS_COMPACT_FILES are merged into one
+ANALYTICS_ENABLED = os.getenv('SATELLITE_ANALYTICS', '1').lower() in ('1', 'true', 'yes')
+ANALYTICS_DIR = os.getenv('SATELLITE_ANALYTICS_DIR', os.path.join('outputs', 'analytics'))
+ANALYTICS_COMPACT_FILES = int(os.getenv('SATELLITE_ANALYTICS_COMPACT_FILES', '8'))
 
 # Output directories
 OUTPUT_DIR = "outputs"
 MODEL_DIR = "models"
 RESULTS_DIR = "results"
 
+# Host tuning profile written by `python tune.py` and applied at API startup
+HOST_PROFILE_PATH = os.getenv('SATELLITE_HOST_PROFILE', os.path.join(MODEL_DIR, 'host_profile.json'))
+
+# Model registry (model_registry.py): versioned checkpoints ({version}.pth) that the
+# admin endpoint loads, warms up on a synthetic scene of this size (0 = no warm-up)
+# and swaps in while the API keeps serving. The admin endpoints answer 403 until
+# SATELLITE_ADMIN_TOKEN is set, then need it in the X-Admin-Token header
+MODEL_REGISTRY_DIR = os.getenv('SATELLITE_MODEL_REGISTRY', os.path.join(MODEL_DIR, 'registry'))
+MODEL_WARMUP_SIZE = int(os.getenv('SATELLITE_MODEL_WARMUP_SIZE', '256'))
+MODEL_LOAD_TIMEOUT_SECONDS = float(os.getenv('SATELLITE_MODEL_LOAD_TIMEOUT', '300'))  # worker pools
+ADMIN_TOKEN = os.getenv('SATELLITE_ADMIN_TOKEN', '')
+
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(MODEL_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
@@ -3,13 +3,13 @@
 import os
 import numpy as np
 import warnings
-import rasterio
 from rasterio.errors import NotGeoreferencedWarning
 import torch
 from torch.utils.data import Dataset
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
 import config
+from band_io import read_bands
 
 # Suppress georeferencing warnings (we don't need GPS coordinates for change detection)
 warnings.filterwarnings('ignore', category=NotGeoreferencedWarning)
@@ -37,25 +37,22 @@ class OneraDataset(Dataset):
         return samples
     
     def _load_bands(self, city, time_idx):
-        """Load all 13 bands for a given city and time"""
+        """
+        Load all 13 bands for a given city and time, from the band folder or a
+        single multi-band GeoTIFF (a file inside it, or <folder>.tif next to it)
+        """
         folder = f"imgs_{time_idx}_rect" if self.use_rect else f"imgs_{time_idx}"
         
         # Try nested folder structure first
         city_path = os.path.join(self.root_dir, 'Onera Satellite Change Detection dataset - Images', city, folder)
-        if not os.path.exists(city_path):
+        if not os.path.exists(city_path) and not os.path.exists(f"{city_path}.tif"):
             # Try direct path
             city_path = os.path.join(self.root_dir, city, folder)
+        if not os.path.exists(city_path):
+            city_path = f"{city_path}.tif"
         
-        bands = []
-        for band_name in config.BAND_NAMES:
-            band_path = os.path.join(city_path, f"{band_name}.tif")
-            with rasterio.open(band_path) as src:
-                band_data = src.read(1).astype(np.float32)
-                # Normalize to 0-1 range
-                band_data = np.clip(band_data / 10000.0, 0, 1)
-                bands.append(band_data)
-        
-        return np.stack(bands, axis=0)  # Shape: (13, H, W)
+        # Normalized to 0-1 range
+        return read_bands(city_path)  # Shape: (13, H, W)
     
     def __len__(self):
         return len(self.samples)
@@ -0,0 +1,95 @@
+"""
+Background LLM explanations for finished analyses
+The API responds with the numeric report right away; explanations are produced
+here afterwards and fetched from /api/results/{analysis_id}/explanation
+"""
+
+import json
+import os
+import threading
+import concurrent.futures
+from datetime import datetime
+
+import config
+from llm_explainer import explain_with_timeout, write_llm_report
+
+EXPLANATION_FILE = 'llm_explanations.json'
+
+
+def load_saved_explanation(output_dir):
+    """Explanation written by a previous job (e.g. before a restart), or None"""
+    path = os.path.join(output_dir, EXPLANATION_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class ExplanationJobs:
+    """Generates explanations in background threads, keyed by analysis id"""
+
+    def __init__(self, explainer, timeout=None, workers=None):
+        """
+        Args:
+            explainer: LLMExplainer, or None to always use the template explanation
+            timeout: Deadline per LLM call in seconds (default: config.LLM_TIMEOUT_SECONDS)
+            workers: Explanations generated concurrently (default: config.LLM_WORKERS)
+        """
+        self.explainer = explainer
+        self.timeout = timeout
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers or config.LLM_WORKERS, thread_name_prefix='explanations'
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, analysis_id, report, output_dir=None):
+        """
+        Start generating the explanation for an analysis
+
+        Returns:
+            The job status (see status())
+        """
+        job = {
+            'status': 'pending',
+            'submitted_at': datetime.now().isoformat(),
+            'output_dir': output_dir
+        }
+        with self._lock:
+            self._jobs[analysis_id] = job
+            job['future'] = self._executor.submit(self._run, job, report)
+        return self.status(analysis_id)
+
+    def _run(self, job, report):
+        explanations = explain_with_timeout(self.explainer, report, self.timeout)
+        result = {
+            'status': 'ready',
+            'source': explanations['source'],
+            'completed_at': datetime.now().isoformat(),
+            'explanations': explanations
+        }
+        output_dir = job['output_dir']
+        if output_dir and os.path.isdir(output_dir):
+            with open(os.path.join(output_dir, EXPLANATION_FILE), 'w') as f:
+                json.dump(result, f, indent=4)
+            write_llm_report(report, explanations, os.path.join(output_dir, 'llm_report.txt'))
+        with self._lock:
+            job.update(result)
+        return result
+
+    def status(self, analysis_id):
+        """Job state without internals, or None for unknown analyses"""
+        with self._lock:
+            job = self._jobs.get(analysis_id)
+            if job is None:
+                return None
+            return {key: value for key, value in job.items() if key not in ('future', 'output_dir')}
+
+    def future(self, analysis_id):
+        """concurrent.futures.Future of the job, or None for unknown analyses"""
+        with self._lock:
+            job = self._jobs.get(analysis_id)
+            return job['future'] if job else None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,122 @@
+"""
+Quantized histograms of per-pixel change values
+Stored with each analysis so percentages and areas can be recomputed for other
+thresholds without the rasters or the model
+"""
+
+import numpy as np
+
+import config
+
+HISTOGRAM_FILE = 'histograms.npz'
+
+# (low, high) of each histogrammed quantity; index differences lie in [-2, 2]
+RANGES = {
+    'ndvi_diff': (-2.0, 2.0),
+    'ndbi_diff': (-2.0, 2.0),
+    'ndwi_diff': (-2.0, 2.0),
+    'change_probability': (0.0, 1.0)
+}
+
+# Values (and thresholds) equal to a bin edge after float32 rounding, which the
+# analyzer's comparisons inherit, count as on it
+EDGE_RTOL = float(np.finfo(np.float32).eps)
+EDGE_ATOL = 1e-12
+
+
+def _on_edge(values, edges):
+    return np.abs(values - edges) <= EDGE_RTOL * np.abs(edges) + EDGE_ATOL
+
+
+class QuantizedHistogram:
+    """
+    Fixed-width bin counts over [low, high) with O(1) threshold counts
+
+    Values lying exactly on a bin's lower edge (e.g. the zero differences of
+    unchanged or masked pixels) are also counted separately, so thresholds on
+    an edge give the analyzer's strict > and < counts.
+    """
+
+    def __init__(self, low, high, bin_width, counts, edge_counts=None):
+        self.low = float(low)
+        self.high = float(high)
+        self.bin_width = float(bin_width)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        # edge_counts[k] = number of values in bin k equal to its lower edge
+        if edge_counts is None:
+            edge_counts = np.zeros(len(self.counts), dtype=np.int64)
+        self.edge_counts = np.asarray(edge_counts, dtype=np.int64)
+        # cumulative[k] = number of values in bins < k
+        self.cumulative = np.concatenate([[0], np.cumsum(self.counts)])
+
+    @classmethod
+    def from_values(cls, values, low, high, bin_width=None):
+        """
+        Histogram of values (flattened; out-of-range values go to the edge bins)
+        """
+        bin_width = bin_width or config.HISTOGRAM_BIN_WIDTH
+        bins = int(round((high - low) / bin_width))
+        values = np.ravel(values).astype(np.float64)
+        position = (values - low) / bin_width
+        nearest = np.round(position)
+        on_edge = _on_edge(values, low + nearest * bin_width) & (nearest >= 0) & (nearest < bins)
+        # Snap values on an edge into the bin it opens (rounding can leave them just below it)
+        index = np.floor(np.where(on_edge, nearest, position))
+        index = np.clip(np.nan_to_num(index, nan=0), 0, bins - 1).astype(np.intp)
+        return cls(low, high, bin_width, np.bincount(index, minlength=bins),
+                   np.bincount(nearest[on_edge].astype(np.intp), minlength=bins))
+
+    @property
+    def total(self):
+        return int(self.cumulative[-1])
+
+    def _edge(self, threshold):
+        """
+        Returns:
+            (index of the bin edge nearest to threshold,
+             number of values on that edge,
+             -1, 0 or 1 as threshold is below, on or above the edge)
+        """
+        edge = int(round((threshold - self.low) / self.bin_width))
+        edge = min(max(edge, 0), len(self.counts))
+        on_edge = int(self.edge_counts[edge]) if edge < len(self.edge_counts) else 0
+        edge_value = self.low + edge * self.bin_width
+        side = 0 if _on_edge(threshold, edge_value) else (1 if threshold > edge_value else -1)
+        return edge, on_edge, side
+
+    def count_above(self, threshold):
+        """Values > threshold (exact to the bin width, exact on bin edges)"""
+        edge, on_edge, side = self._edge(threshold)
+        above = self.total - int(self.cumulative[edge])
+        # Values on the edge are not above a threshold at or past it
+        return above - on_edge if side >= 0 else above
+
+    def count_below(self, threshold):
+        """Values < threshold (exact to the bin width, exact on bin edges)"""
+        edge, on_edge, side = self._edge(threshold)
+        below = int(self.cumulative[edge])
+        # Values on the edge are below a threshold past it
+        return below + on_edge if side > 0 else below
+
+
+def save_histograms(path, histograms):
+    """Write {name: QuantizedHistogram} to a compressed .npz"""
+    arrays = {}
+    for name, histogram in histograms.items():
+        arrays[f'{name}__counts'] = histogram.counts
+        arrays[f'{name}__edges'] = histogram.edge_counts
+        arrays[f'{name}__bins'] = np.array([histogram.low, histogram.high, histogram.bin_width])
+    np.savez_compressed(path, **arrays)
+
+
+def load_histograms(path):
+    """Read histograms written by save_histograms (edge counts are optional)"""
+    histograms = {}
+    with np.load(path) as data:
+        for key in data.files:
+            name, kind = key.rsplit('__', 1)
+            if kind == 'counts':
+                low, high, bin_width = data[f'{name}__bins']
+                edges = data[f'{name}__edges'] if f'{name}__edges' in data.files else None
+                histograms[name] = QuantizedHistogram(low, high, bin_width, data[key], edges)
+    return histograms
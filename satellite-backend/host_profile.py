@@ -0,0 +1,93 @@
+"""
+Host tuning profile
+Thread, worker and tiling settings chosen by tune.py, applied at API startup
+"""
+
+import json
+import os
+import platform
+from datetime import datetime
+
+import torch
+
+import config
+
+# Profile key -> (config attribute, environment variable that overrides it)
+PROFILE_SETTINGS = {
+    'intra_op_threads': ('INTRA_OP_THREADS', 'SATELLITE_INTRA_OP_THREADS'),
+    'interop_threads': ('INTEROP_THREADS', 'SATELLITE_INTEROP_THREADS'),
+    'workers': ('INFERENCE_WORKERS', 'SATELLITE_INFERENCE_WORKERS'),
+    'tile_size': ('INFERENCE_TILE_SIZE', 'SATELLITE_TILE_SIZE'),
+    'batch_size': ('INFERENCE_BATCH_SIZE', 'SATELLITE_TILE_BATCH_SIZE'),
+}
+
+
+def host_fingerprint():
+    """Properties of the current host that a profile is only valid for"""
+    return {
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'torch': torch.__version__
+    }
+
+
+def configure_torch_threads(intra_op_threads=0, interop_threads=0):
+    """Set torch CPU thread pools (0 leaves the torch default)"""
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            pass
+
+
+def save_host_profile(best, trials, slo_ms, path=None):
+    """Write the tuning result to the profile file"""
+    path = path or config.HOST_PROFILE_PATH
+    profile = {
+        'created': datetime.now().isoformat(),
+        'host': host_fingerprint(),
+        'slo_ms': slo_ms,
+        'best': best,
+        'trials': trials
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=4)
+    return path
+
+
+def load_host_profile(path=None):
+    """Read the profile file, or None if the host has not been tuned"""
+    path = path or config.HOST_PROFILE_PATH
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def apply_host_profile(path=None):
+    """
+    Apply the tuned settings to config and the torch thread pools
+    
+    Environment variables that are set explicitly take precedence over the profile.
+    
+    Returns:
+        The loaded profile, or None if there is none
+    """
+    profile = load_host_profile(path)
+    
+    if profile:
+        if profile['host'].get('cpu_count') != os.cpu_count():
+            print(f"⚠️  Host profile was tuned on {profile['host'].get('cpu_count')} CPUs, "
+                  f"this host has {os.cpu_count()}; consider re-running tune.py")
+        for key, (attribute, env_var) in PROFILE_SETTINGS.items():
+            if key in profile['best'] and env_var not in os.environ:
+                setattr(config, attribute, profile['best'][key])
+        print(f"✓ Host profile applied: {profile['best']}")
+    
+    configure_torch_threads(config.INTRA_OP_THREADS, config.INTEROP_THREADS)
+    return profile
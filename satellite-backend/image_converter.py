@@ -5,98 +5,155 @@ Converts user-friendly formats to the required 13-band format
 
 import numpy as np
 import rasterio
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.windows import Window
 from PIL import Image
 import os
+import warnings
+
+import config
+from band_io import MULTIBAND_FILE, RGB_SOURCE, SOURCE_TAG
+
+# Synthetic bands as a linear combination of (red, green, blue) plus an offset,
+# one row per band in config.BAND_NAMES order (reflectance, 0-1 inputs).
+# This is a simplified simulation for demonstration.
+BAND_WEIGHTS = np.array([
+    [0.0, 0.0, 0.9],     # B01 Coastal aerosol (blue-ish)
+    [0.0, 0.0, 1.0],     # B02 Blue
+    [0.0, 1.0, 0.0],     # B03 Green
+    [1.0, 0.0, 0.0],     # B04 Red
+    [0.55, 0.55, 0.0],   # B05 Red Edge (between red and NIR)
+    [0.6, 0.6, 0.0],     # B06 Red Edge
+    [0.65, 0.65, 0.0],   # B07 Red Edge
+    [-0.8, 0.0, 0.0],    # B08 NIR (inverse of red, vegetation reflects NIR)
+    [0.0, 0.0, 0.7],     # B09 Water vapor
+    [0.0, 0.0, 0.5],     # B10 SWIR Cirrus
+    [0.5, 0.0, 0.5],     # B11 SWIR (urban/soil)
+    [0.55, 0.0, 0.55],   # B12 SWIR
+    [-0.75, 0.0, 0.0],   # B8A Narrow NIR
+], dtype=np.float32)
+BAND_OFFSETS = np.array([0, 0, 0, 0, 0, 0, 0, 0.8, 0, 0, 0, 0, 0.75], dtype=np.float32)
+
+# Band files hold reflectance * 10000 (typical satellite data range)
+REFLECTANCE_SCALE = 10000
+
 
 class ImageConverter:
     """Converts PNG/JPEG images to multi-band format for analysis"""
     
-    def __init__(self):
+    def __init__(self, strip_rows=None):
+        """
+        Args:
+            strip_rows: Rows converted at a time, which bounds memory for large
+                        images (default: config.CONVERTER_STRIP_ROWS)
+        """
         self.supported_formats = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
+        self.strip_rows = strip_rows or config.CONVERTER_STRIP_ROWS
     
     def is_supported(self, filename):
         """Check if file format is supported"""
         ext = os.path.splitext(filename.lower())[1]
         return ext in self.supported_formats
     
-    def convert_rgb_to_multispectral(self, rgb_image_path, output_folder):
+    def _load_rgb(self, rgb_image_path):
+        """(H, W, 3) uint8 array; grayscale is repeated into R, G and B, alpha is dropped"""
+        img = Image.open(rgb_image_path)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return np.asarray(img)
+    
+    def _strips(self, rgb):
+        """(row offset, bands) per strip of rows: (13, rows, W) float32 reflectance"""
+        # Normalize to 0-1 inside the weights
+        weights = BAND_WEIGHTS / np.float32(255.0)
+        height, width = rgb.shape[:2]
+        for row in range(0, height, self.strip_rows):
+            strip = rgb[row:row + self.strip_rows].reshape(-1, 3)
+            # One matrix product for all 13 bands: (13, 3) x (3, rows * W)
+            bands = (weights @ strip.T.astype(np.float32)).reshape(13, -1, width)
+            bands += BAND_OFFSETS[:, None, None]
+            yield row, bands
+    
+    def convert_rgb_to_array(self, rgb_image_path):
+        """
+        Convert an RGB image to the simulated 13 bands in memory, scaled like
+        ChangeDetectionPredictor.load_image_bands (reflectance clipped to 0-1)
+        
+        Returns:
+            (13, H, W) float32 array, ready for ChangeDetectionPredictor.predict_bands
+        """
+        rgb = self._load_rgb(rgb_image_path)
+        bands = np.empty((len(BAND_WEIGHTS),) + rgb.shape[:2], dtype=np.float32)
+        for row, strip in self._strips(rgb):
+            # Quantized like the band files, so both paths give the same input
+            strip *= REFLECTANCE_SCALE
+            np.trunc(strip, out=strip)
+            strip *= 1.0 / REFLECTANCE_SCALE
+            np.clip(strip, 0, 1, out=bands[:, row:row + strip.shape[1]])
+        return bands
+    
+    def convert_rgb_to_multispectral(self, rgb_image_path, output_folder, multiband=False):
         """
         Convert RGB image (PNG/JPEG) to simulated 13-band format
         
         This creates synthetic bands based on RGB data for demonstration.
         For real satellite analysis, use actual multi-band satellite imagery.
+        The image is converted in row strips, so memory stays bounded.
         
         Args:
             rgb_image_path: Path to RGB image (PNG/JPEG)
-            output_folder: Where to save the 13 .tif files
+            output_folder: Where to save the .tif files
+            multiband: Write one compressed 13-band GeoTIFF (MULTIBAND_FILE)
+                       instead of 13 single-band files
         
         Returns:
             List of created .tif file paths
         """
-        # Load RGB image
-        img = Image.open(rgb_image_path)
-        img_array = np.array(img)
-        
-        # Ensure RGB
-        if len(img_array.shape) == 2:  # Grayscale
-            img_array = np.stack([img_array] * 3, axis=-1)
-        elif img_array.shape[2] == 4:  # RGBA
-            img_array = img_array[:, :, :3]
-        
-        # Normalize to 0-1
-        img_array = img_array.astype(np.float32) / 255.0
-        
-        # Extract RGB channels
-        red = img_array[:, :, 0]
-        green = img_array[:, :, 1]
-        blue = img_array[:, :, 2]
-        
-        # Create synthetic bands based on RGB
-        # This is a simplified simulation for demonstration
-        bands = {
-            'B01': blue * 0.9,  # Coastal aerosol (blue-ish)
-            'B02': blue,  # Blue
-            'B03': green,  # Green
-            'B04': red,  # Red
-            'B05': (red + green) / 2 * 1.1,  # Red Edge (between red and NIR)
-            'B06': (red + green) / 2 * 1.2,  # Red Edge
-            'B07': (red + green) / 2 * 1.3,  # Red Edge
-            'B08': (1.0 - red) * 0.8,  # NIR (inverse of red, vegetation reflects NIR)
-            'B09': blue * 0.7,  # Water vapor
-            'B10': blue * 0.5,  # SWIR Cirrus
-            'B11': (red + blue) / 2,  # SWIR (urban/soil)
-            'B12': (red + blue) / 2 * 1.1,  # SWIR
-            'B8A': (1.0 - red) * 0.75,  # Narrow NIR
-        }
-        
-        # Create output folder
+        rgb = self._load_rgb(rgb_image_path)
+        height, width = rgb.shape[:2]
         os.makedirs(output_folder, exist_ok=True)
         
-        # Save each band as .tif
-        created_files = []
-        for band_name, band_data in bands.items():
-            output_path = os.path.join(output_folder, f'{band_name}.tif')
-            
-            # Scale to 0-10000 (typical satellite data range)
-            band_data_scaled = (band_data * 10000).astype(np.uint16)
-            
-            # Save as GeoTIFF
-            with rasterio.open(
-                output_path,
-                'w',
-                driver='GTiff',
-                height=band_data_scaled.shape[0],
-                width=band_data_scaled.shape[1],
-                count=1,
-                dtype=band_data_scaled.dtype,
-                crs=None,
-                transform=None
-            ) as dst:
-                dst.write(band_data_scaled, 1)
-            
-            created_files.append(output_path)
-        
-        return created_files
+        profile = {
+            'driver': 'GTiff',
+            'height': height,
+            'width': width,
+            'dtype': 'uint16',
+            'crs': None,
+            'transform': None
+        }
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', NotGeoreferencedWarning)
+            if multiband:
+                paths = [os.path.join(output_folder, MULTIBAND_FILE)]
+                # Pixel-interleaved tiles: a window read gets all bands in one pass
+                outputs = [rasterio.open(paths[0], 'w', count=len(BAND_WEIGHTS), tiled=True,
+                                         blockxsize=256, blockysize=256, interleave='pixel',
+                                         compress='zstd', zstd_level=1, predictor=2, **profile)]
+                for index, name in enumerate(config.BAND_NAMES, start=1):
+                    outputs[0].set_band_description(index, name)
+            else:
+                paths = [os.path.join(output_folder, f'{name}.tif') for name in config.BAND_NAMES]
+                outputs = [rasterio.open(path, 'w', count=1, **profile) for path in paths]
+            for dst in outputs:
+                dst.update_tags(**{SOURCE_TAG: RGB_SOURCE})
+        
+        try:
+            for row, strip in self._strips(rgb):
+                window = Window(0, row, width, strip.shape[1])
+                strip *= REFLECTANCE_SCALE
+                # Truncating cast, as the per-band astype(np.uint16) did
+                dn = np.empty(strip.shape, dtype=np.uint16)
+                np.copyto(dn, np.clip(strip, 0, np.iinfo(np.uint16).max, out=strip), casting='unsafe')
+                if multiband:
+                    outputs[0].write(dn, window=window)
+                else:
+                    for dst, band in zip(outputs, dn):
+                        dst.write(band, 1, window=window)
+        finally:
+            for dst in outputs:
+                dst.close()
+        
+        return paths
     
     def process_user_images(self, before_image, after_image, temp_dir):
         """
@@ -0,0 +1,118 @@
+"""
+Persistent cache of LLM responses keyed by prompt
+Stored in SQLite so it survives restarts and is shared by API worker processes
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import config
+
+_NUMBER = re.compile(r'-?\d+\.\d+')
+
+
+def normalise_prompt(prompt, decimals=None):
+    """
+    Prompt text with whitespace collapsed and decimals rounded, so reports whose
+    statistics only differ below the shown precision share a cache entry
+    """
+    decimals = config.LLM_CACHE_DECIMALS if decimals is None else decimals
+
+    def round_number(match):
+        value = round(float(match.group()), decimals)
+        return f"{value + 0.0:.{decimals}f}"  # + 0.0 turns -0.00 into 0.00
+
+    return ' '.join(_NUMBER.sub(round_number, prompt).split())
+
+
+def prompt_key(model, generation_config, prompt):
+    """Cache key: model name, generation settings and the normalised prompt"""
+    payload = json.dumps({
+        'model': model,
+        'config': generation_config,
+        'prompt': hashlib.sha256(normalise_prompt(prompt).encode('utf-8')).hexdigest()
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PromptCache:
+    """LLM response cache with a TTL and least-recently-used eviction by total size"""
+
+    def __init__(self, path=None, ttl_seconds=None, max_mb=None):
+        """
+        Args:
+            path: SQLite file (default: config.LLM_CACHE_PATH)
+            ttl_seconds: Entries older than this are not served (default: config.LLM_CACHE_TTL_SECONDS)
+            max_mb: Total response size kept before evicting (default: config.LLM_CACHE_MAX_MB)
+        """
+        self.path = path or config.LLM_CACHE_PATH
+        self.ttl_seconds = config.LLM_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.max_bytes = int((config.LLM_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def _connect(self):
+        # A short-lived connection per call keeps this safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key):
+        """Cached response text, or None when missing or expired"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, response):
+        """Store a response, then evict expired and least recently used entries over the size limit"""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                freed = 0
+                stale = []
+                for old_key, old_size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                    if total - freed <= self.max_bytes:
+                        break
+                    stale.append((old_key,))
+                    freed += old_size
+                conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def stats(self):
+        """Number of entries and their total size in bytes"""
+        with self._lock, self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {'entries': entries, 'bytes': size}
@@ -6,6 +6,13 @@ Uses Google Gemini API for high-quality explanations
 import json
 from typing import Dict
 import os
+import time
+import hashlib
+import concurrent.futures
+
+import config
+import metrics
+from llm_cache import PromptCache, prompt_key
 
 # Load environment variables from .env file
 try:
@@ -17,16 +24,35 @@ except ImportError:
 class LLMExplainer:
     """Generates natural language explanations from analysis results using Gemini"""
     
-    def __init__(self, api_key=None, model='gemini-2.5-flash-lite'):
+    def __init__(self, api_key=None, model='gemini-2.5-flash-lite', backend=None, cache=None,
+                 timeout=None):
         """
         Initialize LLM explainer with Gemini
         
         Args:
             api_key: Gemini API key (or set GEMINI_API_KEY env variable)
             model: Gemini model name (default: 'gemini-2.5-flash-lite')
+            backend: 'gemini', or 'local' for deterministic canned responses that need
+                     no key or network, for offline load tests (default: config.LLM_BACKEND)
+            cache: PromptCache for responses; created from config when
+                   config.LLM_CACHE_ENABLED and not given
+            timeout: HTTP timeout of each Gemini request in seconds, so a call
+                     abandoned by explain_with_timeout still ends and frees its
+                     thread (default: config.LLM_TIMEOUT_SECONDS)
         """
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
         self.model = model
+        self.backend = backend or config.LLM_BACKEND
+        self.generation_config = {'temperature': 0.3, 'top_p': 0.9, 'max_output_tokens': 2000}
+        self.cache = cache if cache is not None else (PromptCache() if config.LLM_CACHE_ENABLED else None)
+        
+        if self.backend == 'local':
+            self.model = f"local-{model}"
+            self.client = None
+            print(f"✓ Local LLM stand-in initialized ({self.model})")
+            return
+        if self.backend != 'gemini':
+            raise ValueError(f"Unknown LLM backend '{self.backend}' (expected 'gemini' or 'local')")
         
         if not self.api_key:
             raise ValueError("Gemini API key required. Set GEMINI_API_KEY environment variable or pass api_key parameter.")
@@ -36,7 +62,11 @@ class LLMExplainer:
             from google import genai
             from google.genai import types
             
-            self.client = genai.Client(api_key=self.api_key)
+            timeout = config.LLM_TIMEOUT_SECONDS if timeout is None else timeout
+            self.client = genai.Client(
+                api_key=self.api_key,
+                http_options=types.HttpOptions(timeout=int(timeout * 1000))  # milliseconds
+            )
             self.types = types
             print(f"✓ Gemini initialized ({model})")
         except ImportError:
@@ -67,7 +97,7 @@ class LLMExplainer:
         print("🤖 Generating LLM explanation...")
         
         # Get LLM response
-        explanation_text = self._call_gemini(prompt)
+        explanation_text = self._call_llm(prompt)
         
         # Parse into sections
         explanations = self._parse_response(explanation_text)
@@ -119,6 +149,50 @@ Use the exact percentages and areas from the data. Be specific and quantitative.
 
         return prompt
     
+    def _call_llm(self, prompt):
+        """Response for a prompt from the cache, or from the backend (then cached)"""
+        key = None
+        if self.cache is not None:
+            key = prompt_key(self.model, self.generation_config, prompt)
+            cached = self.cache.get(key)
+            metrics.record_cache('llm', cached is not None)
+            if cached is not None:
+                print("  LLM response served from cache")
+                return cached
+        
+        if self.backend == 'local':
+            text = self._call_local(prompt)
+        else:
+            text = self._call_gemini(prompt)
+        
+        if key is not None:
+            self.cache.put(key, text)
+        return text
+    
+    def _call_local(self, prompt):
+        """
+        Deterministic canned response in the format the Gemini prompt asks for
+        
+        Sleeps config.LLM_LOCAL_LATENCY_MS to mimic the network round trip.
+        """
+        if config.LLM_LOCAL_LATENCY_MS:
+            time.sleep(config.LLM_LOCAL_LATENCY_MS / 1000)
+        
+        facts = [line.strip() for line in prompt.splitlines() if line.strip().startswith('- ')]
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        return "\n".join([
+            "1. EXECUTIVE SUMMARY",
+            f"Local stand-in response {digest}. The report lists {len(facts)} measurements.",
+            "2. DETAILED ANALYSIS",
+            *facts,
+            "3. ENVIRONMENTAL IMPACT",
+            "Impact assessment is not available from the local stand-in backend.",
+            "4. RECOMMENDATIONS",
+            "- Re-run with the Gemini backend for a written assessment",
+            "5. KEY INSIGHTS",
+            *facts[-3:]
+        ])
+    
     def _call_gemini(self, prompt):
         """Call Gemini API"""
         
@@ -127,17 +201,15 @@ Use the exact percentages and areas from the data. Be specific and quantitative.
             response = self.client.models.generate_content(
                 model=self.model,
                 contents=prompt,
-                config=self.types.GenerateContentConfig(
-                    temperature=0.3,
-                    top_p=0.9,
-                    max_output_tokens=2000
-                )
+                config=self.types.GenerateContentConfig(**self.generation_config)
             )
             
-            return response.text
-            
         except Exception as e:
-            return f"Error calling Gemini: {str(e)}"
+            raise RuntimeError(f"Error calling Gemini: {str(e)}")
+        
+        if not response.text:
+            raise RuntimeError("Gemini returned an empty response")
+        return response.text
     
     def _parse_response(self, text):
         """Parse LLM response into structured sections"""
@@ -187,6 +259,171 @@ Use the exact percentages and areas from the data. Be specific and quantitative.
         return sections
 
 
+# Gemini calls run here so callers can stop waiting after a deadline
+_LLM_CALLS = concurrent.futures.ThreadPoolExecutor(max_workers=config.LLM_WORKERS,
+                                                   thread_name_prefix='llm')
+
+
+def template_explanation(analysis_report: Dict) -> Dict[str, str]:
+    """
+    Explanation sections filled in from the report numbers, without an LLM
+    
+    Used when Gemini is not configured, fails or misses its deadline.
+    """
+    metadata = analysis_report['metadata']
+    veg = analysis_report['vegetation_analysis']
+    urban = analysis_report['urban_analysis']
+    water = analysis_report['water_analysis']
+    summary = analysis_report.get('summary', [])
+    
+    executive_summary = (
+        f"Between {metadata['date_before']} and {metadata['date_after']}, the analysis of "
+        f"{metadata['location']} found: " + "; ".join(summary) + "."
+    )
+    detailed_analysis = (
+        f"Vegetation: {veg['vegetation_increase_percent']:.2f}% of the area gained and "
+        f"{veg['vegetation_decrease_percent']:.2f}% lost vegetation (mean NDVI change "
+        f"{veg['mean_ndvi_change']:.4f}).\n"
+        f"Urban: {urban['urbanization_percent']:.2f}% urbanization, "
+        f"{urban['construction_area_km2']:.2f} km² of construction and "
+        f"{urban['demolition_area_km2']:.2f} km² of demolition (mean NDBI change "
+        f"{urban['mean_ndbi_change']:.4f}).\n"
+        f"Water: {water['water_increase_percent']:.2f}% increase and "
+        f"{water['water_decrease_percent']:.2f}% decrease "
+        f"({water['water_gain_area_km2']:.2f} km² gained, {water['water_loss_area_km2']:.2f} km² lost)."
+    )
+    largest = max(
+        ('vegetation loss', veg['vegetation_decrease_percent']),
+        ('vegetation gain', veg['vegetation_increase_percent']),
+        ('urbanization', urban['urbanization_percent']),
+        ('water loss', water['water_decrease_percent']),
+        ('water gain', water['water_increase_percent']),
+        key=lambda item: item[1]
+    )
+    environmental_impact = (
+        f"The largest change by area is {largest[0]} ({largest[1]:.2f}% of the scene). "
+        "These figures come from spectral indices and should be confirmed on the ground."
+    )
+    recommendations = (
+        "- Verify the areas of largest change with higher-resolution imagery\n"
+        "- Repeat the analysis with images from the same season to rule out phenology\n"
+        "- Monitor the site periodically to confirm the trend"
+    )
+    key_insights = "\n".join(f"- {item}" for item in summary)
+    
+    sections = {
+        'executive_summary': executive_summary,
+        'detailed_analysis': detailed_analysis,
+        'environmental_impact': environmental_impact,
+        'recommendations': recommendations,
+        'key_insights': key_insights
+    }
+    sections['full_text'] = "\n\n".join(sections.values())
+    return sections
+
+
+def explain_with_timeout(explainer, analysis_report: Dict, timeout=None) -> Dict[str, str]:
+    """
+    LLM explanation with a hard deadline and a template fallback
+    
+    Args:
+        explainer: LLMExplainer, or None to use the template directly
+        analysis_report: JSON report from analyzer
+        timeout: Seconds to wait for the LLM (default: config.LLM_TIMEOUT_SECONDS)
+    
+    Returns:
+        Explanation sections plus 'source' ('llm' or 'template') and, after a
+        fallback, 'fallback_reason'
+    """
+    timeout = config.LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    reason = "LLM explainer not configured"
+    if explainer is not None:
+        future = _LLM_CALLS.submit(explainer.generate_explanation, analysis_report)
+        try:
+            explanations = future.result(timeout=timeout)
+            explanations['source'] = 'llm'
+            return explanations
+        except concurrent.futures.TimeoutError:
+            # A call still queued is dropped; a running one ends at the client's
+            # HTTP timeout and its result is discarded
+            future.cancel()
+            reason = f"LLM did not answer within {timeout:.0f}s"
+        except Exception as e:
+            reason = str(e)
+        print(f"⚠️  Using template explanation: {reason}")
+    
+    explanations = template_explanation(analysis_report)
+    explanations['source'] = 'template'
+    explanations['fallback_reason'] = reason
+    return explanations
+
+
+def write_llm_report(report, explanations, output_path):
+    """Write the LLM-enhanced text report"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write("ENVIRONMENTAL CHANGE ANALYSIS - LLM ENHANCED REPORT\n")
+        f.write("=" * 80 + "\n\n")
+        
+        # Metadata
+        f.write("LOCATION: " + report['metadata']['location'] + "\n")
+        f.write("TIME PERIOD: " + report['metadata']['date_before'] + 
+               " to " + report['metadata']['date_after'] + "\n")
+        f.write("ANALYSIS DATE: " + report['metadata']['analysis_date'] + "\n")
+        f.write("\n" + "=" * 80 + "\n\n")
+        
+        # Executive Summary
+        f.write("EXECUTIVE SUMMARY\n")
+        f.write("-" * 80 + "\n")
+        f.write(explanations['executive_summary'].strip() + "\n\n")
+        
+        # Detailed Analysis
+        f.write("DETAILED ANALYSIS\n")
+        f.write("-" * 80 + "\n")
+        f.write(explanations['detailed_analysis'].strip() + "\n\n")
+        
+        # Environmental Impact
+        f.write("ENVIRONMENTAL IMPACT ASSESSMENT\n")
+        f.write("-" * 80 + "\n")
+        f.write(explanations['environmental_impact'].strip() + "\n\n")
+        
+        # Recommendations
+        f.write("RECOMMENDATIONS\n")
+        f.write("-" * 80 + "\n")
+        f.write(explanations['recommendations'].strip() + "\n\n")
+        
+        # Key Insights
+        f.write("KEY INSIGHTS\n")
+        f.write("-" * 80 + "\n")
+        f.write(explanations['key_insights'].strip() + "\n\n")
+        
+        # Raw Data Section
+        f.write("=" * 80 + "\n")
+        f.write("RAW DATA\n")
+        f.write("=" * 80 + "\n\n")
+        
+        veg = report['vegetation_analysis']
+        f.write("VEGETATION METRICS:\n")
+        f.write(f"  Increase: {veg['vegetation_increase_percent']:.2f}%\n")
+        f.write(f"  Decrease: {veg['vegetation_decrease_percent']:.2f}%\n")
+        f.write(f"  Mean NDVI Change: {veg['mean_ndvi_change']:.4f}\n\n")
+        
+        urban = report['urban_analysis']
+        f.write("URBAN METRICS:\n")
+        f.write(f"  Urbanization: {urban['urbanization_percent']:.2f}%\n")
+        f.write(f"  Construction: {urban['construction_area_km2']:.2f} km²\n")
+        f.write(f"  Demolition: {urban['demolition_area_km2']:.2f} km²\n\n")
+        
+        water = report['water_analysis']
+        f.write("WATER METRICS:\n")
+        f.write(f"  Increase: {water['water_increase_percent']:.2f}%\n")
+        f.write(f"  Decrease: {water['water_decrease_percent']:.2f}%\n")
+        f.write(f"  Gain: {water['water_gain_area_km2']:.2f} km²\n")
+        f.write(f"  Loss: {water['water_loss_area_km2']:.2f} km²\n\n")
+        
+        f.write("=" * 80 + "\n")
+
+
 def test_explainer():
     """Test the LLM explainer with sample data"""
     
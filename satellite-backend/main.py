@@ -3,9 +3,9 @@ FastAPI Backend for Satellite Change Detection with LLM Integration
 Handles image upload, model inference, and LLM-powered analysis
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, List
 import os
@@ -14,6 +14,11 @@ import shutil
 import uuid
 from datetime import datetime
 import json
+import time
+import asyncio
+import functools
+import threading
+import hmac
 import torch
 from pathlib import Path
 
@@ -26,6 +31,23 @@ from dotenv import load_dotenv
 load_dotenv(BASE_DIR.parent / '.env')
 
 from predict import ChangeDetectionPredictor
+from model import resolve_tasks
+from host_profile import apply_host_profile
+from llm_explainer import LLMExplainer
+from explanations import ExplanationJobs, load_saved_explanation
+from roi import locate_roi, parse_roi
+from cog_export import read_georeference
+from band_io import MULTIBAND_FILE, MULTIBAND_EXTENSIONS, check_multiband, parse_band_order
+from spatial_index import AnalysisIndex
+from analytics import AnalyticsStore, PYARROW_AVAILABLE
+from model_registry import ModelRegistry, checkpoint_info, warm_up
+from worker_pool import InferenceWorkerPool, WorkerPoolClosed
+from analyzer import EnvironmentalAnalyzer
+from histograms import load_histograms
+from monitoring import SiteMonitor, CUMULATIVE_PRODUCT
+from regions import KINDS, load_regions, query_regions, region_records
+from admission import AdmissionController, AdmissionRejected, raster_size, estimate_analysis_bytes
+import metrics
 import config
 
 app = FastAPI(
@@ -43,8 +65,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global predictor instance
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and their latency per route template"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        metrics.observe_request(request.method, endpoint, status, time.perf_counter() - start)
+
+# Global predictor instance (or worker pool when SATELLITE_INFERENCE_WORKERS > 0);
+# replaced as a whole when another model version is activated
 predictor = None
+worker_pool = None
+# Versioned checkpoints, the version being served and the background swap state
+model_registry = None
+model_info = None
+model_swap = {"state": "idle"}
+_swap_lock = threading.Lock()
+# LLM explanations are generated in the background after each analysis responds
+explanation_jobs = None
+# Per-site state for incremental monitoring (needs the in-process predictor)
+site_monitor = None
+# Footprints of finished analyses, for area/time searches
+analysis_index = None
+# Flat metrics of finished analyses in Parquet, for fleet-level statistics
+analytics_store = None
+# Analyses reserve their estimated memory before any upload is saved
+admission = AdmissionController()
 UPLOAD_DIR = BASE_DIR / "backend" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -56,19 +109,139 @@ class AnalysisRequest(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize model on startup"""
-    global predictor
-    model_path = BASE_DIR / 'models' / 'best_model.pth'
+    global predictor, worker_pool, explanation_jobs, analysis_index, analytics_store, site_monitor
+    global model_registry, model_info
+    model_registry = ModelRegistry(root=str(BASE_DIR / config.MODEL_REGISTRY_DIR),
+                                   default_path=str(BASE_DIR / 'models' / 'best_model.pth'))
+    model_path, version = model_registry.resolve()
+    model_path = Path(model_path)
+    
+    analysis_index = AnalysisIndex()
+    if analysis_index.count() == 0:
+        indexed = analysis_index.rebuild(str(UPLOAD_DIR))
+        if indexed:
+            print(f"🗺️  Indexed {indexed} past analyses")
+    
+    if config.ANALYTICS_ENABLED and PYARROW_AVAILABLE:
+        analytics_store = AnalyticsStore()
+        if analytics_store.count() == 0:
+            added = analytics_store.rebuild(str(UPLOAD_DIR))
+            if added:
+                print(f"📊 Added {added} past analyses to the analytics dataset")
+    elif config.ANALYTICS_ENABLED:
+        print("⚠️  pyarrow not installed, analytics dataset disabled")
+    
+    # Threads, worker count and tiling tuned for this host (python tune.py)
+    apply_host_profile()
     
     if not model_path.exists():
         print(f"⚠️  Model not found at {model_path}")
-        print("API will run in limited mode (indices only)")
+        print("API will run in limited mode (indices only) until a model version is activated")
         return
     
     print("🚀 Loading AI model...")
+    
     # Set memory optimization
     os.environ['PYTORCH_CUDA_ALLOC_CONF'] = 'expandable_segments:True'
-    predictor = ChangeDetectionPredictor(str(model_path))
-    print("✅ Model loaded successfully")
+    load_start = time.perf_counter()
+    model_info = checkpoint_info(str(model_path), version)
+    predictor, worker_pool = _load_serving_model(str(model_path), model_info)
+    if predictor is not None:
+        site_monitor = SiteMonitor(predictor)
+    metrics.record_model_load(time.perf_counter() - load_start)
+    print(f"✅ Model {model_info['version']} loaded successfully")
+    explanation_jobs = _create_explanation_jobs()
+
+def _create_explanation_jobs():
+    """Background explanation jobs, reusing the predictor's Gemini client when there is one"""
+    explainer = predictor.llm_explainer if predictor is not None else None
+    if explainer is None:
+        try:
+            explainer = LLMExplainer(model='gemini-2.5-flash-lite')
+        except Exception as e:
+            print(f"⚠️  LLM explainer not available, using template explanations: {e}")
+    return ExplanationJobs(explainer)
+
+def _load_serving_model(model_path: str, info: Dict):
+    """
+    Load a checkpoint the way this process serves it and warm it up
+    
+    Returns:
+        (predictor, None), or (None, worker pool) when SATELLITE_INFERENCE_WORKERS > 0
+    """
+    if config.INFERENCE_WORKERS > 0:
+        pool = InferenceWorkerPool(model_path, config.INFERENCE_WORKERS, model_info=info)
+        if not pool.wait_ready(config.MODEL_LOAD_TIMEOUT_SECONDS):
+            pool.shutdown()
+            raise RuntimeError("Inference workers did not finish loading the model")
+        return None, pool
+    new_predictor = ChangeDetectionPredictor(model_path, model_info=info)
+    seconds = warm_up(new_predictor.model)
+    print(f"🔥 Model warmed up in {seconds * 1000:.0f} ms")
+    return new_predictor, None
+
+def _swap_model(version: str):
+    """
+    Load, warm up and activate a registered model version (background thread)
+    
+    The old model keeps serving until the new one is ready. Requests pick up
+    the model when they start, so in-flight ones finish on the old weights: the
+    running in-process prediction holds _predict_lock, and the old worker pool
+    drains its queue before it stops.
+    """
+    global predictor, worker_pool, model_info, site_monitor, explanation_jobs
+    try:
+        model_path = model_registry.path(version)
+        info = checkpoint_info(model_path, version)
+        load_start = time.perf_counter()
+        new_predictor, new_pool = _load_serving_model(model_path, info)
+        load_seconds = time.perf_counter() - load_start
+        metrics.record_model_load(load_seconds)
+        
+        with _predict_lock:
+            old_pool = worker_pool
+            predictor, worker_pool, model_info = new_predictor, new_pool, info
+            if new_predictor is not None:
+                if site_monitor is None:
+                    site_monitor = SiteMonitor(new_predictor)
+                else:
+                    site_monitor.predictor = new_predictor
+        if explanation_jobs is None:
+            explanation_jobs = _create_explanation_jobs()
+        model_registry.set_active(version)
+        print(f"🔄 Now serving model {version} (loaded in {load_seconds:.1f}s)")
+        
+        with _swap_lock:
+            model_swap.update(state="draining" if old_pool is not None else "idle",
+                              load_seconds=round(load_seconds, 2))
+        if old_pool is not None:
+            old_pool.shutdown(timeout=None)
+        with _swap_lock:
+            model_swap.update(state="idle", finished=datetime.now().isoformat())
+    except Exception as e:
+        print(f"❌ Could not activate model {version}: {e}")
+        with _swap_lock:
+            model_swap.update(state="failed", error=str(e), finished=datetime.now().isoformat())
+
+def _check_admin(request: Request):
+    """
+    Admin endpoints are off unless SATELLITE_ADMIN_TOKEN is set, and then need
+    it in the X-Admin-Token header
+    """
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set SATELLITE_ADMIN_TOKEN)")
+    token = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop inference workers"""
+    if worker_pool is not None:
+        worker_pool.shutdown()
+    if explanation_jobs is not None:
+        explanation_jobs.shutdown()
+    metrics.mark_process_dead()
 
 @app.get("/")
 async def root():
@@ -79,9 +252,20 @@ async def root():
         "features": ["AI Model", "LLM Explanations", "Environmental Indices"],
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "analyze": "/api/analyze",
+            "analyze_stream": "/api/analyze/stream",
             "results": "/api/results/{analysis_id}",
-            "visualization": "/api/results/{analysis_id}/image"
+            "visualization": "/api/results/{analysis_id}/image",
+            "trace": "/api/results/{analysis_id}/trace",
+            "explanation": "/api/results/{analysis_id}/explanation",
+            "products": "/api/results/{analysis_id}/products/{name}",
+            "search": "/api/analyses/search",
+            "analytics": "/api/analytics",
+            "rethreshold": "/api/results/{analysis_id}/rethreshold",
+            "regions": "/api/results/{analysis_id}/regions",
+            "sites": "/api/sites/{site_id}",
+            "models": "/api/admin/models"
         }
     }
 
@@ -91,51 +275,86 @@ async def health_check():
     gemini_key = os.getenv('GEMINI_API_KEY', '')
     return {
         "status": "healthy",
-        "model_loaded": predictor is not None,
+        "model_loaded": predictor is not None or worker_pool is not None,
+        "model": model_info,
+        "model_swap": model_swap["state"],
+        "inference_workers": worker_pool.num_workers if worker_pool else 0,
+        "inference_workers_alive": worker_pool.alive_workers if worker_pool else 0,
         "gemini_configured": bool(gemini_key and gemini_key != 'your-new-gemini-api-key-here'),
+        "admission": admission.status(),
         "timestamp": datetime.now().isoformat()
     }
 
-@app.post("/api/analyze")
-async def analyze_images(
-    before_images: List[UploadFile] = File(...),
-    after_images: List[UploadFile] = File(...),
-    location: str = "Unknown",
-    date_before: Optional[str] = None,
-    date_after: Optional[str] = None
-):
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: request rates, stage latencies, queue depth, memory, threads"""
+    metrics.update_process_gauges(worker_pool)
+    body, content_type, status_code = metrics.render()
+    # CONTENT_TYPE_LATEST already carries the charset
+    return Response(content=body, status_code=status_code, headers={"Content-Type": content_type})
+
+async def _admit(before_images, after_images, tta):
     """
-    Analyze satellite image changes with AI model and LLM
+    Reserve memory for an analysis, waiting in the admission queue if needed
     
-    Accepts:
-    - 13 .tif files for before and 13 .tif files for after (original format)
-    - OR 1 PNG/JPEG for before and 1 PNG/JPEG for after (user-friendly)
+    The cost is estimated from the largest upload's dimensions, read from the
+    file headers, so oversized requests are refused before anything is decoded.
+    
+    Returns:
+        Ticket to release once the analysis is finished
+    """
+    height = width = 0
+    for file in list(before_images) + list(after_images):
+        try:
+            h, w = raster_size(file.file)
+        except Exception:
+            continue  # unreadable files are reported by the analysis itself
+        if h * w > height * width:
+            height, width = h, w
+    
+    tta = config.TTA_ENABLED if tta is None else tta
+    try:
+        return await admission.admit(estimate_analysis_bytes(height, width, tta=tta))
+    except AdmissionRejected as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+def _start_analysis(before_images, after_images, location, date_before, date_after,
+                    tasks, prefilter, cloud_mask, cascade, tta, trace, roi, band_order=None):
     """
-    if predictor is None:
+    Validate an analysis request, save the uploads and prepare the predict() arguments
+    
+    Returns:
+        Analysis context used by _run_analysis
+    """
+    if predictor is None and worker_pool is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
-    # Check Gemini API key
-    gemini_key = os.getenv('GEMINI_API_KEY', '')
-    if not gemini_key or gemini_key == 'your-new-gemini-api-key-here':
-        raise HTTPException(
-            status_code=503, 
-            detail="Gemini API key not configured. Please set GEMINI_API_KEY in TerraTrack_BitNBuild/.env file. Get your key from https://aistudio.google.com/app/apikey"
-        )
+    try:
+        tasks = resolve_tasks(tasks)
+        if roi:
+            parse_roi(roi)  # validated here, checked against the scene once saved
+        if band_order:
+            parse_band_order(band_order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Check if using RGB images (PNG/JPEG) or multi-band (TIF)
-    is_rgb_mode = False
+    # Check if using RGB images (PNG/JPEG), one multi-band GeoTIFF or 13 band files per date
+    is_rgb_mode = is_multiband_mode = False
     if len(before_images) == 1 and len(after_images) == 1:
         before_ext = os.path.splitext(before_images[0].filename.lower())[1]
         after_ext = os.path.splitext(after_images[0].filename.lower())[1]
         if before_ext in ['.png', '.jpg', '.jpeg'] and after_ext in ['.png', '.jpg', '.jpeg']:
             is_rgb_mode = True
             print("📸 RGB mode detected - will convert to multi-band")
+        elif before_ext in MULTIBAND_EXTENSIONS and after_ext in MULTIBAND_EXTENSIONS:
+            is_multiband_mode = True
     
     # Validate file count for multi-band mode
-    if not is_rgb_mode and (len(before_images) != 13 or len(after_images) != 13):
+    if not (is_rgb_mode or is_multiband_mode) and (len(before_images) != 13 or len(after_images) != 13):
         raise HTTPException(
             status_code=400,
-            detail=f"Expected 13 bands for each image OR 1 RGB image each. Got {len(before_images)} before and {len(after_images)} after"
+            detail=f"Expected 13 bands for each image, 1 multi-band GeoTIFF each OR 1 RGB image each. Got {len(before_images)} before and {len(after_images)} after"
         )
     
     # Create unique analysis ID
@@ -148,6 +367,33 @@ async def analyze_images(
     before_dir.mkdir(parents=True, exist_ok=True)
     after_dir.mkdir(parents=True, exist_ok=True)
     
+    # Results go to a folder unique to this analysis
+    result_folder = f"{location}_{analysis_id}_{timestamp}"
+    context = {
+        "analysis_id": analysis_id,
+        "analysis_dir": analysis_dir,
+        "result_folder": result_folder,
+        "location": location,
+        "tasks": tasks,
+        "is_rgb_mode": is_rgb_mode,
+        "predict_kwargs": dict(
+            img1_folder=str(before_dir),
+            img2_folder=str(after_dir),
+            date1=date_before or "Unknown",
+            date2=date_after or "Unknown",
+            location=location,
+            tasks=tasks,
+            prefilter=prefilter,
+            cloud_mask=False if is_rgb_mode and cloud_mask is None else cloud_mask,
+            cascade=cascade,
+            tta=tta,
+            trace=trace,
+            roi=roi or None,
+            explain=False,
+            output_dir=str(BASE_DIR / 'results' / result_folder)
+        )
+    }
+    
     try:
         # Save uploaded files
         print(f"📁 Saving uploaded files for analysis {analysis_id}...")
@@ -166,11 +412,14 @@ async def analyze_images(
             with open(after_rgb_path, "wb") as f:
                 shutil.copyfileobj(after_images[0].file, f)
             
-            # Convert to multi-band
+            # Convert to one multi-band file per date
             print("🔄 Converting RGB to multi-band format...")
-            converter.convert_rgb_to_multispectral(str(before_rgb_path), str(before_dir))
-            converter.convert_rgb_to_multispectral(str(after_rgb_path), str(after_dir))
+            converter.convert_rgb_to_multispectral(str(before_rgb_path), str(before_dir), multiband=True)
+            converter.convert_rgb_to_multispectral(str(after_rgb_path), str(after_dir), multiband=True)
             print("✓ Conversion complete")
+        elif is_multiband_mode:
+            _save_multiband(before_images[0], before_dir, band_order)
+            _save_multiband(after_images[0], after_dir, band_order)
         else:
             # Save multi-band TIF files
             for file in before_images:
@@ -183,21 +432,107 @@ async def analyze_images(
                 with open(file_path, "wb") as f:
                     shutil.copyfileobj(file.file, f)
         
-        print(f"🤖 Running AI analysis...")
-        start_time = datetime.now()
+        if roi:
+            _check_roi_overlap(roi, before_dir)
         
+        # Placeholder so /api/results/{id} and the image endpoint work while running
+        _save_response(context, {
+            "status": "running",
+            "analysis_id": analysis_id,
+            "location": location,
+            "data": {},
+            "result_folder": result_folder
+        })
+    except HTTPException:
+        _discard_analysis(context)
+        raise
+    except Exception as e:
+        _discard_analysis(context)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return context
+
+def _check_roi_overlap(roi: str, bands_dir: Path):
+    """400 for an ROI that misses the uploaded scene, before the analysis is queued"""
+    georef = read_georeference(str(bands_dir))
+    try:
+        locate_roi(parse_roi(roi), georef['height'], georef['width'], georef['transform'])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _save_multiband(upload: UploadFile, bands_dir: Path, band_order: Optional[str] = None):
+    """
+    Save a single multi-band GeoTIFF/COG upload as bands_dir/MULTIBAND_FILE
+    
+    band_order is written into the band descriptions (see band_io.check_multiband)
+    """
+    path = bands_dir / MULTIBAND_FILE
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f)
+    try:
+        check_multiband(str(path), band_order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _save_response(context: Dict, response: Dict):
+    with open(context["analysis_dir"] / "response.json", 'w') as f:
+        json.dump(response, f, indent=4)
+
+def _discard_analysis(context: Dict):
+    """Cleanup after a failed analysis"""
+    if context["analysis_dir"].exists():
+        shutil.rmtree(context["analysis_dir"])
+    
+    # Clear GPU cache on error
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+# In-process predictions run one at a time: the profiler hooks sit on the shared model
+_predict_lock = threading.Lock()
+
+def _predict_in_process(predict_kwargs: Dict, progress=None):
+    with _predict_lock:
+        return predictor.predict(progress=progress, **predict_kwargs)
+
+async def _run_analysis(context: Dict, progress=None):
+    """
+    Run the prediction, start the background explanation and save the response
+    
+    Args:
+        progress: Optional thread-safe callback(event, data) for the stage events
+    
+    Returns:
+        The response dictionary (also served by /api/results/{analysis_id})
+    """
+    analysis_id = context["analysis_id"]
+    print(f"🤖 Running AI analysis...")
+    start_time = datetime.now()
+    
+    try:
         # Clear GPU cache before inference
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         
-        # Run prediction with LLM
-        report = predictor.predict(
-            str(before_dir),
-            str(after_dir),
-            date_before or "Unknown",
-            date_after or "Unknown",
-            location
-        )
+        # Run prediction (off the event loop, so other requests and streams keep going)
+        with metrics.track_in_flight():
+            # The pool the job went to, even if another model version is activated meanwhile
+            pool = worker_pool
+            if pool is not None:
+                while True:
+                    try:
+                        future = pool.submit(progress=progress, **context["predict_kwargs"])
+                        break
+                    except WorkerPoolClosed:
+                        # Swapped out after this request picked it; the new pool is in place
+                        if worker_pool is pool:
+                            raise
+                        pool = worker_pool
+                metrics.set_queue_depth(pool.queue_depth)
+                report = await asyncio.wrap_future(future)
+                metrics.set_queue_depth(pool.queue_depth)
+            else:
+                report = await asyncio.to_thread(_predict_in_process, context["predict_kwargs"], progress)
+        metrics.observe_stages(report.get('profiling', {}).get('stages', {}))
         
         # Clear GPU cache after inference
         if torch.cuda.is_available():
@@ -205,43 +540,279 @@ async def analyze_images(
         
         processing_time = (datetime.now() - start_time).total_seconds()
         
-        # Find the generated results
-        results_dir = BASE_DIR / 'results'
-        result_folders = [f for f in results_dir.iterdir() 
-                         if f.is_dir() and f.name.startswith(location)]
-        result_folder = sorted(result_folders)[-1].name if result_folders else None
+        result_folder = context["result_folder"]
+        if not (BASE_DIR / 'results' / result_folder).is_dir():
+            result_folder = None
+        
+        explanation = explanation_jobs.submit(
+            analysis_id, report,
+            output_dir=str(BASE_DIR / 'results' / result_folder) if result_folder else None
+        )
+        explanation['url'] = f"/api/results/{analysis_id}/explanation"
         
+        is_rgb_mode = context["is_rgb_mode"]
         response = {
             "status": "success",
             "analysis_id": analysis_id,
-            "location": location,
+            "location": context["location"],
             "processing_time": processing_time,
             "mode": "RGB" if is_rgb_mode else "Multi-band",
+            "tasks": list(context["tasks"]),
+            "model_version": report.get('model', {}).get('version'),
+            # Denominator of every percentage and area (cloud masking is on by default)
+            "data_quality": report.get('data_quality'),
             "data": report,
             "result_folder": result_folder,
-            "has_llm": "llm_explanations" in report,
-            "visualization_available": result_folder is not None
+            "has_llm": explanation_jobs.explainer is not None,
+            "explanation": explanation,
+            "visualization_available": result_folder is not None,
+            "products": {
+                name: f"/api/results/{analysis_id}/products/{name}"
+                for name in report.get('products', {})
+            } if result_folder else {}
         }
         
         # Save response for later retrieval
-        response_path = analysis_dir / "response.json"
-        with open(response_path, 'w') as f:
-            json.dump(response, f, indent=4)
+        _save_response(context, response)
+        if analysis_index is not None:
+            try:
+                analysis_index.add(analysis_id, report, result_folder)
+            except Exception as e:
+                print(f"⚠️  Could not index analysis {analysis_id}: {e}")
+        if analytics_store is not None:
+            try:
+                analytics_store.add(analysis_id, report, processing_time)
+            except Exception as e:
+                print(f"⚠️  Could not add analysis {analysis_id} to the analytics dataset: {e}")
         
         print(f"✅ Analysis complete in {processing_time:.2f}s")
+        return response
         
-        return JSONResponse(content=response)
-        
+    except Exception:
+        _discard_analysis(context)
+        raise
+    finally:
+        context["ticket"].release()
+
+async def _admit_and_start(before_images, after_images, location, date_before, date_after,
+                           tasks, prefilter, cloud_mask, cascade, tta, trace, roi, band_order=None):
+    """_admit then _start_analysis; the context carries the admission ticket"""
+    ticket = await _admit(before_images, after_images, tta)
+    try:
+        context = _start_analysis(before_images, after_images, location, date_before, date_after,
+                                  tasks, prefilter, cloud_mask, cascade, tta, trace, roi, band_order)
+    except BaseException:
+        ticket.release()
+        raise
+    context["ticket"] = ticket
+    return context
+
+@app.post("/api/analyze")
+async def analyze_images(
+    before_images: List[UploadFile] = File(...),
+    after_images: List[UploadFile] = File(...),
+    location: str = "Unknown",
+    date_before: Optional[str] = None,
+    date_after: Optional[str] = None,
+    tasks: Optional[str] = None,
+    prefilter: Optional[bool] = None,
+    cloud_mask: Optional[bool] = None,
+    cascade: Optional[bool] = None,
+    tta: Optional[bool] = None,
+    trace: bool = False,
+    roi: Optional[str] = None,
+    band_order: Optional[str] = None
+):
+    """
+    Analyze satellite image changes with AI model and LLM
+    
+    Accepts:
+    - 13 .tif files for before and 13 .tif files for after (original format)
+    - OR 1 multi-band GeoTIFF/COG for before and 1 for after
+    - OR 1 PNG/JPEG for before and 1 PNG/JPEG for after (user-friendly)
+    
+    tasks: optional comma-separated subset of "change,vegetation,urban";
+    heads that are not requested are never run.
+    prefilter: skip inference on tiles without spectral change
+    (default: config.PREFILTER_ENABLED).
+    cloud_mask: exclude cloud/haze pixels from inference and statistics
+    (default: config.CLOUD_MASK_ENABLED for multi-band input, off for RGB input,
+    whose synthetic cirrus/SWIR bands carry no cloud signal).
+    cascade: coarse-to-fine inference for sparse change (default: config.CASCADE_ENABLED).
+    tta: average over flip/rot90 test-time augmentations (default: config.TTA_ENABLED).
+    trace: export per-stage timings as a Chrome/Perfetto trace, served by
+    /api/results/{analysis_id}/trace. Stage timings are always in data.profiling.
+    roi: region of interest as JSON, either {"bbox": [minx, miny, maxx, maxy]} or a
+    GeoJSON Polygon/MultiPolygon (geometry, Feature or FeatureCollection), with
+    "coords": "crs" (default, the bands' CRS) or "pixel" (col, row). Only that
+    window of each band is read and analysed; the report's "roi" describes it.
+    band_order: band names of a multi-band GeoTIFF in file order, e.g.
+    "B01,B02,B03,B04,B05,B06,B07,B08,B8A,B09,B10,B11,B12". Without it bands are
+    mapped by their descriptions, else config.MULTIBAND_ORDER is assumed.
+    
+    The response does not wait for the LLM: explanations are generated in the
+    background (template text when Gemini is unavailable, fails or times out)
+    and served by /api/results/{analysis_id}/explanation.
+    
+    Each analysis reserves its estimated peak memory first. When the budget is
+    taken the request waits in a bounded queue; it gets 413 if it can never fit,
+    429 if the queue is full and 503 if it waited too long (both with Retry-After).
+    """
+    context = await _admit_and_start(before_images, after_images, location, date_before, date_after,
+                                     tasks, prefilter, cloud_mask, cascade, tta, trace, roi, band_order)
+    try:
+        response = await _run_analysis(context)
     except Exception as e:
-        # Cleanup on error
-        if analysis_dir.exists():
-            shutil.rmtree(analysis_dir)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return JSONResponse(content=response)
+
+def _sse(event: str, data) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/analyze/stream")
+async def analyze_images_stream(
+    before_images: List[UploadFile] = File(...),
+    after_images: List[UploadFile] = File(...),
+    location: str = "Unknown",
+    date_before: Optional[str] = None,
+    date_after: Optional[str] = None,
+    tasks: Optional[str] = None,
+    prefilter: Optional[bool] = None,
+    cloud_mask: Optional[bool] = None,
+    cascade: Optional[bool] = None,
+    tta: Optional[bool] = None,
+    trace: bool = False,
+    roi: Optional[str] = None,
+    band_order: Optional[str] = None
+):
+    """
+    Same as /api/analyze, streaming progress as Server-Sent Events
+    
+    Events, in order: started, bands_loaded, inference_done (model statistics),
+    report_ready (full numeric report), visualization_ready (image URL),
+    complete (the /api/analyze response), then llm_ready once the background
+    explanation is done (llm_pending if it is still running after its deadline).
+    An error event ends the stream if the analysis fails. The analysis finishes
+    and is saved even if the client disconnects early.
+    """
+    context = await _admit_and_start(before_images, after_images, location, date_before, date_after,
+                                     tasks, prefilter, cloud_mask, cascade, tta, trace, roi, band_order)
+    analysis_id = context["analysis_id"]
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    
+    def progress(event, data):
+        if event == 'visualization_ready':
+            data = {**data, "url": f"/api/results/{analysis_id}/image"}
+        # Serialised right away: the report keeps changing after the event
+        message = _sse(event, data)
+        loop.call_soon_threadsafe(events.put_nowait, message)
+    
+    analysis = asyncio.ensure_future(_run_analysis(context, progress))
+    
+    async def stream():
+        yield _sse('started', {"analysis_id": analysis_id, "result_folder": context["result_folder"]})
         
-        # Clear GPU cache on error
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+        while True:
+            next_event = asyncio.ensure_future(events.get())
+            await asyncio.wait({analysis, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event.done():
+                yield next_event.result()
+                continue
+            next_event.cancel()
+            break
+        while not events.empty():
+            yield events.get_nowait()
         
-        raise HTTPException(status_code=500, detail=str(e))
+        try:
+            response = analysis.result()
+        except Exception as e:
+            yield _sse('error', {"detail": str(e)})
+            return
+        yield _sse('complete', response)
+        
+        future = explanation_jobs.future(analysis_id)
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                   timeout=config.LLM_TIMEOUT_SECONDS + 5)
+        except asyncio.TimeoutError:
+            pass
+        explanation = explanation_jobs.status(analysis_id)
+        yield _sse('llm_ready' if explanation['status'] == 'ready' else 'llm_pending', explanation)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/analyses/search")
+async def search_analyses(
+    bbox: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    location: Optional[str] = None,
+    limit: int = 100
+):
+    """
+    Past analyses over an area and/or period, newest first
+    
+    bbox: "min_lon,min_lat,max_lon,max_lat" (WGS84); analyses whose footprint
+    intersects it match (only georeferenced inputs have a footprint).
+    start/end: dates (YYYY-MM-DD); analyses whose before..after period overlaps match.
+    location: exact location name.
+    """
+    if analysis_index is None:
+        raise HTTPException(status_code=503, detail="Spatial index not available")
+    
+    box = None
+    if bbox:
+        try:
+            box = [float(value) for value in bbox.split(',')]
+        except ValueError:
+            box = []
+        if len(box) != 4 or box[0] > box[2] or box[1] > box[3]:
+            raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    
+    query_start = time.perf_counter()
+    results = analysis_index.search(box, start, end, location, limit=max(1, min(limit, 1000)))
+    query_ms = (time.perf_counter() - query_start) * 1000
+    for result in results:
+        result['url'] = f"/api/results/{result['analysis_id']}"
+    
+    return {"count": len(results), "query_ms": query_ms, "results": results}
+
+@app.get("/api/analytics")
+async def analytics_query(
+    metric: str,
+    stats: str = "count,mean,min,max",
+    group_by: Optional[str] = None,
+    location: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+):
+    """
+    Aggregate statistics over all past analyses
+    
+    metric: comma-separated numeric columns (e.g. mean_ndvi_change,construction_area_km2,
+    inference_ms). stats: any of count, mean, min, max, sum, stddev.
+    group_by: comma-separated columns (e.g. location,month).
+    location: exact location name. start/end: YYYY-MM-DD or YYYY-MM, matched on the later image date.
+    """
+    if analytics_store is None:
+        raise HTTPException(status_code=503, detail="Analytics dataset not available")
+    
+    def names(value):
+        return [name.strip() for name in (value or '').split(',') if name.strip()]
+    
+    query_start = time.perf_counter()
+    try:
+        result = await asyncio.to_thread(
+            analytics_store.query, names(metric), names(stats), names(group_by), location, start, end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["query_ms"] = (time.perf_counter() - query_start) * 1000
+    return result
 
 @app.get("/api/results/{analysis_id}")
 async def get_results(analysis_id: str):
@@ -261,8 +832,165 @@ async def get_results(analysis_id: str):
     with open(response_path, 'r') as f:
         response = json.load(f)
     
+    explanation = _explanation_status(analysis_id, response)
+    if explanation and explanation['status'] == 'ready':
+        response['data']['llm_explanations'] = explanation['explanations']
+    
     return JSONResponse(content=response)
 
+def _explanation_status(analysis_id: str, response: Dict):
+    """Background explanation job state, falling back to the saved file after a restart"""
+    status = explanation_jobs.status(analysis_id) if explanation_jobs else None
+    if status is None and response.get('result_folder'):
+        status = load_saved_explanation(str(BASE_DIR / 'results' / response['result_folder']))
+    return status
+
+@app.get("/api/results/{analysis_id}/explanation")
+async def get_explanation(analysis_id: str, wait: float = 0):
+    """
+    LLM explanation of an analysis, generated in the background
+    
+    Returns 202 with status "pending" until it is ready. wait: seconds (up to
+    config.LLM_TIMEOUT_SECONDS + 5) to hold the request open for the result.
+    """
+    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
+    
+    if not analysis_dirs:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    with open(analysis_dirs[0] / "response.json", 'r') as f:
+        response = json.load(f)
+    
+    future = explanation_jobs.future(analysis_id) if explanation_jobs else None
+    if future is not None and wait > 0:
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                   timeout=min(wait, config.LLM_TIMEOUT_SECONDS + 5))
+        except asyncio.TimeoutError:
+            pass
+    
+    explanation = _explanation_status(analysis_id, response)
+    if explanation is None:
+        raise HTTPException(status_code=404, detail="No explanation for this analysis")
+    
+    return JSONResponse(content=explanation, status_code=200 if explanation['status'] == 'ready' else 202)
+
+# Histogram files never change once written; keep recently used ones in memory
+_cached_histograms = functools.lru_cache(maxsize=64)(load_histograms)
+_analyzer = EnvironmentalAnalyzer()
+
+@app.get("/api/results/{analysis_id}/rethreshold")
+async def rethreshold_results(
+    analysis_id: str,
+    ndvi: Optional[float] = None,
+    ndbi: Optional[float] = None,
+    ndwi: Optional[float] = None,
+    change: Optional[float] = None
+):
+    """
+    Recompute an analysis' percentages and areas for other thresholds
+    
+    ndvi/ndbi/ndwi: |index difference| counted as change (default 0.1);
+    change: change probability threshold (default config.CHANGE_THRESHOLD).
+    Uses the histograms stored with the analysis, so no raster or model is
+    touched; figures are exact to the histogram bin width (0.001).
+    """
+    for name, value, high in (('ndvi', ndvi, 2), ('ndbi', ndbi, 2), ('ndwi', ndwi, 2), ('change', change, 1)):
+        if value is not None and not 0 <= value <= high:
+            raise HTTPException(status_code=400, detail=f"{name} threshold must be between 0 and {high}")
+    
+    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
+    
+    if not analysis_dirs:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    with open(analysis_dirs[0] / "response.json", 'r') as f:
+        response = json.load(f)
+    
+    histogram_info = response['data'].get('histograms')
+    result_folder = response.get('result_folder')
+    if not histogram_info or not result_folder:
+        raise HTTPException(status_code=404, detail="No histograms stored for this analysis")
+    
+    histogram_path = BASE_DIR / 'results' / result_folder / histogram_info['file']
+    if not histogram_path.exists():
+        raise HTTPException(status_code=404, detail="Histogram file not found")
+    
+    histograms = _cached_histograms(str(histogram_path))
+    compute_start = time.perf_counter()
+    figures = _analyzer.rethreshold(response['data'], histograms, ndvi, ndbi, ndwi, change)
+    compute_us = (time.perf_counter() - compute_start) * 1e6
+    
+    return {
+        "analysis_id": analysis_id,
+        "thresholds": {
+            "ndvi": config.INDEX_CHANGE_THRESHOLD if ndvi is None else ndvi,
+            "ndbi": config.INDEX_CHANGE_THRESHOLD if ndbi is None else ndbi,
+            "ndwi": config.INDEX_CHANGE_THRESHOLD if ndwi is None else ndwi,
+            "change": config.CHANGE_THRESHOLD if change is None else change
+        },
+        "compute_us": compute_us,
+        **figures
+    }
+
+_cached_regions = functools.lru_cache(maxsize=16)(load_regions)
+
+@app.get("/api/results/{analysis_id}/regions")
+async def get_regions(
+    analysis_id: str,
+    kind: Optional[str] = None,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    bbox: Optional[str] = None,
+    sort: str = "area",
+    limit: int = 100,
+    offset: int = 0
+):
+    """
+    Connected change regions of an analysis
+    
+    kind: change, vegetation_increase, vegetation_decrease, urban_construction
+    or urban_demolition. min_area/max_area: in m². bbox: "row_min,col_min,row_max,col_max"
+    in pixels (regions whose centroid is inside). sort: area, probability or none.
+    """
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {KINDS}")
+    if sort not in ("area", "probability", "none"):
+        raise HTTPException(status_code=400, detail="sort must be area, probability or none")
+    box = None
+    if bbox:
+        try:
+            box = [float(value) for value in bbox.split(',')]
+        except ValueError:
+            box = []
+        if len(box) != 4:
+            raise HTTPException(status_code=400, detail="bbox must be row_min,col_min,row_max,col_max")
+    
+    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
+    
+    if not analysis_dirs:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    with open(analysis_dirs[0] / "response.json", 'r') as f:
+        response = json.load(f)
+    
+    region_info = response['data'].get('regions')
+    result_folder = response.get('result_folder')
+    if not region_info or not result_folder:
+        raise HTTPException(status_code=404, detail="No regions stored for this analysis")
+    
+    region_path = BASE_DIR / 'results' / result_folder / region_info['file']
+    if not region_path.exists():
+        raise HTTPException(status_code=404, detail="Region file not found")
+    
+    rows, total = query_regions(
+        _cached_regions(str(region_path)), kind=kind, min_area=min_area, max_area=max_area,
+        bbox=box, sort=None if sort == "none" else sort,
+        limit=max(1, min(limit, 10000)), offset=max(0, offset)
+    )
+    return {"analysis_id": analysis_id, "total": total, "offset": offset,
+            "regions": region_records(rows)}
+
 @app.get("/api/results/{analysis_id}/image")
 async def get_visualization(analysis_id: str):
     """Get visualization image for analysis"""
@@ -289,6 +1017,273 @@ async def get_visualization(analysis_id: str):
     
     return FileResponse(str(image_path), media_type="image/png")
 
+def _byte_range(range_header: Optional[str], size: int):
+    """
+    (start, end) inclusive of a single "bytes=" range, None to send the whole file
+    
+    Raises:
+        HTTPException 416 when the range starts past the end of the file
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None  # multi-range requests get the full file, which HTTP allows
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(end_text))
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+def _file_chunks(path: Path, start: int, length: int, chunk_size: int = 256 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+@app.api_route("/api/results/{analysis_id}/products/{name}", methods=["GET", "HEAD"])
+async def get_product(analysis_id: str, name: str, request: Request):
+    """
+    Download a change product (Cloud-Optimized GeoTIFF) of an analysis
+    
+    Supports single HTTP range requests (206 Partial Content), so GIS clients
+    (e.g. GDAL /vsicurl/) read only the tiles and overview levels they need.
+    """
+    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
+    
+    if not analysis_dirs:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    with open(analysis_dirs[0] / "response.json", 'r') as f:
+        response = json.load(f)
+    
+    product = response['data'].get('products', {}).get(name)
+    result_folder = response.get('result_folder')
+    if not product or not result_folder:
+        raise HTTPException(status_code=404, detail=f"Product '{name}' not found")
+    
+    product_path = BASE_DIR / 'results' / result_folder / product['file']
+    if not product_path.exists():
+        raise HTTPException(status_code=404, detail="Product file not found")
+    
+    return _ranged_file_response(request, product_path, f"{analysis_id}_{product['file']}")
+
+def _ranged_file_response(request: Request, path: Path, filename: str):
+    """GeoTIFF download honouring a single Range header (206) and HEAD"""
+    size = path.stat().st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    }
+    byte_range = _byte_range(request.headers.get("range"), size)
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="image/tiff")
+    return StreamingResponse(_file_chunks(path, start, length), status_code=status_code,
+                             headers=headers, media_type="image/tiff")
+
+def _save_acquisition(images: List[UploadFile], bands_dir: Path, band_order: Optional[str] = None):
+    """
+    Save 13 band uploads, one multi-band GeoTIFF, or one RGB upload converted
+    to 13 bands, into bands_dir
+    """
+    bands_dir.mkdir(parents=True, exist_ok=True)
+    suffix = Path(images[0].filename).suffix.lower()
+    if len(images) == 1 and suffix in ['.png', '.jpg', '.jpeg']:
+        from image_converter import ImageConverter
+        rgb_path = bands_dir.parent / f"rgb{suffix}"
+        with open(rgb_path, "wb") as f:
+            shutil.copyfileobj(images[0].file, f)
+        print("🔄 Converting RGB to multi-band format...")
+        ImageConverter().convert_rgb_to_multispectral(str(rgb_path), str(bands_dir), multiband=True)
+        return
+    if len(images) == 1 and suffix in MULTIBAND_EXTENSIONS:
+        _save_multiband(images[0], bands_dir, band_order)
+        return
+    if len(images) != 13:
+        raise HTTPException(status_code=400,
+                            detail=f"Expected 13 bands, 1 multi-band GeoTIFF OR 1 RGB image. Got {len(images)}")
+    for file in images:
+        with open(bands_dir / file.filename, "wb") as f:
+            shutil.copyfileobj(file.file, f)
+
+@app.post("/api/sites/{site_id}/acquisitions")
+async def add_site_acquisition(
+    site_id: str,
+    images: List[UploadFile] = File(...),
+    date: Optional[str] = None,
+    location: Optional[str] = None,
+    tasks: Optional[str] = None,
+    prefilter: Optional[bool] = None,
+    cloud_mask: Optional[bool] = None,
+    cascade: Optional[bool] = None,
+    tta: Optional[bool] = None,
+    band_order: Optional[str] = None
+):
+    """
+    Add a new acquisition (13 bands, 1 multi-band GeoTIFF or 1 RGB image) to a
+    monitored site (band_order as for /api/analyze)
+    
+    The first acquisition becomes the site's baseline. Each later one is only
+    loaded once and compared with the stored bands of the previous acquisition;
+    the site's cumulative change map and time series are updated in place.
+    """
+    if site_monitor is None:
+        raise HTTPException(status_code=503, detail="Site monitoring needs the in-process model "
+                                                    "(SATELLITE_INFERENCE_WORKERS=0)")
+    try:
+        tasks = resolve_tasks(tasks)
+        site_monitor.site_dir(site_id)
+        if band_order:
+            parse_band_order(band_order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    ticket = await _admit(images, images, tta)
+    work_dir = UPLOAD_DIR / f"site_{site_id}_{uuid.uuid4().hex[:8]}"
+    try:
+        _save_acquisition(images, work_dir / "bands", band_order)
+        
+        def update():
+            with _predict_lock:
+                return site_monitor.update(site_id, str(work_dir / "bands"), date, location, tasks,
+                                           prefilter, cloud_mask, cascade, tta)
+        
+        with metrics.track_in_flight():
+            result = await asyncio.to_thread(update)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ticket.release()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    result["site"] = f"/api/sites/{site_id}"
+    result["cumulative"] = f"/api/sites/{site_id}/cumulative"
+    return JSONResponse(content=result)
+
+@app.get("/api/sites/{site_id}")
+async def get_site(site_id: str):
+    """Monitored site: running statistics and per-acquisition time series"""
+    if site_monitor is None:
+        raise HTTPException(status_code=503, detail="Site monitoring not available")
+    try:
+        state = site_monitor.state(site_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if state is None:
+        raise HTTPException(status_code=404, detail="Site not found")
+    return state
+
+@app.api_route("/api/sites/{site_id}/cumulative", methods=["GET", "HEAD"])
+async def get_site_cumulative(site_id: str, request: Request):
+    """Cumulative change COG of a site: per pixel, the number of acquisitions with change"""
+    if site_monitor is None:
+        raise HTTPException(status_code=503, detail="Site monitoring not available")
+    try:
+        path = site_monitor.product_path(site_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Site not found")
+    path = Path(path)
+    return _ranged_file_response(request, path, f"{site_id}_{CUMULATIVE_PRODUCT}")
+
+@app.get("/api/results/{analysis_id}/trace")
+async def get_trace(analysis_id: str):
+    """Get the Chrome/Perfetto trace of an analysis run with trace=true"""
+    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
+    
+    if not analysis_dirs:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    with open(analysis_dirs[0] / "response.json", 'r') as f:
+        response = json.load(f)
+    
+    trace_file = response['data'].get('profiling', {}).get('trace_file')
+    result_folder = response.get('result_folder')
+    if not trace_file or not result_folder:
+        raise HTTPException(status_code=404, detail="Trace not found (run the analysis with trace=true)")
+    
+    trace_path = BASE_DIR / 'results' / result_folder / trace_file
+    if not trace_path.exists():
+        raise HTTPException(status_code=404, detail="Trace file not found")
+    
+    return FileResponse(str(trace_path), media_type="application/json",
+                        filename=f"{analysis_id}_trace.json")
+
+@app.get("/api/admin/models")
+async def list_models(request: Request):
+    """Registered model versions, the one being served and the state of the last swap"""
+    _check_admin(request)
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Model registry not available")
+    versions = await asyncio.to_thread(model_registry.versions)
+    with _swap_lock:
+        swap = dict(model_swap)
+    return {
+        "serving": model_info,
+        "active_version": model_registry.active_version(),
+        "versions": versions,
+        "swap": swap
+    }
+
+@app.post("/api/admin/models/{version}/activate")
+async def activate_model(version: str, request: Request):
+    """
+    Load a registered model version in the background, warm it up and swap it in
+    
+    Responds 202 at once; poll /api/admin/models for the swap state. Analyses
+    keep running on the current model meanwhile, and their responses carry
+    model_version.
+    """
+    _check_admin(request)
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Model registry not available")
+    try:
+        model_registry.path(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+    
+    with _swap_lock:
+        if model_swap["state"] in ("loading", "draining"):
+            raise HTTPException(status_code=409,
+                                detail=f"Model {model_swap.get('version')} is still {model_swap['state']}")
+        model_swap.clear()
+        model_swap.update(state="loading", version=version, started=datetime.now().isoformat())
+    threading.Thread(target=_swap_model, args=(version,), name="model-swap", daemon=True).start()
+    
+    return JSONResponse(status_code=202, content={
+        "status": "loading",
+        "version": version,
+        "serving": model_info,
+        "url": "/api/admin/models"
+    })
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,177 @@
+"""
+Prometheus metrics for the satellite backend
+Multiprocess-safe when PROMETHEUS_MULTIPROC_DIR is set before start-up
+(required when running uvicorn with several workers)
+"""
+
+import os
+from contextlib import contextmanager
+
+import torch
+
+try:
+    from prometheus_client import (Counter, Gauge, Histogram, CollectorRegistry, REGISTRY,
+                                   generate_latest, CONTENT_TYPE_LATEST, multiprocess)
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+if PROMETHEUS_AVAILABLE:
+    REQUESTS = Counter(
+        'satellite_http_requests_total', 'HTTP requests handled',
+        ['method', 'endpoint', 'status']
+    )
+    REQUEST_LATENCY = Histogram(
+        'satellite_http_request_duration_seconds', 'HTTP request latency',
+        ['method', 'endpoint'], buckets=STAGE_BUCKETS
+    )
+    STAGE_LATENCY = Histogram(
+        'satellite_stage_duration_seconds', 'Prediction pipeline stage wall time per analysis',
+        ['stage'], buckets=STAGE_BUCKETS
+    )
+    ANALYSES_IN_FLIGHT = Gauge(
+        'satellite_analyses_in_flight', 'Analyses currently being processed',
+        multiprocess_mode='livesum'
+    )
+    QUEUE_DEPTH = Gauge(
+        'satellite_queue_depth', 'Analyses waiting for or running on inference workers',
+        multiprocess_mode='livesum'
+    )
+    CACHE_REQUESTS = Counter(
+        'satellite_cache_requests_total', 'Cache lookups by cache and result (hit/miss)',
+        ['cache', 'result']
+    )
+    MODEL_LOAD_SECONDS = Gauge(
+        'satellite_model_load_seconds', 'Time taken to load the model at start-up',
+        multiprocess_mode='max'
+    )
+    PROCESS_RSS = Gauge(
+        'satellite_process_resident_memory_bytes', 'Resident memory of each API process',
+        multiprocess_mode='liveall'
+    )
+    WORKER_RSS = Gauge(
+        'satellite_inference_worker_resident_memory_bytes', 'Resident memory of inference workers',
+        ['pid', 'kind'], multiprocess_mode='liveall'
+    )
+    ADMISSION_RESERVED = Gauge(
+        'satellite_admission_reserved_bytes', 'Estimated memory reserved by admitted analyses',
+        multiprocess_mode='livesum'
+    )
+    ADMISSION_WAITING = Gauge(
+        'satellite_admission_waiting', 'Analyses waiting for memory to be admitted',
+        multiprocess_mode='livesum'
+    )
+    ADMISSION_REJECTED = Counter(
+        'satellite_admission_rejected_total', 'Analyses rejected by admission control',
+        ['reason']
+    )
+    TORCH_THREADS = Gauge(
+        'satellite_torch_threads', 'Torch CPU thread pool sizes',
+        ['pool'], multiprocess_mode='liveall'
+    )
+
+
+def _current_rss_bytes():
+    """Current RSS of this process from /proc (Linux), None elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def observe_request(method, endpoint, status, seconds):
+    if not PROMETHEUS_AVAILABLE:
+        return
+    REQUESTS.labels(method, endpoint, str(status)).inc()
+    REQUEST_LATENCY.labels(method, endpoint).observe(seconds)
+
+
+def observe_stages(stages):
+    """Record the per-stage summary produced by profiling.PipelineProfiler"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    for name, entry in stages.items():
+        STAGE_LATENCY.labels(name).observe(entry['wall_ms'] / 1000)
+
+
+@contextmanager
+def track_in_flight():
+    if not PROMETHEUS_AVAILABLE:
+        yield
+        return
+    ANALYSES_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        ANALYSES_IN_FLIGHT.dec()
+
+
+def set_queue_depth(depth):
+    if PROMETHEUS_AVAILABLE:
+        QUEUE_DEPTH.set(depth)
+
+
+def record_cache(cache, hit):
+    if PROMETHEUS_AVAILABLE:
+        CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def set_admission_state(reserved_bytes, waiting):
+    if PROMETHEUS_AVAILABLE:
+        ADMISSION_RESERVED.set(reserved_bytes)
+        ADMISSION_WAITING.set(waiting)
+
+
+def record_admission_rejected(reason):
+    if PROMETHEUS_AVAILABLE:
+        ADMISSION_REJECTED.labels(reason).inc()
+
+
+def record_model_load(seconds):
+    if PROMETHEUS_AVAILABLE:
+        MODEL_LOAD_SECONDS.set(seconds)
+
+
+def update_process_gauges(worker_pool=None):
+    """Refresh RSS and thread gauges; called on each scrape"""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    rss = _current_rss_bytes()
+    if rss is not None:
+        PROCESS_RSS.set(rss)
+    TORCH_THREADS.labels('intra_op').set(torch.get_num_threads())
+    TORCH_THREADS.labels('interop').set(torch.get_num_interop_threads())
+    if worker_pool is not None:
+        set_queue_depth(worker_pool.queue_depth)
+        for pid, usage in worker_pool.memory_usage().items():
+            for kind in ('rss_mb', 'private_mb', 'shared_mb'):
+                if kind in usage:
+                    WORKER_RSS.labels(str(pid), kind[:-3]).set(usage[kind] * 1024 * 1024)
+
+
+def mark_process_dead():
+    """Drop this process's live gauges from the shared multiprocess directory"""
+    if PROMETHEUS_AVAILABLE and MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render():
+    """
+    Metrics in the Prometheus text format
+
+    Returns:
+        (body, content_type, status_code)
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return b"prometheus_client is not installed\n", "text/plain", 503
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST, 200
@@ -5,6 +5,23 @@ import torch.nn as nn
 import torch.nn.functional as F
 import segmentation_models_pytorch as smp
 
+# Output heads of the multi-task model, in the order they are reported
+TASKS = ('change', 'vegetation', 'urban')
+
+def resolve_tasks(tasks=None):
+    """Normalise a task selection (iterable or comma-separated string) to a tuple in TASKS order"""
+    if tasks is None:
+        return TASKS
+    if isinstance(tasks, str):
+        tasks = tasks.split(',')
+    requested = {t.strip().lower() for t in tasks if t and t.strip()}
+    unknown = requested - set(TASKS)
+    if unknown:
+        raise ValueError(f"Unknown task(s): {', '.join(sorted(unknown))}. Choose from {', '.join(TASKS)}")
+    if not requested:
+        raise ValueError(f"At least one task is required. Choose from {', '.join(TASKS)}")
+    return tuple(t for t in TASKS if t in requested)
+
 class AttentionBlock(nn.Module):
     def __init__(self, in_channels):
         super().__init__()
@@ -66,7 +83,20 @@ class ChangeDetectionModel(nn.Module):
             nn.Softmax(dim=1)
         )
     
-    def forward(self, img1, img2):
+    def forward(self, img1, img2, tasks=None):
+        """
+        Run the siamese encoder and the requested heads
+
+        Args:
+            img1: Before image tensor (B, C, H, W)
+            img2: After image tensor (B, C, H, W)
+            tasks: Heads to evaluate (subset of TASKS); all heads when None
+
+        Returns:
+            Dictionary with one map per requested task
+        """
+        tasks = resolve_tasks(tasks)
+        
         # Extract features from both images
         feat1 = self.encoder(img1)
         feat2 = self.encoder(img2)
@@ -77,13 +107,11 @@ class ChangeDetectionModel(nn.Module):
         # Apply attention
         attended = self.attention(combined)
         
-        # Generate predictions
-        change_map = self.change_head(attended)
-        vegetation_map = self.vegetation_head(attended)
-        urban_map = self.urban_head(attended)
-        
-        return {
-            'change': change_map,
-            'vegetation': vegetation_map,
-            'urban': urban_map
+        # Generate predictions, skipping heads nobody asked for
+        heads = {
+            'change': self.change_head,
+            'vegetation': self.vegetation_head,
+            'urban': self.urban_head
         }
+        
+        return {task: heads[task](attended) for task in tasks}
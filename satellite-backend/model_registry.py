@@ -0,0 +1,170 @@
+"""
+Versioned model checkpoints
+The registry directory holds one checkpoint per version ({version}.pth) and
+active.json naming the version the API serves, so a restart comes back on the
+same weights. Without an active version the API falls back to
+models/best_model.pth.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+
+import torch
+
+import config
+from model import ChangeDetectionModel
+
+ACTIVE_FILE = 'active.json'
+CHECKPOINT_EXTENSION = '.pth'
+
+_VERSION = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+def file_digest(path, length=12):
+    """Leading hex digits of the file's SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def checkpoint_info(path, version=None):
+    """
+    What responses record about the model that produced them
+
+    Args:
+        path: Checkpoint file
+        version: Version name (default: the file name without extension)
+
+    Returns:
+        {'version', 'sha256'}: the digest tells apart checkpoints that were
+        replaced under the same name
+    """
+    if version is None:
+        version = os.path.splitext(os.path.basename(path))[0]
+    return {'version': version, 'sha256': file_digest(path)}
+
+
+def load_model(path, device=None):
+    """ChangeDetectionModel with the checkpoint's weights, in eval mode"""
+    device = device or torch.device('cpu')
+    model = ChangeDetectionModel(in_channels=13).to(device)
+    checkpoint = torch.load(path, map_location=device)
+    model.load_state_dict(checkpoint['model_state_dict'])
+    return model.eval()
+
+
+def warm_up(model, size=None, tasks=None):
+    """
+    Run the model once on synthetic input, so allocator growth, kernel selection
+    and lazy initialisation happen before the first real request
+
+    Args:
+        size: Side of the synthetic scene (default: config.INFERENCE_TILE_SIZE,
+              else config.MODEL_WARMUP_SIZE); 0 skips the warm-up
+        tasks: Heads to run (default: all)
+
+    Returns:
+        Seconds spent
+    """
+    if size is None:
+        size = config.MODEL_WARMUP_SIZE and (config.INFERENCE_TILE_SIZE or config.MODEL_WARMUP_SIZE)
+    if not size:
+        return 0.0
+    device = next(model.parameters()).device
+    generator = torch.Generator().manual_seed(0)
+    img1 = torch.rand(1, 13, size, size, generator=generator).to(device)
+    img2 = torch.rand(1, 13, size, size, generator=generator).to(device)
+    start = time.perf_counter()
+    with torch.no_grad():
+        model(img1, img2, tasks=tasks)
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    return time.perf_counter() - start
+
+
+class ModelRegistry:
+    """Checkpoints by version plus the persisted active version"""
+
+    def __init__(self, root=None, default_path=None):
+        """
+        Args:
+            root: Registry directory (default: config.MODEL_REGISTRY_DIR)
+            default_path: Checkpoint served when no version is active
+                          (default: best_model.pth in config.MODEL_DIR)
+        """
+        self.root = root or config.MODEL_REGISTRY_DIR
+        self.default_path = default_path or os.path.join(config.MODEL_DIR, 'best_model.pth')
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, version):
+        """
+        Checkpoint file of a version
+
+        Raises:
+            ValueError: Not a valid version name
+            KeyError: No checkpoint for the version
+        """
+        if not _VERSION.match(str(version)):
+            raise ValueError("Version names use letters, digits, '.', '_' and '-' (at most 64)")
+        path = os.path.join(self.root, f"{version}{CHECKPOINT_EXTENSION}")
+        if not os.path.isfile(path):
+            raise KeyError(version)
+        return path
+
+    def versions(self):
+        """Registered versions, oldest first, with file size and modification time"""
+        entries = []
+        for name in os.listdir(self.root):
+            version, extension = os.path.splitext(name)
+            if extension != CHECKPOINT_EXTENSION or not _VERSION.match(version):
+                continue
+            stat = os.stat(os.path.join(self.root, name))
+            entries.append({
+                'version': version,
+                'size_mb': round(stat.st_size / 2**20, 1),
+                'modified': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(stat.st_mtime))
+            })
+        return sorted(entries, key=lambda entry: (entry['modified'], entry['version']))
+
+    def active_version(self):
+        """Version recorded as active, or None"""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return json.load(f).get('version')
+        except (OSError, ValueError):
+            return None
+
+    def set_active(self, version):
+        """Record version as active (written atomically, read at the next startup)"""
+        self.path(version)
+        path = os.path.join(self.root, ACTIVE_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': version, 'activated': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+        os.replace(tmp_path, path)
+
+    def resolve(self, version=None):
+        """
+        Checkpoint to load
+
+        Args:
+            version: Version to load (default: the active one, else default_path)
+
+        Returns:
+            (path, version); path may not exist when falling back to default_path
+        """
+        if version is None:
+            version = self.active_version()
+            if version is not None:
+                try:
+                    return self.path(version), version
+                except (KeyError, ValueError):
+                    print(f"⚠️  Active model version {version} not in {self.root}, "
+                          f"using {self.default_path}")
+            return self.default_path, None
+        return self.path(version), version
@@ -0,0 +1,288 @@
+"""
+Incremental monitoring of sites that are re-acquired over time
+Each site keeps its latest normalised bands and running change statistics on
+disk, so a new acquisition costs one band load and one pairwise inference.
+The arrays of each acquisition are written under new, numbered file names and
+committed together by writing state.json last, which names them; files it does
+not name are leftovers of an interrupted update and are removed.
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import config
+from band_io import converted_from_rgb
+from cog_export import read_georeference, write_cog, NODATA
+from profiling import PipelineProfiler
+from spatial_index import normalise_date
+
+STATE_FILE = 'state.json'
+BANDS_FILE = 'last_bands.npy'
+CUMULATIVE_FILE = 'cumulative.npz'
+CUMULATIVE_PRODUCT = 'cumulative_change.tif'
+
+_SITE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Bands, cumulative arrays and product of any generation, plus temporary files
+_SITE_FILE = re.compile(r'^(last_bands|cumulative|cumulative_change)(_\d+)?\.(npy|npz|tif)(\.tmp)?$')
+
+
+def _generation_files(generation):
+    """Names of the files written for one committed state of a site"""
+    names = {'bands': BANDS_FILE, 'cumulative': CUMULATIVE_FILE, 'product': CUMULATIVE_PRODUCT}
+    return {key: f"{os.path.splitext(name)[0]}_{generation:04d}{os.path.splitext(name)[1]}"
+            for key, name in names.items()}
+
+
+def _site_files(state):
+    """Files the state points at (sites saved before numbering used fixed names)"""
+    return state.get('files') or {'bands': BANDS_FILE, 'cumulative': CUMULATIVE_FILE,
+                                  'product': CUMULATIVE_PRODUCT}
+
+
+def _save_atomic(path, write):
+    """Write to a temporary file then rename, so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class SiteMonitor:
+    """Per-site state (last bands, cumulative change, time series) under config.MONITOR_DIR"""
+
+    def __init__(self, predictor, root=None):
+        """
+        Args:
+            predictor: ChangeDetectionPredictor used for the pairwise inference
+            root: Folder holding one subfolder per site (default: config.MONITOR_DIR)
+        """
+        self.predictor = predictor
+        self.root = root or config.MONITOR_DIR
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        if os.path.isdir(self.root):
+            for site_id in os.listdir(self.root):
+                state = self.state(site_id) if _SITE_ID.match(site_id) else None
+                if state is not None:
+                    self._remove_stale(self.site_dir(site_id), state)
+
+    def site_dir(self, site_id):
+        if not _SITE_ID.match(site_id):
+            raise ValueError("Site id must be 1-64 letters, digits, '_' or '-'")
+        return os.path.join(self.root, site_id)
+
+    def _lock(self, site_id):
+        with self._locks_guard:
+            return self._locks.setdefault(site_id, threading.Lock())
+
+    def state(self, site_id):
+        """Saved site state (metadata, running statistics, time series), or None"""
+        path = os.path.join(self.site_dir(site_id), STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def product_path(self, site_id):
+        """Current cumulative change COG of a site, or None"""
+        state = self.state(site_id)
+        if state is None:
+            return None
+        return os.path.join(self.site_dir(site_id), _site_files(state)['product'])
+
+    def update(self, site_id, image_folder, date=None, location=None, tasks=None,
+               prefilter=None, cloud_mask=None, cascade=None, tta=None):
+        """
+        Add an acquisition to a site
+
+        The first acquisition only becomes the baseline. Later ones are compared
+        with the stored bands of the previous acquisition, then replace them.
+
+        Args:
+            site_id: Site key (letters, digits, '_' or '-')
+            image_folder: Folder with the 13 band files of the new acquisition
+            date: Acquisition date (YYYYMMDD or YYYY-MM-DD); must be after the
+                  previous one when both are known
+            location: Location name (kept from the first acquisition when None)
+            tasks, prefilter, cloud_mask, cascade, tta: As for predict
+
+        Returns:
+            Dictionary with status ('baseline' or 'updated'), the step's time
+            series entry and, for updates, the pairwise report
+
+        Raises:
+            ValueError: Bad site id, out-of-order date or a scene that does not
+                        match the site's grid
+        """
+        site_dir = self.site_dir(site_id)
+        with self._lock(site_id):
+            state = self.state(site_id)
+            profiler = PipelineProfiler()
+            with profiler.stage('band_load'):
+                bands = self.predictor.load_image_bands(image_folder)
+                georef = read_georeference(image_folder)
+            day = normalise_date(date)
+
+            if state is None:
+                return self._start_site(site_id, site_dir, bands, georef, date, day, location)
+
+            if day and state['last_date'] and day <= state['last_date']:
+                raise ValueError(f"Acquisition date {day} is not after the site's last date {state['last_date']}")
+            if list(bands.shape) != state['shape']:
+                raise ValueError(f"Scene shape {list(bands.shape)} does not match the site's {state['shape']}")
+            if state['georef']['crs'] and tuple(georef['transform'])[:6] != tuple(state['georef']['transform']):
+                raise ValueError("Scene georeferencing does not match the site's")
+
+            with profiler.stage('state_load'):
+                current = _site_files(state)
+                previous = np.load(os.path.join(site_dir, current['bands']))
+                with np.load(os.path.join(site_dir, current['cumulative'])) as data:
+                    cumulative = {key: data[key] for key in data.files}
+
+            use_prefilter = config.PREFILTER_ENABLED if prefilter is None else prefilter
+            use_cloud_mask = cloud_mask
+            if cloud_mask is None:
+                use_cloud_mask = config.CLOUD_MASK_ENABLED and not converted_from_rgb(image_folder)
+            scene = self.predictor.scene_from_bands(previous, bands, use_prefilter, use_cloud_mask,
+                                                    profiler, georef=georef)
+            step = state['acquisitions']
+            run_dir = os.path.join(site_dir, 'runs', f"{step:04d}_{day or 'unknown'}")
+            report, predictions = self.predictor.predict_scene(
+                scene, state['last_date_raw'], date, location or state['location'], tasks=tasks,
+                output_dir=run_dir, cascade=cascade, tta=tta, profiler=profiler, explain=False,
+                return_predictions=True
+            )
+
+            with profiler.stage('state_update'):
+                change_map = predictions['change'][0] if 'change' in predictions else None
+                entry = self._accumulate(cumulative, scene, report, change_map, step)
+                entry.update({
+                    'step': step,
+                    'date_before': state['last_date'],
+                    'date_after': day,
+                    'run_folder': os.path.relpath(run_dir, site_dir)
+                })
+                files = _generation_files(step + 1)
+                self._save_cumulative(site_dir, files, cumulative, georef)
+                _save_atomic(os.path.join(site_dir, files['bands']), lambda f: np.save(f, bands))
+
+                running = state['running']
+                running['steps'] += 1
+                change = entry.get('total_change_percent')
+                if change is not None:
+                    # Incremental mean: no need to revisit earlier steps
+                    running['mean_change_percent'] += (change - running['mean_change_percent']) / running['steps']
+                    running['max_change_percent'] = max(running['max_change_percent'], change)
+                running['cumulative_change_percent'] = entry['cumulative_change_percent']
+
+                state.update({
+                    'last_date': day,
+                    'last_date_raw': date,
+                    'acquisitions': step + 1,
+                    'updated': datetime.now().isoformat(),
+                    'files': files
+                })
+                state['timeseries'].append(entry)
+                # Commit point: the new arrays count only once state.json names them
+                self._save_state(site_dir, state)
+                self._remove_stale(site_dir, state)
+
+            entry['stages'] = profiler.summary()
+            print(f"🛰️  Site {site_id}: step {step}, {entry['cumulative_change_percent']:.2f}% changed so far")
+            return {'status': 'updated', 'site_id': site_id, 'entry': entry, 'report': report}
+
+    def _start_site(self, site_id, site_dir, bands, georef, date, day, location):
+        """Store the first acquisition as the baseline"""
+        os.makedirs(site_dir, exist_ok=True)
+        height, width = bands.shape[1:]
+        cumulative = {
+            'change_count': np.zeros((height, width), dtype=np.uint16),
+            'observed_count': np.zeros((height, width), dtype=np.uint16),
+            'first_change': np.full((height, width), -1, dtype=np.int16),
+            'max_probability': np.zeros((height, width), dtype=np.float16)
+        }
+        files = _generation_files(1)
+        self._save_cumulative(site_dir, files, cumulative, georef)
+        _save_atomic(os.path.join(site_dir, files['bands']), lambda f: np.save(f, bands))
+
+        now = datetime.now().isoformat()
+        state = {
+            'site_id': site_id,
+            'location': location or 'Unknown',
+            'created': now,
+            'updated': now,
+            'shape': list(bands.shape),
+            'georef': {
+                'crs': georef['crs'].to_string() if georef['crs'] else None,
+                'transform': list(georef['transform'])[:6]
+            },
+            'baseline_date': day,
+            'last_date': day,
+            'last_date_raw': date,
+            'acquisitions': 1,
+            'running': {
+                'steps': 0,
+                'mean_change_percent': 0.0,
+                'max_change_percent': 0.0,
+                'cumulative_change_percent': 0.0
+            },
+            'timeseries': [],
+            'files': files
+        }
+        self._save_state(site_dir, state)
+        self._remove_stale(site_dir, state)
+        print(f"🛰️  Site {site_id}: baseline stored ({bands.shape[2]}x{bands.shape[1]})")
+        return {'status': 'baseline', 'site_id': site_id, 'entry': {'step': 0, 'date_after': day}}
+
+    def _accumulate(self, cumulative, scene, report, change_map, step):
+        """Fold one pairwise result into the cumulative maps; returns the step's statistics"""
+        mask = self.predictor.analyzer.combine_masks(scene['valid_mask'], scene.get('roi_mask'))
+        observed = np.ones(cumulative['observed_count'].shape, dtype=bool) if mask is None else mask
+        cumulative['observed_count'] += observed
+
+        entry = {}
+        if change_map is not None:
+            changed = (change_map > config.CHANGE_THRESHOLD) & observed
+            new = changed & (cumulative['change_count'] == 0)
+            cumulative['change_count'] += changed
+            cumulative['first_change'][new] = step
+            np.maximum(cumulative['max_probability'], change_map.astype(np.float16),
+                       out=cumulative['max_probability'], where=observed)
+            entry['new_change_percent'] = float(new.sum() / max(observed.sum(), 1) * 100)
+
+        ever_observed = cumulative['observed_count'] > 0
+        ever_changed = cumulative['change_count'] > 0
+        entry['cumulative_change_percent'] = float(ever_changed.sum() / max(ever_observed.sum(), 1) * 100)
+
+        model = report.get('model_predictions', {})
+        if 'total_change_percent' in model:
+            entry['total_change_percent'] = model['total_change_percent']
+        entry['mean_ndvi_change'] = report['vegetation_analysis']['mean_ndvi_change']
+        entry['vegetation_decrease_percent'] = report['vegetation_analysis']['vegetation_decrease_percent']
+        entry['construction_area_km2'] = report['urban_analysis']['construction_area_km2']
+        entry['valid_pixel_percent'] = report['data_quality']['valid_pixel_percent']
+        return entry
+
+    def _save_cumulative(self, site_dir, files, cumulative, georef):
+        _save_atomic(os.path.join(site_dir, files['cumulative']), lambda f: np.savez(f, **cumulative))
+        # Number of acquisitions in which each pixel changed, for GIS use
+        counts = np.minimum(cumulative['change_count'], NODATA - 1).astype(np.uint8)
+        counts[cumulative['observed_count'] == 0] = NODATA
+        write_cog(os.path.join(site_dir, files['product']), counts, georef,
+                  tags={'description': 'acquisitions with change per pixel'})
+
+    def _remove_stale(self, site_dir, state):
+        """Delete array files the committed state does not point at"""
+        keep = set(_site_files(state).values())
+        for name in os.listdir(site_dir):
+            if _SITE_FILE.match(name) and name not in keep:
+                os.remove(os.path.join(site_dir, name))
+
+    def _save_state(self, site_dir, state):
+        data = json.dumps(state, indent=4).encode('utf-8')
+        _save_atomic(os.path.join(site_dir, STATE_FILE), lambda f: f.write(data))
@@ -1,6 +1,7 @@
 """Prediction and analysis script for user input images"""
 
 import torch
+import torch.nn.functional as F
 import numpy as np
 import rasterio
 import matplotlib.pyplot as plt
@@ -8,13 +9,66 @@ import json
 import os
 from datetime import datetime
 import config
-from model import ChangeDetectionModel
+from model import ChangeDetectionModel, resolve_tasks
 from analyzer import EnvironmentalAnalyzer
 from visualization import ChangeVisualizer
-from llm_explainer import LLMExplainer
+from llm_explainer import LLMExplainer, explain_with_timeout, write_llm_report
+from tiling import TileBlender, tile_windows, context_window, pad_tile, tile_max
+from prefilter import SpectralPrefilter
+from cloud_mask import CloudMasker
+from tta import batched_tta
+from profiling import PipelineProfiler, peak_rss_mb, stage
+from cog_export import read_georeference, export_change_products
+from band_io import converted_from_rgb, parse_band_order, read_bands
+from roi import parse_roi, locate_roi
+from spatial_index import footprint
+from histograms import HISTOGRAM_FILE, RANGES, QuantizedHistogram, save_histograms
+from regions import REGION_FILE, extract_regions, region_summary
+
+# Output channels of each model head
+TASK_CHANNELS = {'change': 1, 'vegetation': 3, 'urban': 3}
 
 class ChangeDetectionPredictor:
-    def __init__(self, model_path):
+    def __init__(self, model_path, model=None, tile_size=None, batch_size=None, model_info=None):
+        """
+        Args:
+            model_path: Path to trained model checkpoint
+            model: Already loaded ChangeDetectionModel to use instead of loading
+                   model_path (e.g. weights shared between worker processes)
+            tile_size: Run inference on tiles of this size, 0 for the whole scene
+                       at once (default: config.INFERENCE_TILE_SIZE)
+            batch_size: Tiles per forward pass (default: config.INFERENCE_BATCH_SIZE)
+            model_info: Version of the weights, recorded in every report as
+                        report['model'] (see model_registry.checkpoint_info)
+        """
+        self.model_info = model_info
+        self.tile_size = config.INFERENCE_TILE_SIZE if tile_size is None else tile_size
+        self.batch_size = batch_size or config.INFERENCE_BATCH_SIZE
+        self.tile_overlap = config.INFERENCE_TILE_OVERLAP
+        self.cascade_factor = config.CASCADE_FACTOR
+        self.cascade_margin = config.CASCADE_MARGIN
+        
+        if model is not None:
+            self.model = model.eval()
+            self.device = next(model.parameters()).device
+        else:
+            self._load_model(model_path)
+        
+        self.analyzer = EnvironmentalAnalyzer()
+        self.visualizer = ChangeVisualizer()
+        self.prefilter = SpectralPrefilter(self.analyzer)
+        self.cloud_masker = CloudMasker()
+        
+        # Initialize LLM explainer (optional)
+        try:
+            self.llm_explainer = LLMExplainer(model='gemini-2.5-flash-lite')
+            print("✓ LLM explainer initialized")
+        except Exception as e:
+            print(f"⚠️  LLM explainer not available: {e}")
+            self.llm_explainer = None
+    
+    def _load_model(self, model_path):
+        """Load the checkpoint on the GPU when possible, falling back to CPU"""
         # Try GPU first, fallback to CPU if memory issues
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
@@ -49,111 +103,524 @@ class ChangeDetectionPredictor:
                 self.model.eval()
             else:
                 raise
-        
-        self.analyzer = EnvironmentalAnalyzer()
-        self.visualizer = ChangeVisualizer()
-        
-        # Initialize LLM explainer (optional)
-        try:
-            self.llm_explainer = LLMExplainer(model='gemini-2.5-flash-lite')
-            print("✓ LLM explainer initialized")
-        except Exception as e:
-            print(f"⚠️  LLM explainer not available: {e}")
-            self.llm_explainer = None
     
-    def load_image_bands(self, image_folder):
-        """Load all 13 bands from a folder"""
-        bands = []
-        for band_name in config.BAND_NAMES:
-            band_path = os.path.join(image_folder, f"{band_name}.tif")
-            with rasterio.open(band_path) as src:
-                band_data = src.read(1).astype(np.float32)
-                band_data = np.clip(band_data / 10000.0, 0, 1)
-                bands.append(band_data)
-        
-        return np.stack(bands, axis=0)
+    def load_image_bands(self, image_folder, window=None, band_order=None):
+        """
+        Load all 13 bands from a folder of band files or a single multi-band
+        GeoTIFF/COG (only the given rasterio Window when set), see band_io.read_bands
+        """
+        return read_bands(image_folder, window, band_order)
     
-    def predict(self, img1_folder, img2_folder, date1=None, date2=None, location="Unknown"):
+    def predict(self, img1_folder, img2_folder, date1=None, date2=None, location="Unknown",
+                tasks=None, output_dir=None, prefilter=None, cloud_mask=None, cascade=None,
+                tta=None, profiler=None, trace=False, explain=True, progress=None, roi=None,
+                band_order=None):
         """
         Predict changes between two satellite images
         
         Args:
-            img1_folder: Path to folder containing before image bands
-            img2_folder: Path to folder containing after image bands
+            img1_folder: Path to folder containing before image bands, or a multi-band GeoTIFF/COG
+            img2_folder: Path to folder containing after image bands, or a multi-band GeoTIFF/COG
             date1: Date of first image (YYYYMMDD format)
             date2: Date of second image (YYYYMMDD format)
             location: Name of the location
+            tasks: Model outputs to compute ('change', 'vegetation', 'urban'); all when None
+            output_dir: Folder for the result files (default: RESULTS_DIR/<location>_<timestamp>)
+            prefilter: Skip inference on tiles without spectral change (default: config.PREFILTER_ENABLED)
+            cloud_mask: Exclude cloud/haze pixels from inference and statistics
+                        (default: config.CLOUD_MASK_ENABLED, off for bands converted
+                        from RGB)
+            cascade: Run a downsampled pass first and refine only tiles that may contain
+                     change at full resolution (default: config.CASCADE_ENABLED)
+            tta: Test-time augmentation over flip/rot90 variants (default: config.TTA_ENABLED)
+            profiler: PipelineProfiler to record stage timings into (a new one by default)
+            trace: Also export the timings as a Chrome/Perfetto trace (trace.json)
+            explain: Add LLM explanations to the report; the API passes False and
+                     generates them in the background instead
+            progress: Optional callback(event, data) called as stages finish:
+                      bands_loaded, inference_done, report_ready, visualization_ready
+            roi: Region of interest (bbox or GeoJSON polygon, see roi.parse_roi); only
+                 its window is read and inferred, and statistics cover the ROI only
+            band_order: Band names of multi-band files in file order (see band_io.band_indexes)
         
         Returns:
             Dictionary containing predictions and analysis
         """
-        print("Loading images...")
-        bands1 = self.load_image_bands(img1_folder)
-        bands2 = self.load_image_bands(img2_folder)
+        use_prefilter = config.PREFILTER_ENABLED if prefilter is None else prefilter
+        use_cloud_mask = cloud_mask
+        if cloud_mask is None:
+            use_cloud_mask = config.CLOUD_MASK_ENABLED and not converted_from_rgb(img1_folder)
         
-        # Convert to tensors
-        img1_tensor = torch.from_numpy(bands1).unsqueeze(0).to(self.device)
-        img2_tensor = torch.from_numpy(bands2).unsqueeze(0).to(self.device)
+        profiler = profiler or PipelineProfiler()
+        scene = self.prepare_scene(img1_folder, img2_folder, use_prefilter, use_cloud_mask, profiler,
+                                   roi=roi, band_order=band_order)
+        return self.predict_scene(scene, date1, date2, location, tasks=tasks, output_dir=output_dir,
+                                  cascade=cascade, tta=tta, profiler=profiler, trace=trace,
+                                  explain=explain, progress=progress)
+    
+    def predict_bands(self, bands1, bands2, date1=None, date2=None, location="Unknown",
+                      tasks=None, output_dir=None, prefilter=None, cloud_mask=None, cascade=None,
+                      tta=None, profiler=None, trace=False, explain=True, progress=None):
+        """
+        predict for (13, H, W) reflectance arrays already in memory (e.g. from
+        ImageConverter.convert_rgb_to_array), without band files
         
-        print("Running model inference...")
-        with torch.no_grad():
-            predictions = self.model(img1_tensor, img2_tensor)
+        Arguments are as for predict (no ROI and no georeferencing).
+        """
+        use_prefilter = config.PREFILTER_ENABLED if prefilter is None else prefilter
+        use_cloud_mask = config.CLOUD_MASK_ENABLED if cloud_mask is None else cloud_mask
         
-        # Convert predictions to numpy
-        change_map = predictions['change'].cpu().numpy()[0, 0]
-        vegetation_map = predictions['vegetation'].cpu().numpy()[0]
-        urban_map = predictions['urban'].cpu().numpy()[0]
+        profiler = profiler or PipelineProfiler()
+        scene = self.scene_from_bands(bands1, bands2, use_prefilter, use_cloud_mask, profiler)
+        return self.predict_scene(scene, date1, date2, location, tasks=tasks, output_dir=output_dir,
+                                  cascade=cascade, tta=tta, profiler=profiler, trace=trace,
+                                  explain=explain, progress=progress)
+    
+    def predict_scene(self, scene, date1=None, date2=None, location="Unknown", tasks=None,
+                      output_dir=None, cascade=None, tta=None, profiler=None, trace=False,
+                      explain=True, progress=None, return_predictions=False):
+        """
+        Inference and report for a scene from prepare_scene or scene_from_bands
         
-        print("Analyzing environmental changes...")
-        # Generate detailed analysis
-        report = self.analyzer.generate_report(
-            bands1, bands2, date1, date2, location
-        )
+        Arguments are as for predict.
+        
+        Returns:
+            Dictionary containing predictions and analysis, or (report, model
+            output maps per task) with return_predictions
+        """
+        tasks = resolve_tasks(tasks)
+        use_cascade = config.CASCADE_ENABLED if cascade is None else cascade
+        use_tta = config.TTA_ENABLED if tta is None else tta
+        
+        profiler = profiler or PipelineProfiler()
+        hooks = profiler.attach_model(self.model)
+        try:
+            bands1, bands2 = scene['bands1'], scene['bands2']
+            tile_mask = scene['tile_mask']
+            if progress:
+                valid_mask = scene['valid_mask']
+                progress('bands_loaded', {
+                    'bands': int(bands1.shape[0]),
+                    'height': int(bands1.shape[1]),
+                    'width': int(bands1.shape[2]),
+                    'cloud_percent': float((~valid_mask).mean() * 100) if valid_mask is not None else None
+                })
+            
+            base_maps = None
+            if use_cascade:
+                print(f"Running coarse inference (1/{self.cascade_factor} resolution)...")
+                with profiler.stage('coarse_pass'):
+                    base_maps, tile_mask = self._coarse_pass(bands1, bands2, tasks, tile_mask,
+                                                             scene['tile_stats'])
+            
+            print("Running model inference...")
+            with profiler.stage('inference'):
+                predictions = self._run_model(
+                    bands1, bands2, tasks,
+                    tile_size=self.prefilter.tile_size if tile_mask is not None else None,
+                    tile_mask=tile_mask,
+                    base_maps=base_maps,
+                    tta=use_tta,
+                    profiler=profiler
+                )
+        finally:
+            profiler.detach(hooks)
+        
+        report = self.build_report(scene, predictions, tasks, date1, date2, location,
+                                   tta=use_tta, output_dir=output_dir, profiler=profiler, trace=trace,
+                                   explain=explain, progress=progress)
+        return (report, predictions) if return_predictions else report
+    
+    def prepare_scene(self, img1_folder, img2_folder, prefilter=False, cloud_mask=False, profiler=None,
+                      roi=None, band_order=None):
+        """
+        Everything that happens before inference: band loading, spectral indices,
+        cloud mask and tile selection
+        
+        Args:
+            roi: Optional region of interest (see roi.parse_roi); only its window is
+                 read from each band
+            band_order: Band names of multi-band files in file order
+        
+        Returns:
+            Dictionary with bands1, bands2, indices1, indices2, valid_mask (None
+            without cloud masking), tile_mask (None when every tile is inferred),
+            tile_stats, georef (CRS and transform of the "before" bands), roi_mask
+            (None without ROI or when the ROI fills its window) and roi (summary)
+        """
+        with stage(profiler, 'band_load'):
+            print("Loading images...")
+            georef = read_georeference(img1_folder)
+            window = roi_mask = roi_info = None
+            if roi is not None:
+                window, roi_mask, roi_info = locate_roi(
+                    parse_roi(roi), georef['height'], georef['width'], georef['transform']
+                )
+                georef = {**georef, 'transform': rasterio.windows.transform(window, georef['transform']),
+                          'height': roi_info['window']['height'], 'width': roi_info['window']['width']}
+                print(f"ROI: {roi_info['pixels']:,} of {roi_info['scene_pixels']:,} pixels")
+            bands1 = self.load_image_bands(img1_folder, window, band_order)
+            bands2 = self.load_image_bands(img2_folder, window, band_order)
+        
+        return self.scene_from_bands(bands1, bands2, prefilter, cloud_mask, profiler,
+                                     georef=georef, roi_mask=roi_mask, roi_info=roi_info)
+    
+    def scene_from_bands(self, bands1, bands2, prefilter=False, cloud_mask=False, profiler=None,
+                         georef=None, roi_mask=None, roi_info=None):
+        """
+        prepare_scene for bands that are already in memory (e.g. a stored
+        monitoring baseline): spectral indices, cloud mask and tile selection
         
-        # Add model predictions to report
-        report['model_predictions'] = {
-            'total_change_percent': float(np.mean(change_map > config.CHANGE_THRESHOLD) * 100),
-            'vegetation_increase_pixels': int(np.sum(np.argmax(vegetation_map, axis=0) == 1)),
-            'vegetation_decrease_pixels': int(np.sum(np.argmax(vegetation_map, axis=0) == 2)),
-            'urban_construction_pixels': int(np.sum(np.argmax(urban_map, axis=0) == 1)),
-            'urban_demolition_pixels': int(np.sum(np.argmax(urban_map, axis=0) == 2))
+        Returns:
+            Same dictionary as prepare_scene
+        """
+        # Spectral indices are shared by the prefilter and the analyzer
+        with stage(profiler, 'indices'):
+            indices1 = self.analyzer.calculate_indices(bands1)
+            indices2 = self.analyzer.calculate_indices(bands2)
+        
+        valid_mask = None
+        if cloud_mask:
+            with stage(profiler, 'cloud_mask'):
+                cloudy = self.cloud_masker.pair_mask(bands1, bands2)
+                valid_mask = ~cloudy
+            print(f"Cloud mask: {cloudy.mean() * 100:.1f}% of pixels unusable")
+        
+        with stage(profiler, 'tile_selection'):
+            tile_mask, tile_stats = self._select_tiles(
+                bands1, bands2, indices1, indices2, prefilter, valid_mask, roi_mask
+            )
+        
+        return {
+            'bands1': bands1,
+            'bands2': bands2,
+            'indices1': indices1,
+            'indices2': indices2,
+            'valid_mask': valid_mask,
+            'tile_mask': tile_mask,
+            'tile_stats': tile_stats,
+            'georef': georef,
+            'roi_mask': roi_mask,
+            'roi': roi_info
         }
+    
+    def build_report(self, scene, predictions, tasks, date1=None, date2=None, location="Unknown",
+                     tta=False, output_dir=None, profiler=None, trace=False, explain=True,
+                     progress=None):
+        """
+        Everything that happens after inference: analysis report, visualization,
+        result files and LLM explanations
+        
+        Args:
+            scene: Output of prepare_scene
+            predictions: (C, H, W) maps per task from the model
+            progress: Optional callback(event, data), see predict
+        
+        Returns:
+            Dictionary containing predictions and analysis
+        """
+        profiler = profiler or PipelineProfiler()
+        bands1, bands2 = scene['bands1'], scene['bands2']
+        valid_mask = scene['valid_mask']
+        roi_mask = scene.get('roi_mask')
+        # Pixels the statistics and products cover: cloud-free and inside the ROI
+        analysis_mask = self.analyzer.combine_masks(valid_mask, roi_mask)
+        tile_stats = scene['tile_stats']
+        
+        # None for heads that were skipped
+        change_map = predictions['change'][0] if 'change' in predictions else None
+        vegetation_map = predictions.get('vegetation')
+        urban_map = predictions.get('urban')
+        
+        print("Analyzing environmental changes...")
+        with profiler.stage('report'):
+            model_predictions = self._summarize_predictions(
+                change_map, vegetation_map, urban_map, analysis_mask
+            )
+            model_predictions['tasks'] = list(tasks)
+            model_predictions['tta'] = tta
+            if tile_stats:
+                model_predictions['tile_selection'] = tile_stats
+            if progress:
+                progress('inference_done', {'model_predictions': model_predictions})
+            
+            # Generate detailed analysis
+            report = self.analyzer.generate_report(
+                bands1, bands2, date1, date2, location,
+                indices1=scene['indices1'], indices2=scene['indices2'], valid_mask=valid_mask,
+                roi_mask=roi_mask
+            )
+            if scene.get('roi'):
+                report['roi'] = scene['roi']
+            if self.model_info:
+                report['model'] = dict(self.model_info)
+            scene_footprint = footprint(scene.get('georef'))
+            if scene_footprint:
+                report['footprint'] = scene_footprint
+            
+            # Add model predictions to report
+            report['model_predictions'] = model_predictions
+            
+            # Kept so figures can be recomputed for other thresholds (analyzer.rethreshold)
+            histograms = self.analyzer.diff_histograms(scene['indices1'], scene['indices2'], analysis_mask)
+            if change_map is not None:
+                histograms['change_probability'] = QuantizedHistogram.from_values(
+                    change_map if analysis_mask is None else change_map[analysis_mask],
+                    *RANGES['change_probability']
+                )
+            report['thresholds'] = {
+                'index_change': config.INDEX_CHANGE_THRESHOLD,
+                'change_probability': config.CHANGE_THRESHOLD
+            }
+        
+        # Individual change patches with area, centroid, bbox and mean probability
+        with profiler.stage('regions'):
+            georef = scene.get('georef')
+            regions = extract_regions(change_map, vegetation_map, urban_map, analysis_mask,
+                                      transform=georef['transform'] if georef else None)
+            report['regions'] = {
+                'file': REGION_FILE,
+                'min_area_pixels': config.REGION_MIN_AREA_PIXELS,
+                **region_summary(regions)
+            }
+        if progress:
+            progress('report_ready', {'report': report})
         
         print("Generating visualizations...")
         # Create visualizations
-        output_dir = os.path.join(config.RESULTS_DIR, f"{location}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        if output_dir is None:
+            output_dir = os.path.join(config.RESULTS_DIR, f"{location}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
         os.makedirs(output_dir, exist_ok=True)
         
-        self.visualizer.create_change_visualization(
-            bands1, bands2, change_map, vegetation_map, urban_map,
-            output_path=os.path.join(output_dir, 'change_analysis.png')
-        )
+        with profiler.stage('visualization'):
+            self.visualizer.create_change_visualization(
+                bands1, bands2, change_map, vegetation_map, urban_map,
+                output_path=os.path.join(output_dir, 'change_analysis.png')
+            )
+        if progress:
+            progress('visualization_ready', {'file': 'change_analysis.png'})
         
-        # Save report
-        report_path = os.path.join(output_dir, 'analysis_report.json')
-        with open(report_path, 'w') as f:
-            json.dump(report, f, indent=4)
+        with profiler.stage('disk_write'):
+            # Per-pixel products as Cloud-Optimized GeoTIFFs for GIS use
+            if config.COG_EXPORT_ENABLED:
+                report['products'] = export_change_products(
+                    output_dir, change_map, vegetation_map, urban_map,
+                    georef=scene.get('georef'), valid_mask=analysis_mask
+                )
+            
+            save_histograms(os.path.join(output_dir, HISTOGRAM_FILE), histograms)
+            np.save(os.path.join(output_dir, REGION_FILE), regions)
+            report['histograms'] = {'file': HISTOGRAM_FILE, 'bin_width': config.HISTOGRAM_BIN_WIDTH}
+            
+            # Save report
+            report_path = os.path.join(output_dir, 'analysis_report.json')
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=4)
+            
+            # Generate text report
+            self._generate_text_report(report, os.path.join(output_dir, 'report.txt'))
         
-        # Generate text report
-        self._generate_text_report(report, os.path.join(output_dir, 'report.txt'))
+        # Generate LLM explanation if available (template text if it fails or times out)
+        if explain and self.llm_explainer:
+            print("Generating LLM explanations...")
+            with profiler.stage('llm'):
+                explanations = explain_with_timeout(self.llm_explainer, report)
+            report['llm_explanations'] = explanations
+            
+            # Save LLM report
+            self._generate_llm_report(report, explanations, 
+                                     os.path.join(output_dir, 'llm_report.txt'))
+            print(f"✓ LLM explanations generated ({explanations['source']})")
         
-        # Generate LLM explanation if available
-        if self.llm_explainer:
-            try:
-                print("Generating LLM explanations...")
-                explanations = self.llm_explainer.generate_explanation(report)
-                report['llm_explanations'] = explanations
-                
-                # Save LLM report
-                self._generate_llm_report(report, explanations, 
-                                         os.path.join(output_dir, 'llm_report.txt'))
-                print("✓ LLM explanations generated")
-            except Exception as e:
-                print(f"⚠️  Could not generate LLM explanations: {e}")
+        report['profiling'] = {'stages': profiler.summary(), 'peak_rss_mb': peak_rss_mb()}
+        if trace:
+            profiler.export_chrome_trace(os.path.join(output_dir, 'trace.json'))
+            report['profiling']['trace_file'] = 'trace.json'
         
         print(f"\nResults saved to: {output_dir}")
         return report
     
+    def _select_tiles(self, bands1, bands2, indices1, indices2, use_prefilter, valid_mask,
+                      roi_mask=None):
+        """
+        Flag the tiles (prefilter tile grid) that need model inference
+        
+        Tiles are skipped when the prefilter finds no spectral change, when
+        they are (almost) entirely cloud or when they lie outside the ROI.
+        
+        Returns:
+            (tile_mask, stats); tile_mask is None when the whole scene is inferred
+        """
+        tile_mask = None
+        stats = {}
+        
+        if use_prefilter:
+            _, tile_mask = self.prefilter.select_tiles(bands1, bands2, indices1, indices2)
+            stats['spectral_change_tiles'] = int(tile_mask.sum())
+        
+        if valid_mask is not None:
+            clear = self.cloud_masker.clear_tiles(~valid_mask, self.prefilter.tile_size)
+            stats['clouded_tiles'] = int((~clear).sum())
+            if not clear.all():
+                tile_mask = clear if tile_mask is None else tile_mask & clear
+        
+        if roi_mask is not None:
+            inside = tile_max(roi_mask.astype(np.float32), self.prefilter.tile_size) > 0
+            stats['outside_roi_tiles'] = int((~inside).sum())
+            if not inside.all():
+                tile_mask = inside if tile_mask is None else tile_mask & inside
+        
+        if tile_mask is not None:
+            stats.update({
+                'tiles_total': int(tile_mask.size),
+                'tiles_inferred': int(tile_mask.sum()),
+                'skipped_percent': float((1 - tile_mask.mean()) * 100)
+            })
+            print(f"Tile selection: {stats['tiles_inferred']}/{stats['tiles_total']} tiles need inference")
+        
+        return tile_mask, stats
+    
+    def _coarse_pass(self, bands1, bands2, tasks, tile_mask, tile_stats):
+        """
+        Cascade stage: infer on a downsampled scene and pick the tiles to refine
+        
+        Tiles already excluded by tile_mask (prefilter, clouds) get the "no change"
+        fill; the other tiles start from the upsampled coarse prediction and are
+        refined at full resolution only if their coarse change probability reaches
+        CHANGE_THRESHOLD - cascade_margin.
+        
+        Returns:
+            (base_maps, refine_mask) to pass to _run_model
+        """
+        _, height, width = bands1.shape
+        tile_size = self.prefilter.tile_size
+        factor = self.cascade_factor
+        
+        # The change head drives the refinement decision, so it always runs
+        coarse_tasks = resolve_tasks(set(tasks) | {'change'})
+        coarse1 = F.avg_pool2d(torch.from_numpy(bands1).unsqueeze(0), factor, ceil_mode=True)[0].numpy()
+        coarse2 = F.avg_pool2d(torch.from_numpy(bands2).unsqueeze(0), factor, ceil_mode=True)[0].numpy()
+        coarse = self._run_model(coarse1, coarse2, coarse_tasks)
+        
+        base_maps = {
+            task: F.interpolate(torch.from_numpy(out).unsqueeze(0), size=(height, width),
+                                mode='bilinear', align_corners=False)[0].numpy()
+            for task, out in coarse.items()
+        }
+        
+        refine_mask = tile_max(base_maps['change'][0], tile_size) >= config.CHANGE_THRESHOLD - self.cascade_margin
+        if tile_mask is not None:
+            no_change = self._no_change_maps(tasks, tile_size, tile_size)
+            windows = tile_windows(height, width, tile_size)
+            for (y0, y1, x0, x1), keep in zip(windows, tile_mask):
+                if not keep:
+                    for task in tasks:
+                        base_maps[task][:, y0:y1, x0:x1] = no_change[task][:, :y1 - y0, :x1 - x0]
+            refine_mask &= tile_mask
+        
+        tile_stats.update({
+            'cascade_factor': factor,
+            'tiles_total': int(refine_mask.size),
+            'tiles_inferred': int(refine_mask.sum()),
+            'skipped_percent': float((1 - refine_mask.mean()) * 100)
+        })
+        return {task: base_maps[task] for task in tasks}, refine_mask
+    
+    def _forward(self, img1_tensor, img2_tensor, tasks, tta=False):
+        """Model forward pass, averaged over flip/rot90 variants in one batch when tta is set"""
+        if tta:
+            return batched_tta(self.model, img1_tensor, img2_tensor, tasks=tasks)
+        with torch.no_grad():
+            return self.model(img1_tensor, img2_tensor, tasks=tasks)
+    
+    def _run_model(self, bands1, bands2, tasks, tile_size=None, tile_mask=None, base_maps=None,
+                   tta=False, profiler=None):
+        """
+        Run the model over the whole scene, tile by tile when a tile size is set
+        (tiles overlap by self.tile_overlap pixels and are blended, see tiling.TileBlender)
+        
+        Args:
+            tile_size: Overrides self.tile_size
+            tile_mask: Boolean flag per tile (tiling.tile_windows order); tiles that
+                       are False are not inferred and keep the base_maps values
+            base_maps: Initial (C, H, W) maps per task, filled in place
+                       (default: "no change" everywhere)
+            tta: Average over flip/rot90 test-time augmentations (one batched pass)
+            profiler: Optional PipelineProfiler for tensor_transfer/forward events
+        
+        Returns:
+            Dictionary of (C, H, W) numpy maps, one per task
+        """
+        _, height, width = bands1.shape
+        tile_size = tile_size or self.tile_size
+        
+        if not tile_size:
+            with stage(profiler, 'tensor_transfer'):
+                img1_tensor = torch.from_numpy(bands1).unsqueeze(0).to(self.device)
+                img2_tensor = torch.from_numpy(bands2).unsqueeze(0).to(self.device)
+            with stage(profiler, 'forward'):
+                predictions = self._forward(img1_tensor, img2_tensor, tasks, tta)
+            with stage(profiler, 'tensor_transfer'):
+                return {task: out.cpu().numpy()[0] for task, out in predictions.items()}
+        
+        outputs = base_maps if base_maps is not None else self._no_change_maps(tasks, height, width)
+        windows = tile_windows(height, width, tile_size)
+        if tile_mask is not None:
+            windows = [window for window, keep in zip(windows, tile_mask) if keep]
+        
+        blender = TileBlender(outputs, self.tile_overlap)
+        input_size = tile_size + 2 * self.tile_overlap
+        
+        for start in range(0, len(windows), self.batch_size):
+            batch = windows[start:start + self.batch_size]
+            grown = [context_window(window, height, width, self.tile_overlap) for window in batch]
+            with stage(profiler, 'tensor_transfer'):
+                img1_tensor = torch.from_numpy(np.stack([
+                    pad_tile(bands1[:, y0:y1, x0:x1], input_size) for y0, y1, x0, x1 in grown
+                ])).to(self.device)
+                img2_tensor = torch.from_numpy(np.stack([
+                    pad_tile(bands2[:, y0:y1, x0:x1], input_size) for y0, y1, x0, x1 in grown
+                ])).to(self.device)
+            
+            with stage(profiler, 'forward'):
+                predictions = self._forward(img1_tensor, img2_tensor, tasks, tta)
+            
+            with stage(profiler, 'tensor_transfer'):
+                predictions = {task: out.cpu().numpy() for task, out in predictions.items()}
+                for i, (window, (y0, y1, x0, x1)) in enumerate(zip(batch, grown)):
+                    blender.add(window, (y0, y1, x0, x1),
+                                {task: out[i, :, :y1 - y0, :x1 - x0] for task, out in predictions.items()})
+        
+        return blender.finish()
+    
+    def _no_change_maps(self, tasks, height, width):
+        """Model outputs meaning "no change" everywhere: zero change probability, class 0"""
+        outputs = {}
+        for task in tasks:
+            outputs[task] = np.zeros((TASK_CHANNELS[task], height, width), dtype=np.float32)
+            if task != 'change':
+                outputs[task][0] = 1.0
+        return outputs
+    
+    def _summarize_predictions(self, change_map, vegetation_map, urban_map, valid_mask=None):
+        """Pixel statistics for the model outputs that were computed (usable pixels only)"""
+        def valid(values):
+            return values if valid_mask is None else values[valid_mask]
+        
+        summary = {}
+        if change_map is not None:
+            changed = valid(change_map > config.CHANGE_THRESHOLD)
+            summary['total_change_percent'] = float(np.mean(changed) * 100) if changed.size else 0.0
+        if vegetation_map is not None:
+            veg_class = valid(np.argmax(vegetation_map, axis=0))
+            summary['vegetation_increase_pixels'] = int(np.sum(veg_class == 1))
+            summary['vegetation_decrease_pixels'] = int(np.sum(veg_class == 2))
+        if urban_map is not None:
+            urban_class = valid(np.argmax(urban_map, axis=0))
+            summary['urban_construction_pixels'] = int(np.sum(urban_class == 1))
+            summary['urban_demolition_pixels'] = int(np.sum(urban_class == 2))
+        return summary
+    
     def _generate_text_report(self, report, output_path):
         """Generate human-readable text report"""
         with open(output_path, 'w') as f:
@@ -209,88 +676,60 @@ class ChangeDetectionPredictor:
 
     def _generate_llm_report(self, report, explanations, output_path):
         """Generate LLM-enhanced text report"""
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write("ENVIRONMENTAL CHANGE ANALYSIS - LLM ENHANCED REPORT\n")
-            f.write("=" * 80 + "\n\n")
-            
-            # Metadata
-            f.write("LOCATION: " + report['metadata']['location'] + "\n")
-            f.write("TIME PERIOD: " + report['metadata']['date_before'] + 
-                   " to " + report['metadata']['date_after'] + "\n")
-            f.write("ANALYSIS DATE: " + report['metadata']['analysis_date'] + "\n")
-            f.write("\n" + "=" * 80 + "\n\n")
-            
-            # Executive Summary
-            f.write("EXECUTIVE SUMMARY\n")
-            f.write("-" * 80 + "\n")
-            f.write(explanations['executive_summary'].strip() + "\n\n")
-            
-            # Detailed Analysis
-            f.write("DETAILED ANALYSIS\n")
-            f.write("-" * 80 + "\n")
-            f.write(explanations['detailed_analysis'].strip() + "\n\n")
-            
-            # Environmental Impact
-            f.write("ENVIRONMENTAL IMPACT ASSESSMENT\n")
-            f.write("-" * 80 + "\n")
-            f.write(explanations['environmental_impact'].strip() + "\n\n")
-            
-            # Recommendations
-            f.write("RECOMMENDATIONS\n")
-            f.write("-" * 80 + "\n")
-            f.write(explanations['recommendations'].strip() + "\n\n")
-            
-            # Key Insights
-            f.write("KEY INSIGHTS\n")
-            f.write("-" * 80 + "\n")
-            f.write(explanations['key_insights'].strip() + "\n\n")
-            
-            # Raw Data Section
-            f.write("=" * 80 + "\n")
-            f.write("RAW DATA\n")
-            f.write("=" * 80 + "\n\n")
-            
-            veg = report['vegetation_analysis']
-            f.write("VEGETATION METRICS:\n")
-            f.write(f"  Increase: {veg['vegetation_increase_percent']:.2f}%\n")
-            f.write(f"  Decrease: {veg['vegetation_decrease_percent']:.2f}%\n")
-            f.write(f"  Mean NDVI Change: {veg['mean_ndvi_change']:.4f}\n\n")
-            
-            urban = report['urban_analysis']
-            f.write("URBAN METRICS:\n")
-            f.write(f"  Urbanization: {urban['urbanization_percent']:.2f}%\n")
-            f.write(f"  Construction: {urban['construction_area_km2']:.2f} km²\n")
-            f.write(f"  Demolition: {urban['demolition_area_km2']:.2f} km²\n\n")
-            
-            water = report['water_analysis']
-            f.write("WATER METRICS:\n")
-            f.write(f"  Increase: {water['water_increase_percent']:.2f}%\n")
-            f.write(f"  Decrease: {water['water_decrease_percent']:.2f}%\n")
-            f.write(f"  Gain: {water['water_gain_area_km2']:.2f} km²\n")
-            f.write(f"  Loss: {water['water_loss_area_km2']:.2f} km²\n\n")
-            
-            f.write("=" * 80 + "\n")
+        write_llm_report(report, explanations, output_path)
+
 
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Satellite Change Detection and Analysis')
-    parser.add_argument('--img1', required=True, help='Path to before image folder')
-    parser.add_argument('--img2', required=True, help='Path to after image folder')
+    parser.add_argument('--img1', required=True,
+                        help='Path to before image folder, multi-band GeoTIFF/COG or RGB PNG/JPEG')
+    parser.add_argument('--img2', required=True,
+                        help='Path to after image folder, multi-band GeoTIFF/COG or RGB PNG/JPEG')
     parser.add_argument('--date1', help='Date of first image (YYYYMMDD)')
     parser.add_argument('--date2', help='Date of second image (YYYYMMDD)')
     parser.add_argument('--location', default='Unknown', help='Location name')
     parser.add_argument('--model', default='models/best_model.pth', help='Path to trained model')
+    parser.add_argument('--tasks', default=None,
+                        help='Comma-separated model outputs to compute (change,vegetation,urban)')
+    parser.add_argument('--prefilter', action='store_true', default=None,
+                        help='Skip inference on tiles without spectral change')
+    parser.add_argument('--cascade', action='store_true', default=None,
+                        help='Coarse-to-fine inference: refine only tiles with likely change')
+    parser.add_argument('--tta', action='store_true', default=None,
+                        help='Average predictions over flip/rot90 variants')
+    parser.add_argument('--trace', action='store_true',
+                        help='Export per-stage timings as a Chrome/Perfetto trace (trace.json)')
+    parser.add_argument('--no-cloud-mask', dest='cloud_mask', action='store_false', default=None,
+                        help='Do not exclude cloud/haze pixels')
+    parser.add_argument('--band-order', default=None,
+                        help='Band names of multi-band GeoTIFFs in file order, e.g. B01,B02,...,B12,B8A')
     
     args = parser.parse_args()
+    if args.band_order:
+        try:
+            parse_band_order(args.band_order)
+        except ValueError as e:
+            parser.error(str(e))
     
     predictor = ChangeDetectionPredictor(args.model)
-    report = predictor.predict(
-        args.img1, args.img2,
-        args.date1, args.date2,
-        args.location
-    )
+    options = dict(tasks=args.tasks, prefilter=args.prefilter, cloud_mask=args.cloud_mask,
+                   cascade=args.cascade, tta=args.tta, trace=args.trace)
+    if all(os.path.splitext(path)[1].lower() in ['.png', '.jpg', '.jpeg'] for path in (args.img1, args.img2)):
+        # RGB images: synthetic bands straight into the predictor, no band files
+        from image_converter import ImageConverter
+        converter = ImageConverter()
+        if args.cloud_mask is None:
+            options['cloud_mask'] = False  # synthetic cirrus/SWIR bands carry no cloud signal, as in the API
+        report = predictor.predict_bands(
+            converter.convert_rgb_to_array(args.img1), converter.convert_rgb_to_array(args.img2),
+            args.date1, args.date2, args.location, **options
+        )
+    else:
+        # Band folders or multi-band GeoTIFF/COG files (band_io.band_source)
+        report = predictor.predict(args.img1, args.img2, args.date1, args.date2, args.location,
+                                   band_order=args.band_order, **options)
     
     print("\n" + "=" * 80)
     print("ANALYSIS COMPLETE")
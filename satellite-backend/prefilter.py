@@ -0,0 +1,65 @@
+"""Spectral-difference prefilter that flags tiles worth running the model on"""
+
+import numpy as np
+
+import config
+from analyzer import EnvironmentalAnalyzer
+from tiling import tile_windows
+
+
+def tile_fractions(mask, tile_size):
+    """
+    Share of True pixels in each tile of a (H, W) boolean mask
+    
+    Returns:
+        1-D array in the same row-major order as tiling.tile_windows
+    """
+    height, width = mask.shape
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+    padded = np.zeros((rows * tile_size, cols * tile_size), dtype=np.float32)
+    padded[:height, :width] = mask
+    valid = np.zeros_like(padded)
+    valid[:height, :width] = 1
+    
+    counts = padded.reshape(rows, tile_size, cols, tile_size).sum(axis=(1, 3))
+    sizes = valid.reshape(rows, tile_size, cols, tile_size).sum(axis=(1, 3))
+    return (counts / sizes).ravel()
+
+
+class SpectralPrefilter:
+    """Marks tiles whose index and band differences are too small to contain change"""
+    
+    def __init__(self, analyzer=None, tile_size=None, index_threshold=None,
+                 band_l1_threshold=None, min_changed_fraction=None):
+        self.analyzer = analyzer or EnvironmentalAnalyzer()
+        self.tile_size = tile_size or config.PREFILTER_TILE_SIZE
+        self.index_threshold = (config.PREFILTER_INDEX_THRESHOLD
+                                if index_threshold is None else index_threshold)
+        self.band_l1_threshold = (config.PREFILTER_BAND_L1_THRESHOLD
+                                  if band_l1_threshold is None else band_l1_threshold)
+        self.min_changed_fraction = (config.PREFILTER_MIN_CHANGED_FRACTION
+                                     if min_changed_fraction is None else min_changed_fraction)
+    
+    def changed_pixels(self, bands1, bands2, indices1=None, indices2=None):
+        """Per-pixel boolean map of spectral change"""
+        indices1 = indices1 if indices1 is not None else self.analyzer.calculate_indices(bands1)
+        indices2 = indices2 if indices2 is not None else self.analyzer.calculate_indices(bands2)
+        
+        changed = np.mean(np.abs(bands2 - bands1), axis=0) > self.band_l1_threshold
+        for index in ('ndvi', 'ndbi', 'ndwi'):
+            changed |= np.abs(indices2[index] - indices1[index]) > self.index_threshold
+        return changed
+    
+    def select_tiles(self, bands1, bands2, indices1=None, indices2=None):
+        """
+        Decide which tiles need model inference
+        
+        Returns:
+            (windows, flags): tile windows from tiling.tile_windows and a boolean
+            array, True where the tile has enough spectral change to be inferred
+        """
+        _, height, width = bands1.shape
+        changed = self.changed_pixels(bands1, bands2, indices1, indices2)
+        flags = tile_fractions(changed, self.tile_size) > self.min_changed_fraction
+        return tile_windows(height, width, self.tile_size), flags
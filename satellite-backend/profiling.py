@@ -0,0 +1,157 @@
+"""
+Per-stage profiling for the prediction pipeline
+Records wall time, CPU time and RSS change per stage and exports Chrome/Perfetto traces
+
+cpu_ms is CPU time of the thread that ran the stage; torch intra-op threads are
+not included. process_cpu_ms is CPU time of the whole process over the stage, so
+it includes intra-op threads but also any request running concurrently.
+rss_delta_mb is the change in resident memory from stage start to end.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Model submodules that get their own forward-pass events
+MODEL_SUBMODULES = ['encoder', 'attention', 'change_head', 'vegetation_head', 'urban_head']
+
+
+def current_rss_mb():
+    """Resident set size of this process now (MB), from /proc (Linux), None elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (MB), None where unsupported"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stage(profiler, name):
+    """profiler.stage(name), or a no-op context when profiler is None"""
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+class PipelineProfiler:
+    """Collects timed events for each stage of one analysis"""
+
+    def __init__(self):
+        self.events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._open = {}
+
+    @staticmethod
+    def _mark():
+        """Wall clock, thread CPU, process CPU and RSS at one instant"""
+        return time.perf_counter(), time.thread_time(), time.process_time(), current_rss_mb()
+
+    def _record(self, name, start):
+        end = self._mark()
+        rss_start, rss_end = start[3], end[3]
+        with self._lock:
+            self.events.append({
+                'name': name,
+                'start_ms': (start[0] - self._origin) * 1000,
+                'wall_ms': (end[0] - start[0]) * 1000,
+                'cpu_ms': (end[1] - start[1]) * 1000,
+                'process_cpu_ms': (end[2] - start[2]) * 1000,
+                'rss_mb': rss_end,
+                'rss_delta_mb': rss_end - rss_start if rss_start is not None else None,
+                'thread': threading.get_ident()
+            })
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one event"""
+        start = self._mark()
+        try:
+            yield
+        finally:
+            self._record(name, start)
+
+    def attach_model(self, model):
+        """
+        Add forward.<submodule> events for the encoder, attention and each head
+
+        Returns:
+            Hook handles; pass them to detach() when done
+        """
+        handles = []
+        for name in MODEL_SUBMODULES:
+            module = getattr(model, name, None)
+            if module is None:
+                continue
+            key = f'forward.{name}'
+
+            def pre_hook(_module, _inputs, key=key):
+                self._open[(key, threading.get_ident())] = self._mark()
+
+            def post_hook(_module, _inputs, _output, key=key):
+                started = self._open.pop((key, threading.get_ident()), None)
+                if started:
+                    self._record(key, started)
+
+            handles.append(module.register_forward_pre_hook(pre_hook))
+            handles.append(module.register_forward_hook(post_hook))
+        return handles
+
+    @staticmethod
+    def detach(handles):
+        for handle in handles:
+            handle.remove()
+
+    def summary(self):
+        """
+        Totals per stage name, in first-seen order; rss_mb is the largest RSS
+        seen at the end of a call and rss_delta_mb the largest growth in one call
+        """
+        stages = {}
+        with self._lock:
+            for event in self.events:
+                entry = stages.setdefault(event['name'], {
+                    'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0, 'process_cpu_ms': 0.0,
+                    'rss_mb': None, 'rss_delta_mb': None
+                })
+                entry['calls'] += 1
+                for key in ('wall_ms', 'cpu_ms', 'process_cpu_ms'):
+                    entry[key] += event[key]
+                for key in ('rss_mb', 'rss_delta_mb'):
+                    if event[key] is not None:
+                        entry[key] = event[key] if entry[key] is None else max(entry[key], event[key])
+        return stages
+
+    def chrome_trace(self):
+        """Events in the Chrome trace event format (also read by Perfetto)"""
+        pid = os.getpid()
+        with self._lock:
+            trace_events = [{
+                'name': event['name'],
+                'cat': event['name'].split('.')[0],
+                'ph': 'X',
+                'ts': event['start_ms'] * 1000,
+                'dur': event['wall_ms'] * 1000,
+                'pid': pid,
+                'tid': event['thread'],
+                'args': {key: event[key] for key in ('cpu_ms', 'process_cpu_ms', 'rss_mb', 'rss_delta_mb')}
+            } for event in self.events]
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        """Write the trace as JSON (open in chrome://tracing or ui.perfetto.dev)"""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
@@ -0,0 +1,178 @@
+"""
+Connected change regions (construction sites, cleared forest, ...)
+Extracted from the thresholded change map and class maps with OpenCV, and kept
+as a NumPy structured array: one row per region, queryable by kind, area or bbox
+"""
+
+import numpy as np
+import cv2
+from affine import Affine
+
+import config
+from cog_export import VEGETATION_CLASSES, URBAN_CLASSES
+
+REGION_FILE = 'regions.npy'
+
+# Region kinds, stored as a uint8 code
+KINDS = ['change'] + \
+    [label for value, label in sorted(VEGETATION_CLASSES.items()) if value] + \
+    [label for value, label in sorted(URBAN_CLASSES.items()) if value]
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+REGION_DTYPE = np.dtype([
+    ('kind', np.uint8),
+    ('area_pixels', np.uint32),
+    ('area_m2', np.float32),
+    ('centroid_row', np.float32),
+    ('centroid_col', np.float32),
+    ('centroid_x', np.float64),  # CRS coordinates (pixel coordinates without georeferencing)
+    ('centroid_y', np.float64),
+    ('row_min', np.uint32),
+    ('col_min', np.uint32),
+    ('height', np.uint32),
+    ('width', np.uint32),
+    ('mean_probability', np.float32)
+])
+
+
+def _components(mask, probability, kind, min_area, transform, pixel_area):
+    """Regions of one binary mask as REGION_DTYPE rows"""
+    count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        mask.view(np.uint8), connectivity=config.REGION_CONNECTIVITY, ltype=cv2.CV_32S
+    )
+    # Label 0 is the background
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    keep = np.flatnonzero(areas >= min_area)
+    if count <= 1 or keep.size == 0:
+        return np.empty(0, dtype=REGION_DTYPE)
+
+    # Mean probability per label in one pass over the scene
+    sums = np.bincount(labels.ravel(), weights=probability.ravel(), minlength=count)[1:]
+
+    regions = np.empty(keep.size, dtype=REGION_DTYPE)
+    regions['kind'] = KIND_CODES[kind]
+    regions['area_pixels'] = areas[keep]
+    regions['area_m2'] = areas[keep] * pixel_area
+    cols, rows = centroids[1:][keep, 0], centroids[1:][keep, 1]
+    regions['centroid_col'] = cols
+    regions['centroid_row'] = rows
+    # Pixel centres (+0.5) through the geotransform
+    regions['centroid_x'] = transform.a * (cols + 0.5) + transform.b * (rows + 0.5) + transform.c
+    regions['centroid_y'] = transform.d * (cols + 0.5) + transform.e * (rows + 0.5) + transform.f
+    regions['col_min'] = stats[1:][keep, cv2.CC_STAT_LEFT]
+    regions['row_min'] = stats[1:][keep, cv2.CC_STAT_TOP]
+    regions['width'] = stats[1:][keep, cv2.CC_STAT_WIDTH]
+    regions['height'] = stats[1:][keep, cv2.CC_STAT_HEIGHT]
+    regions['mean_probability'] = sums[keep] / areas[keep]
+    return regions
+
+
+def extract_regions(change_map=None, vegetation_map=None, urban_map=None, valid_mask=None,
+                    transform=None, threshold=None, min_area=None):
+    """
+    Connected regions of change and of each change class
+
+    Args:
+        change_map: (H, W) change probability, or None
+        vegetation_map, urban_map: (3, H, W) class scores, or None
+        valid_mask: Optional (H, W) bool mask; pixels outside it never join a region
+        transform: Affine geotransform for centroids and pixel areas; without
+                   georeferencing centroids stay in pixels and pixels count as 10 m
+        threshold: Change probability threshold (default: config.CHANGE_THRESHOLD)
+        min_area: Smallest region kept, in pixels (default: config.REGION_MIN_AREA_PIXELS)
+
+    Returns:
+        REGION_DTYPE structured array, grouped by kind
+    """
+    threshold = config.CHANGE_THRESHOLD if threshold is None else threshold
+    min_area = config.REGION_MIN_AREA_PIXELS if min_area is None else min_area
+    if transform is None or transform.is_identity:
+        transform = Affine.identity()
+        pixel_area = 100.0  # Sentinel-2 10 m bands, as assumed by the analyzer
+    else:
+        pixel_area = abs(transform.determinant)
+
+    def usable(mask):
+        return mask if valid_mask is None else mask & valid_mask
+
+    parts = []
+    if change_map is not None:
+        parts.append(_components(usable(change_map > threshold), change_map, 'change',
+                                 min_area, transform, pixel_area))
+    for scores, classes in ((vegetation_map, VEGETATION_CLASSES), (urban_map, URBAN_CLASSES)):
+        if scores is None:
+            continue
+        labels = np.argmax(scores, axis=0)
+        for value, kind in classes.items():
+            if value:
+                parts.append(_components(usable(labels == value), scores[value], kind,
+                                         min_area, transform, pixel_area))
+    if not parts:
+        return np.empty(0, dtype=REGION_DTYPE)
+    return np.concatenate(parts)
+
+
+def load_regions(path):
+    """Regions saved with np.save, memory-mapped so large tables load instantly"""
+    regions = np.load(path, mmap_mode='r')
+    if regions.dtype != REGION_DTYPE:
+        raise ValueError(f"{path} does not hold regions")
+    return regions
+
+
+def query_regions(regions, kind=None, min_area=None, max_area=None, bbox=None,
+                  sort='area', limit=None, offset=0):
+    """
+    Filter and sort regions without leaving NumPy
+
+    Args:
+        kind: Region kind (see KINDS) or None for all
+        min_area, max_area: Area bounds in m²
+        bbox: (row_min, col_min, row_max, col_max) in pixels; regions whose
+              centroid falls inside match
+        sort: 'area' (largest first), 'probability' (highest first) or None
+        limit, offset: Page of the sorted result
+
+    Returns:
+        (matching rows, total number of matches)
+    """
+    keep = np.ones(len(regions), dtype=bool)
+    if kind is not None:
+        keep &= regions['kind'] == KIND_CODES[kind]
+    if min_area is not None:
+        keep &= regions['area_m2'] >= min_area
+    if max_area is not None:
+        keep &= regions['area_m2'] <= max_area
+    if bbox is not None:
+        row_min, col_min, row_max, col_max = bbox
+        keep &= ((regions['centroid_row'] >= row_min) & (regions['centroid_row'] <= row_max)
+                 & (regions['centroid_col'] >= col_min) & (regions['centroid_col'] <= col_max))
+
+    matches = regions[keep]
+    if sort == 'area':
+        matches = matches[np.argsort(-matches['area_pixels'].astype(np.int64), kind='stable')]
+    elif sort == 'probability':
+        matches = matches[np.argsort(-matches['mean_probability'], kind='stable')]
+    end = None if limit is None else offset + limit
+    return matches[offset:end], int(keep.sum())
+
+
+def region_records(regions):
+    """Rows as JSON-serialisable dictionaries"""
+    records = []
+    for row in regions.tolist():
+        record = dict(zip(REGION_DTYPE.names, row))
+        record['kind'] = KINDS[record['kind']]
+        records.append(record)
+    return records
+
+
+def region_summary(regions, largest=10):
+    """Counts and areas per kind plus the largest regions, for the report"""
+    by_kind = {}
+    for code, kind in enumerate(KINDS):
+        rows = regions[regions['kind'] == code]
+        if len(rows):
+            by_kind[kind] = {'count': int(len(rows)), 'area_m2': float(rows['area_m2'].sum())}
+    top, _ = query_regions(regions, sort='area', limit=largest)
+    return {'count': int(len(regions)), 'by_kind': by_kind, 'largest': region_records(top)}
@@ -0,0 +1,173 @@
+"""
+Region-of-interest handling
+An ROI is a bbox or GeoJSON polygon in pixel (col, row) or raster CRS coordinates;
+it becomes the window read from each band plus a mask of the pixels inside it
+"""
+
+import json
+
+import numpy as np
+from affine import Affine
+from rasterio import features, windows
+
+COORDS = ('crs', 'pixel')
+
+
+def _number(value):
+    """float(value) for ints and floats only (not bools, strings or null)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+        raise ValueError
+    return float(value)
+
+
+def _check_polygon(rings):
+    """
+    Raises:
+        ValueError: Not a list of rings of at least 4 numeric [x, y] positions
+    """
+    if not isinstance(rings, (list, tuple)) or not rings:
+        raise ValueError("ROI polygon has no coordinates")
+    for ring in rings:
+        if not isinstance(ring, (list, tuple)) or len(ring) < 4:
+            raise ValueError("ROI polygon rings need at least 4 [x, y] positions")
+        for position in ring:
+            try:
+                if not isinstance(position, (list, tuple)) or len(position) < 2:
+                    raise ValueError
+                for value in position:
+                    _number(value)
+            except ValueError:
+                raise ValueError(f"ROI polygon position {position!r} is not [x, y]") from None
+
+
+def parse_roi(spec):
+    """
+    Validate an ROI given as a dict or JSON string
+
+    Accepted forms (each optionally with "coords": "crs" or "pixel", default "crs";
+    rasters without georeferencing use pixel coordinates as their CRS):
+        {"bbox": [minx, miny, maxx, maxy]}
+        GeoJSON Polygon or MultiPolygon geometry, Feature or FeatureCollection
+
+    Returns:
+        Dictionary with coords and a list of GeoJSON polygon geometries
+
+    Raises:
+        ValueError: Malformed ROI
+    """
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"ROI is not valid JSON: {e}")
+    if not isinstance(spec, dict):
+        raise ValueError("ROI must be a JSON object")
+
+    coords = spec.get('coords', 'crs')
+    if coords not in COORDS:
+        raise ValueError(f"ROI coords must be one of {COORDS}, got {coords!r}")
+
+    if 'bbox' in spec:
+        bbox = spec['bbox']
+        if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+            raise ValueError("ROI bbox must be [minx, miny, maxx, maxy]")
+        try:
+            minx, miny, maxx, maxy = (_number(value) for value in bbox)
+        except ValueError:
+            raise ValueError("ROI bbox values must be numbers") from None
+        if minx >= maxx or miny >= maxy:
+            raise ValueError("ROI bbox must have minx < maxx and miny < maxy")
+        geometries = [{
+            'type': 'Polygon',
+            'coordinates': [[(minx, miny), (maxx, miny), (maxx, maxy), (minx, maxy), (minx, miny)]]
+        }]
+    elif spec.get('type') == 'FeatureCollection':
+        members = spec.get('features')
+        if not isinstance(members, list):
+            raise ValueError("ROI FeatureCollection needs a features list")
+        geometries = [feature.get('geometry') if isinstance(feature, dict) else None for feature in members]
+    elif spec.get('type') == 'Feature':
+        geometries = [spec.get('geometry')]
+    else:
+        geometries = [{'type': spec.get('type'), 'coordinates': spec.get('coordinates')}]
+
+    for geometry in geometries:
+        if not isinstance(geometry, dict) or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+            raise ValueError("ROI geometries must be GeoJSON Polygons or MultiPolygons")
+        coordinates = geometry.get('coordinates')
+        if geometry['type'] == 'Polygon':
+            _check_polygon(coordinates)
+        elif not isinstance(coordinates, (list, tuple)) or not coordinates:
+            raise ValueError("ROI polygon has no coordinates")
+        else:
+            for polygon in coordinates:
+                _check_polygon(polygon)
+    if not geometries:
+        raise ValueError("ROI FeatureCollection has no features")
+
+    return {'coords': coords, 'geometries': geometries}
+
+
+def _to_pixels(geometry, inverse):
+    """Geometry with every (x, y) mapped through the inverse geotransform"""
+    def ring(points):
+        return [inverse * (float(x), float(y)) for x, y, *_ in points]
+
+    if geometry['type'] == 'Polygon':
+        return {'type': 'Polygon', 'coordinates': [ring(r) for r in geometry['coordinates']]}
+    return {'type': 'MultiPolygon',
+            'coordinates': [[ring(r) for r in polygon] for polygon in geometry['coordinates']]}
+
+
+def locate_roi(roi, height, width, transform):
+    """
+    Window and pixel mask of an ROI on a raster
+
+    Args:
+        roi: Output of parse_roi
+        height, width: Raster size
+        transform: Raster geotransform (identity when not georeferenced)
+
+    Returns:
+        (window, mask, info): rasterio Window covering the ROI, (h, w) bool mask
+        of the pixels inside it (None when the whole window is inside) and a
+        JSON-serialisable summary for the report
+
+    Raises:
+        ValueError: The ROI does not overlap the raster
+    """
+    inverse = ~transform if roi['coords'] == 'crs' else Affine.identity()
+    pixel_geometries = [_to_pixels(geometry, inverse) for geometry in roi['geometries']]
+
+    points = np.array([point
+                       for geometry in pixel_geometries
+                       for polygon in (geometry['coordinates'] if geometry['type'] == 'MultiPolygon'
+                                       else [geometry['coordinates']])
+                       for ring in polygon
+                       for point in ring])
+    col_min, row_min = np.floor(points.min(axis=0)).astype(int)
+    col_max, row_max = np.ceil(points.max(axis=0)).astype(int)
+    col_min, row_min = max(col_min, 0), max(row_min, 0)
+    col_max, row_max = min(col_max, width), min(row_max, height)
+    if col_min >= col_max or row_min >= row_max:
+        raise ValueError("ROI does not overlap the image")
+
+    window = windows.Window(col_off=col_min, row_off=row_min,
+                            width=col_max - col_min, height=row_max - row_min)
+    # Pixel centres inside the polygons, in window coordinates
+    mask = features.geometry_mask(
+        pixel_geometries, out_shape=(int(window.height), int(window.width)),
+        transform=Affine.translation(col_min, row_min), invert=True
+    )
+    if not mask.any():
+        raise ValueError("ROI does not cover any pixel centre")
+
+    info = {
+        'coords': roi['coords'],
+        'window': {'col_off': int(col_min), 'row_off': int(row_min),
+                   'width': int(window.width), 'height': int(window.height)},
+        'bounds': [float(value) for value in windows.bounds(window, transform)],
+        'pixels': int(mask.sum()),
+        'scene_pixels': int(height * width)
+    }
+    return window, (None if mask.all() else mask), info
@@ -0,0 +1,248 @@
+"""
+Spatial index of past analyses
+Footprints (WGS84 bounds from the band georeferencing), dates and headline
+statistics in an SQLite R-tree, for "what has been analysed over this area" queries
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import rasterio.transform
+import rasterio.warp
+
+import config
+
+_DATE_FORMATS = (
+    re.compile(r'^(\d{4})(\d{2})(\d{2})$'),          # YYYYMMDD (predict CLI)
+    re.compile(r'^(\d{4})-(\d{2})-(\d{2})(?:[T ].*)?$')  # ISO date or datetime
+)
+
+
+def normalise_date(value):
+    """'YYYY-MM-DD' for YYYYMMDD or ISO dates, None for anything else (e.g. "Unknown")"""
+    if not value:
+        return None
+    for pattern in _DATE_FORMATS:
+        match = pattern.match(str(value).strip())
+        if match:
+            return '-'.join(match.groups()[:3])
+    return None
+
+
+def footprint(georef):
+    """
+    Scene footprint from read_georeference output
+
+    Returns:
+        Dictionary with crs, bounds (west, south, east, north in that CRS) and
+        bounds_wgs84, or None when the bands are not georeferenced
+    """
+    if not georef or not georef.get('crs'):
+        return None
+    bounds = rasterio.transform.array_bounds(georef['height'], georef['width'], georef['transform'])
+    west, south, east, north = bounds
+    return {
+        'crs': georef['crs'].to_string(),
+        'bounds': [float(value) for value in (west, south, east, north)],
+        'bounds_wgs84': [float(value) for value in
+                         rasterio.warp.transform_bounds(georef['crs'], 'EPSG:4326', west, south, east, north)]
+    }
+
+
+def headline_stats(report):
+    """The few numbers worth showing in search results"""
+    model = report.get('model_predictions', {})
+    vegetation = report.get('vegetation_analysis', {})
+    urban = report.get('urban_analysis', {})
+    stats = {
+        'total_change_percent': model.get('total_change_percent'),
+        'vegetation_increase_percent': vegetation.get('vegetation_increase_percent'),
+        'vegetation_decrease_percent': vegetation.get('vegetation_decrease_percent'),
+        'construction_area_km2': urban.get('construction_area_km2'),
+        'valid_pixel_percent': report.get('data_quality', {}).get('valid_pixel_percent')
+    }
+    return {key: value for key, value in stats.items() if value is not None}
+
+
+class AnalysisIndex:
+    """Analyses by footprint (R-tree over WGS84 bounds), period and location"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: SQLite file (default: config.SPATIAL_INDEX_PATH)
+        """
+        self.path = path or config.SPATIAL_INDEX_PATH
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    id INTEGER PRIMARY KEY,
+                    analysis_id TEXT UNIQUE NOT NULL,
+                    location TEXT,
+                    date_before TEXT,
+                    date_after TEXT,
+                    created TEXT NOT NULL,
+                    result_folder TEXT,
+                    crs TEXT,
+                    bounds TEXT,
+                    stats TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_dates ON analyses (date_after, date_before)")
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS footprints
+                USING rtree(id, min_lon, max_lon, min_lat, max_lat)
+            """)
+
+    def _connect(self):
+        # A short-lived connection per call keeps this safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def add(self, analysis_id, report, result_folder=None, created=None):
+        """
+        Index (or re-index) an analysis from its report
+
+        Scenes without georeferencing are kept for date/location searches but
+        never match a bbox.
+        """
+        metadata = report.get('metadata', {})
+        scene = report.get('footprint')
+        row = (
+            analysis_id,
+            metadata.get('location'),
+            normalise_date(metadata.get('date_before')),
+            normalise_date(metadata.get('date_after')),
+            created or time.strftime('%Y-%m-%dT%H:%M:%S'),
+            result_folder,
+            scene['crs'] if scene else None,
+            json.dumps(scene['bounds']) if scene else None,
+            json.dumps(headline_stats(report))
+        )
+        with self._lock, self._connect() as conn:
+            old = conn.execute("SELECT id FROM analyses WHERE analysis_id = ?", (analysis_id,)).fetchone()
+            if old:
+                conn.execute("DELETE FROM footprints WHERE id = ?", old)
+                conn.execute("DELETE FROM analyses WHERE id = ?", old)
+            cursor = conn.execute(
+                "INSERT INTO analyses (analysis_id, location, date_before, date_after, created, "
+                "result_folder, crs, bounds, stats) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+            )
+            if scene:
+                west, south, east, north = scene['bounds_wgs84']
+                conn.execute("INSERT INTO footprints VALUES (?, ?, ?, ?, ?)",
+                             (cursor.lastrowid, west, east, south, north))
+
+    def search(self, bbox=None, start=None, end=None, location=None, limit=100):
+        """
+        Analyses matching every given filter, newest first
+
+        Args:
+            bbox: (min_lon, min_lat, max_lon, max_lat); footprints intersecting it match
+            start, end: Dates (YYYY-MM-DD or YYYYMMDD); analyses whose
+                        before..after period overlaps start..end match
+            location: Exact location name
+            limit: Maximum number of results
+
+        Returns:
+            List of dictionaries (analysis_id, location, dates, footprint, stats)
+        """
+        clauses, params = [], []
+        query = ("SELECT a.analysis_id, a.location, a.date_before, a.date_after, a.created, "
+                 "a.result_folder, a.crs, a.bounds, a.stats, f.min_lon, f.min_lat, f.max_lon, f.max_lat "
+                 "FROM analyses a ")
+        if bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = bbox
+            query += "JOIN footprints f ON f.id = a.id "
+            clauses.append("f.max_lon >= ? AND f.min_lon <= ? AND f.max_lat >= ? AND f.min_lat <= ?")
+            params += [min_lon, max_lon, min_lat, max_lat]
+        else:
+            query += "LEFT JOIN footprints f ON f.id = a.id "
+        start, end = normalise_date(start), normalise_date(end)
+        if start:
+            clauses.append("COALESCE(a.date_after, a.date_before) >= ?")
+            params.append(start)
+        if end:
+            clauses.append("COALESCE(a.date_before, a.date_after) <= ?")
+            params.append(end)
+        if location:
+            clauses.append("a.location = ?")
+            params.append(location)
+        if clauses:
+            query += "WHERE " + " AND ".join(clauses) + " "
+        query += "ORDER BY a.created DESC LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        results = []
+        for (analysis_id, location, date_before, date_after, created, result_folder,
+             crs, bounds, stats, min_lon, min_lat, max_lon, max_lat) in rows:
+            results.append({
+                'analysis_id': analysis_id,
+                'location': location,
+                'date_before': date_before,
+                'date_after': date_after,
+                'created': created,
+                'result_folder': result_folder,
+                'footprint': {
+                    'crs': crs,
+                    'bounds': json.loads(bounds),
+                    'bounds_wgs84': [min_lon, min_lat, max_lon, max_lat]
+                } if crs else None,
+                'stats': json.loads(stats)
+            })
+        return results
+
+    def count(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def rebuild(self, upload_dir):
+        """
+        Index every finished analysis saved under the API upload folder
+
+        Returns:
+            Number of analyses indexed
+        """
+        indexed = 0
+        for entry in sorted(os.listdir(upload_dir)):
+            response_path = os.path.join(upload_dir, entry, 'response.json')
+            if not os.path.exists(response_path):
+                continue
+            with open(response_path) as f:
+                response = json.load(f)
+            if response.get('status') != 'success':
+                continue
+            created = response['data'].get('metadata', {}).get('analysis_date', '').replace(' ', 'T') or None
+            self.add(response['analysis_id'], response['data'], response.get('result_folder'), created)
+            indexed += 1
+        return indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the spatial index of past analyses')
+    parser.add_argument('--uploads', default=os.path.join('backend', 'uploads'),
+                        help='API upload folder holding <analysis>/response.json')
+    parser.add_argument('--index', default=config.SPATIAL_INDEX_PATH, help='Index file')
+    args = parser.parse_args()
+
+    index = AnalysisIndex(args.index)
+    indexed = index.rebuild(args.uploads)
+    print(f"✅ Indexed {indexed} analyses into {args.index} ({index.count()} total)")
+
+
+if __name__ == '__main__':
+    main()
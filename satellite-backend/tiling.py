@@ -0,0 +1,122 @@
+"""Tile grid helpers for running the model on large scenes piece by piece"""
+
+import numpy as np
+
+
+def tile_windows(height, width, tile_size):
+    """
+    Split a scene into a grid of non-overlapping tiles
+    
+    Args:
+        height, width: Scene size in pixels
+        tile_size: Tile edge in pixels (edge tiles may be smaller)
+    
+    Returns:
+        List of (row_start, row_end, col_start, col_end) tuples in row-major order
+    """
+    return [
+        (y, min(y + tile_size, height), x, min(x + tile_size, width))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
+
+
+def context_window(window, height, width, overlap):
+    """
+    Grow a tile window by overlap pixels of context on each side, clipped to
+    the scene (see TileBlender)
+    
+    Returns:
+        (row_start, row_end, col_start, col_end) of the grown window
+    """
+    y0, y1, x0, x1 = window
+    return max(y0 - overlap, 0), min(y1 + overlap, height), max(x0 - overlap, 0), min(x1 + overlap, width)
+
+
+def blend_weights(window, grown, overlap):
+    """
+    (h, w) weights of a grown tile's predictions: 1 well inside the window,
+    falling linearly to 0 at overlap / 2 pixels outside it, so the weights of
+    neighbouring tiles sum to 1 across their shared border
+    """
+    def ramp(start, end, grown_start, grown_end):
+        centers = np.arange(grown_start, grown_end) + 0.5
+        outside = np.maximum(start - centers, centers - end)  # negative inside the window
+        if not overlap:
+            return (outside < 0).astype(np.float32)
+        return np.clip(0.5 - outside / overlap, 0, 1).astype(np.float32)
+    
+    y0, y1, x0, x1 = window
+    gy0, gy1, gx0, gx1 = grown
+    return np.outer(ramp(y0, y1, gy0, gy1), ramp(x0, x1, gx0, gx1))
+
+
+class TileBlender:
+    """
+    Stitches predictions of overlapping tiles into full-scene maps
+    
+    Predictions near a tile's border see less of the scene than in a
+    whole-scene pass, which shows as seams. Each tile is inferred with
+    overlap pixels of context (context_window) and its predictions are
+    averaged with its neighbours' using blend_weights. Only the windows of
+    added tiles are written, so maps elsewhere (e.g. skipped tiles) keep
+    their values.
+    """
+    
+    def __init__(self, outputs, overlap):
+        """
+        Args:
+            outputs: {task: (C, H, W) map}, filled in place by finish()
+            overlap: Context margin in pixels
+        """
+        self.outputs = outputs
+        self.overlap = overlap
+        self._sums = {task: np.zeros_like(out) for task, out in outputs.items()}
+        _, height, width = next(iter(outputs.values())).shape
+        self._weights = np.zeros((height, width), dtype=np.float32)
+        self._windows = []
+    
+    def add(self, window, grown, predictions):
+        """
+        Args:
+            window: Tile window from tile_windows
+            grown: context_window of it
+            predictions: {task: (C, h, w) map} over the grown window
+        """
+        gy0, gy1, gx0, gx1 = grown
+        weights = blend_weights(window, grown, self.overlap)
+        for task, prediction in predictions.items():
+            self._sums[task][:, gy0:gy1, gx0:gx1] += prediction * weights
+        self._weights[gy0:gy1, gx0:gx1] += weights
+        self._windows.append(window)
+    
+    def finish(self):
+        """Write the blended predictions into the added windows and return outputs"""
+        for y0, y1, x0, x1 in self._windows:
+            weights = self._weights[y0:y1, x0:x1]
+            for task, out in self.outputs.items():
+                out[:, y0:y1, x0:x1] = self._sums[task][:, y0:y1, x0:x1] / weights
+        return self.outputs
+
+
+def pad_tile(tile, tile_size):
+    """Pad a (C, h, w) tile to (C, tile_size, tile_size) by repeating edge pixels"""
+    _, h, w = tile.shape
+    if h == tile_size and w == tile_size:
+        return tile
+    return np.pad(tile, ((0, 0), (0, tile_size - h), (0, tile_size - w)), mode='edge')
+
+
+def tile_max(values, tile_size):
+    """
+    Maximum of a (H, W) map within each tile
+    
+    Returns:
+        1-D array in the same row-major order as tile_windows
+    """
+    height, width = values.shape
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+    padded = np.full((rows * tile_size, cols * tile_size), -np.inf, dtype=np.float32)
+    padded[:height, :width] = values
+    return padded.reshape(rows, tile_size, cols, tile_size).max(axis=(1, 3)).ravel()
@@ -0,0 +1,76 @@
+"""Test-time augmentation with flip/rot90 variants evaluated in a single batch"""
+
+import torch
+
+
+def _flip(dims):
+    return lambda x: torch.flip(x, dims=dims)
+
+
+def _rot90(k):
+    return lambda x: torch.rot90(x, k, dims=(-2, -1))
+
+
+def tta_transforms(square=True):
+    """
+    (forward, inverse) pairs of the dihedral variants used for TTA
+    
+    Rotations by 90/270 degrees change the shape of non-square inputs,
+    so only flips are used for those.
+    """
+    identity = lambda x: x
+    transforms = [
+        (identity, identity),
+        (_flip([-1]), _flip([-1])),
+        (_flip([-2]), _flip([-2])),
+        (_flip([-2, -1]), _flip([-2, -1])),
+    ]
+    if square:
+        transforms += [
+            (_rot90(1), _rot90(-1)),
+            (_rot90(-1), _rot90(1)),
+            (lambda x: torch.rot90(torch.flip(x, dims=[-1]), 1, dims=(-2, -1)),
+             lambda x: torch.flip(torch.rot90(x, -1, dims=(-2, -1)), dims=[-1])),
+            (lambda x: torch.rot90(torch.flip(x, dims=[-1]), -1, dims=(-2, -1)),
+             lambda x: torch.flip(torch.rot90(x, 1, dims=(-2, -1)), dims=[-1])),
+        ]
+    return transforms
+
+
+def batched_tta(model, img1, img2, tasks=None):
+    """
+    Average model outputs over all TTA variants using one forward pass
+    
+    The variants of every input in the batch are stacked into a single batch
+    of len(transforms) * B, then each output is inverse-transformed and averaged.
+    """
+    transforms = tta_transforms(square=img1.shape[-2] == img1.shape[-1])
+    batch_size = img1.shape[0]
+    
+    with torch.no_grad():
+        outputs = model(
+            torch.cat([forward(img1) for forward, _ in transforms]),
+            torch.cat([forward(img2) for forward, _ in transforms]),
+            tasks=tasks
+        )
+    
+    return {
+        task: torch.stack([
+            inverse(chunk) for (_, inverse), chunk in zip(transforms, out.split(batch_size))
+        ]).mean(dim=0)
+        for task, out in outputs.items()
+    }
+
+
+def looped_tta(model, img1, img2, tasks=None):
+    """Same result as batched_tta with one forward pass per variant (for comparison)"""
+    transforms = tta_transforms(square=img1.shape[-2] == img1.shape[-1])
+    totals = {}
+    
+    with torch.no_grad():
+        for forward, inverse in transforms:
+            outputs = model(forward(img1), forward(img2), tasks=tasks)
+            for task, out in outputs.items():
+                totals[task] = totals.get(task, 0) + inverse(out)
+    
+    return {task: total / len(transforms) for task, total in totals.items()}
@@ -0,0 +1,162 @@
+"""
+Host autotuner for CPU inference
+Sweeps intra-op threads, inter-op threads, worker processes and tile/batch size
+with synthetic 13-band scenes and writes the fastest configuration that meets
+the latency SLO to the host profile (config.HOST_PROFILE_PATH).
+
+Usage:
+    python tune.py --model models/best_model.pth --scene-size 1024 --slo-ms 10000
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch.multiprocessing as mp
+
+import config
+from host_profile import configure_torch_threads, save_host_profile
+
+
+def _power_of_two_steps(limit):
+    """1, 2, 4, ... up to limit, always including limit itself"""
+    steps = []
+    n = 1
+    while n < limit:
+        steps.append(n)
+        n *= 2
+    steps.append(limit)
+    return steps
+
+
+def _trial_worker(model_path, before, after, scenes, trial, output_root, result_queue):
+    """Run `scenes` predictions with one trial's settings in a fresh process"""
+    # Thread pools can only be configured once per process, hence one process per trial
+    sys.stdout = open(os.devnull, 'w')
+    configure_torch_threads(trial['intra_op_threads'], trial['interop_threads'])
+
+    from model import ChangeDetectionModel
+    from predict import ChangeDetectionPredictor
+
+    model = None
+    if not model_path:
+        model = ChangeDetectionModel(in_channels=13)
+    predictor = ChangeDetectionPredictor(model_path, model=model,
+                                         tile_size=trial['tile_size'],
+                                         batch_size=trial['batch_size'])
+    predictor.llm_explainer = None
+
+    def run(i):
+        predictor.predict(before, after, location='tune',
+                          output_dir=os.path.join(output_root, f"{os.getpid()}_{i}"))
+
+    run('warmup')
+    latencies = []
+    start = time.time()
+    for i in range(scenes):
+        t0 = time.perf_counter()
+        run(i)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    result_queue.put((start, time.time(), latencies))
+
+
+def run_trial(model_path, before, after, scenes, trial, output_root):
+    """Measure throughput and latency of one configuration with `workers` concurrent processes"""
+    ctx = mp.get_context('spawn')
+    result_queue = ctx.Queue()
+    processes = [
+        ctx.Process(target=_trial_worker,
+                    args=(model_path, before, after, scenes, trial, output_root, result_queue))
+        for _ in range(trial['workers'])
+    ]
+    for process in processes:
+        process.start()
+    results = [result_queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = [latency for _, _, worker_latencies in results for latency in worker_latencies]
+    wall_time = max(end for _, end, _ in results) - min(start for start, _, _ in results)
+    return {
+        **trial,
+        'scenes_per_second': len(latencies) / wall_time,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95))
+    }
+
+
+def candidate_trials(cpu_count, tile_sizes, batch_sizes, max_workers=None):
+    """All thread/worker/tile combinations that do not oversubscribe the cores"""
+    trials = []
+    for workers, intra in itertools.product(_power_of_two_steps(max_workers or cpu_count),
+                                            _power_of_two_steps(cpu_count)):
+        if workers * intra > cpu_count:
+            continue
+        for interop in (1, 2):
+            for tile_size in tile_sizes:
+                for batch_size in (batch_sizes if tile_size else [1]):
+                    trials.append({
+                        'intra_op_threads': intra,
+                        'interop_threads': interop,
+                        'workers': workers,
+                        'tile_size': tile_size,
+                        'batch_size': batch_size
+                    })
+    return trials
+
+
+def select_best(results, slo_ms):
+    """Highest throughput within the p95 latency SLO (lowest p95 if nothing meets it)"""
+    within_slo = [r for r in results if r['p95_ms'] <= slo_ms]
+    if within_slo:
+        return max(within_slo, key=lambda r: r['scenes_per_second'])
+    print(f"⚠️  No configuration meets the {slo_ms:.0f} ms SLO, using the lowest-latency one")
+    return min(results, key=lambda r: r['p95_ms'])
+
+
+def main():
+    from benchmarks.common import synthetic_pair, write_band_folder
+
+    parser = argparse.ArgumentParser(description='Tune threads, workers and tiling for this host')
+    parser.add_argument('--model', default=None, help='Path to trained model (random weights otherwise)')
+    parser.add_argument('--scene-size', type=int, default=1024, help='Synthetic scene size in pixels')
+    parser.add_argument('--scenes', type=int, default=3, help='Measured scenes per worker and trial')
+    parser.add_argument('--slo-ms', type=float, default=30000, help='p95 latency budget per scene')
+    parser.add_argument('--tile-sizes', type=int, nargs='+', default=[0, 256, 512],
+                        help='Tile sizes to try (0 = whole scene)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--output', default=config.HOST_PROFILE_PATH, help='Profile file to write')
+    args = parser.parse_args()
+
+    trials = candidate_trials(os.cpu_count() or 1, args.tile_sizes, args.batch_sizes, args.max_workers)
+    print(f"🔧 Tuning {len(trials)} configurations on {os.cpu_count()} CPUs "
+          f"({args.scene_size}x{args.scene_size} scenes)")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bands1, bands2 = synthetic_pair(args.scene_size)
+        before = write_band_folder(bands1, os.path.join(tmp_dir, 'before'))
+        after = write_band_folder(bands2, os.path.join(tmp_dir, 'after'))
+
+        for i, trial in enumerate(trials, 1):
+            result = run_trial(args.model, before, after, args.scenes, trial,
+                               os.path.join(tmp_dir, 'results'))
+            results.append(result)
+            print(f"[{i}/{len(trials)}] workers={trial['workers']} intra={trial['intra_op_threads']} "
+                  f"interop={trial['interop_threads']} tile={trial['tile_size']} "
+                  f"batch={trial['batch_size']}: {result['scenes_per_second']:.3f} scenes/s, "
+                  f"p95 {result['p95_ms']:.0f} ms")
+
+    best = select_best(results, args.slo_ms)
+    path = save_host_profile(best, results, args.slo_ms, args.output)
+    print(f"\n✅ Best: {best}")
+    print(f"Profile written to {path} (applied at API startup)")
+
+
+if __name__ == '__main__':
+    main()
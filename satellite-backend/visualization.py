@@ -1,11 +1,16 @@
 """Visualization utilities for change detection results"""
 
+import threading
+
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib.gridspec import GridSpec
 import cv2
 
+# pyplot keeps global figure state, so figures are drawn one at a time
+_PYPLOT_LOCK = threading.Lock()
+
 class ChangeVisualizer:
     def __init__(self):
         self.colors = {
@@ -44,7 +49,18 @@ class ChangeVisualizer:
     
     def create_change_visualization(self, bands1, bands2, change_map, 
                                    vegetation_map, urban_map, output_path):
-        """Create comprehensive visualization of all changes"""
+        """Create comprehensive visualization of all changes
+        
+        Any of change_map, vegetation_map and urban_map may be None when the
+        corresponding model head was not run; its panels are then skipped.
+        Safe to call from several threads.
+        """
+        with _PYPLOT_LOCK:
+            return self._draw_change_visualization(bands1, bands2, change_map,
+                                                   vegetation_map, urban_map, output_path)
+    
+    def _draw_change_visualization(self, bands1, bands2, change_map,
+                                   vegetation_map, urban_map, output_path):
         fig = plt.figure(figsize=(20, 12))
         gs = GridSpec(3, 4, figure=fig, hspace=0.3, wspace=0.3)
         
@@ -77,44 +93,48 @@ class ChangeVisualizer:
         ax4.set_title('After (False Color)', fontsize=12, fontweight='bold')
         ax4.axis('off')
         
-        # Row 2: Change detection
-        ax5 = fig.add_subplot(gs[1, 0])
-        im1 = ax5.imshow(change_map, cmap='hot', vmin=0, vmax=1)
-        ax5.set_title('Overall Change Detection', fontsize=12, fontweight='bold')
-        ax5.axis('off')
-        plt.colorbar(im1, ax=ax5, fraction=0.046)
+        # Row 2: Change detection (panels for skipped model heads are left empty)
+        if change_map is not None:
+            ax5 = fig.add_subplot(gs[1, 0])
+            im1 = ax5.imshow(change_map, cmap='hot', vmin=0, vmax=1)
+            ax5.set_title('Overall Change Detection', fontsize=12, fontweight='bold')
+            ax5.axis('off')
+            plt.colorbar(im1, ax=ax5, fraction=0.046)
         
         # Vegetation change
-        ax6 = fig.add_subplot(gs[1, 1])
-        veg_class = np.argmax(vegetation_map, axis=0)
-        veg_colored = np.zeros((*veg_class.shape, 3))
-        veg_colored[veg_class == 0] = self.colors['no_change']
-        veg_colored[veg_class == 1] = self.colors['vegetation_increase']
-        veg_colored[veg_class == 2] = self.colors['vegetation_decrease']
-        ax6.imshow(veg_colored)
-        ax6.set_title('Vegetation Changes', fontsize=12, fontweight='bold')
-        ax6.axis('off')
+        if vegetation_map is not None:
+            ax6 = fig.add_subplot(gs[1, 1])
+            veg_class = np.argmax(vegetation_map, axis=0)
+            veg_colored = np.zeros((*veg_class.shape, 3))
+            veg_colored[veg_class == 0] = self.colors['no_change']
+            veg_colored[veg_class == 1] = self.colors['vegetation_increase']
+            veg_colored[veg_class == 2] = self.colors['vegetation_decrease']
+            ax6.imshow(veg_colored)
+            ax6.set_title('Vegetation Changes', fontsize=12, fontweight='bold')
+            ax6.axis('off')
         
         # Urban change
-        ax7 = fig.add_subplot(gs[1, 2])
-        urban_class = np.argmax(urban_map, axis=0)
-        urban_colored = np.zeros((*urban_class.shape, 3))
-        urban_colored[urban_class == 0] = self.colors['no_change']
-        urban_colored[urban_class == 1] = self.colors['urban_construction']
-        urban_colored[urban_class == 2] = self.colors['urban_demolition']
-        ax7.imshow(urban_colored)
-        ax7.set_title('Urban Changes', fontsize=12, fontweight='bold')
-        ax7.axis('off')
+        if urban_map is not None:
+            ax7 = fig.add_subplot(gs[1, 2])
+            urban_class = np.argmax(urban_map, axis=0)
+            urban_colored = np.zeros((*urban_class.shape, 3))
+            urban_colored[urban_class == 0] = self.colors['no_change']
+            urban_colored[urban_class == 1] = self.colors['urban_construction']
+            urban_colored[urban_class == 2] = self.colors['urban_demolition']
+            ax7.imshow(urban_colored)
+            ax7.set_title('Urban Changes', fontsize=12, fontweight='bold')
+            ax7.axis('off')
         
         # Combined overlay
-        ax8 = fig.add_subplot(gs[1, 3])
-        overlay = rgb2.copy().astype(np.float32)
-        change_overlay = self.create_change_overlay(change_map).astype(np.float32)
-        combined = cv2.addWeighted(overlay, 0.6, change_overlay, 0.4, 0)
-        combined = np.clip(combined, 0, 1)
-        ax8.imshow(combined)
-        ax8.set_title('Change Overlay', fontsize=12, fontweight='bold')
-        ax8.axis('off')
+        if change_map is not None:
+            ax8 = fig.add_subplot(gs[1, 3])
+            overlay = rgb2.copy().astype(np.float32)
+            change_overlay = self.create_change_overlay(change_map).astype(np.float32)
+            combined = cv2.addWeighted(overlay, 0.6, change_overlay, 0.4, 0)
+            combined = np.clip(combined, 0, 1)
+            ax8.imshow(combined)
+            ax8.set_title('Change Overlay', fontsize=12, fontweight='bold')
+            ax8.axis('off')
         
         # Row 3: Indices
         # NDVI comparison
@@ -0,0 +1,292 @@
+"""
+Multi-process CPU inference worker pool
+Worker processes share a single copy of the model weights through shared memory
+"""
+
+import os
+import time
+import queue
+import threading
+import itertools
+import concurrent.futures
+
+import torch.multiprocessing as mp
+
+import config
+from host_profile import configure_torch_threads
+from model_registry import load_model, warm_up
+
+# Seconds between checks for workers that died (OOM kill, segfault)
+WATCHDOG_INTERVAL = 1.0
+
+
+class WorkerPoolClosed(RuntimeError):
+    """submit() on a pool that was shut down or lost all its workers"""
+
+
+def _worker_main(model, job_queue, result_queue, num_threads, interop_threads, predictor_options):
+    """Worker loop: run predictions with the shared model until a None job arrives"""
+    # Pin intra-op threads so N workers don't oversubscribe the cores
+    configure_torch_threads(num_threads, interop_threads)
+
+    from predict import ChangeDetectionPredictor
+    predictor = ChangeDetectionPredictor(None, model=model, **predictor_options)
+    warm_up(predictor.model)
+    result_queue.put((None, 'ready', os.getpid()))
+
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+
+        job_id, kwargs, wants_progress = job
+        # Tells the pool whose job to fail if this process dies
+        result_queue.put((job_id, 'started', os.getpid()))
+        progress = None
+        if wants_progress:
+            def progress(event, data, job_id=job_id):
+                result_queue.put((job_id, 'progress', (event, data)))
+        try:
+            result_queue.put((job_id, 'result', predictor.predict(progress=progress, **kwargs)))
+        except Exception as e:
+            result_queue.put((job_id, 'error', f"{type(e).__name__}: {e}"))
+
+
+def _proc_memory(pid):
+    """Resident memory breakdown (MB) of a process from /proc (Linux only)"""
+    fields = {'VmRSS': 'rss_mb', 'RssAnon': 'private_mb', 'RssShmem': 'shared_mb'}
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                key = line.split(':', 1)[0]
+                if key in fields:
+                    usage[fields[key]] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return usage
+
+
+class InferenceWorkerPool:
+    """Dispatches predict() jobs to CPU worker processes sharing one set of weights"""
+
+    def __init__(self, model_path, num_workers=None, threads_per_worker=None, start_method=None,
+                 model_info=None):
+        """
+        Args:
+            model_path: Path to trained model checkpoint
+            num_workers: Number of worker processes (default: config.INFERENCE_WORKERS)
+            threads_per_worker: Intra-op threads per worker (default: config.INFERENCE_THREADS_PER_WORKER,
+                                then config.INTRA_OP_THREADS, then cores / workers)
+            start_method: multiprocessing start method (default: config.WORKER_START_METHOD)
+            model_info: Version of the weights, recorded in every report
+        """
+        self.num_workers = num_workers or config.INFERENCE_WORKERS or 1
+        self.threads_per_worker = (threads_per_worker or config.INFERENCE_THREADS_PER_WORKER
+                                   or config.INTRA_OP_THREADS
+                                   or max(1, (os.cpu_count() or 1) // self.num_workers))
+        start_method = start_method or config.WORKER_START_METHOD
+
+        # Load once on CPU and move parameters/buffers into shared memory;
+        # workers receive handles to the same pages instead of copies
+        model = load_model(model_path)
+        model.share_memory()
+
+        # One fd per storage would exceed the fd limit of the forkserver
+        # handshake, so share by shm file name instead
+        mp.set_sharing_strategy('file_system')
+        ctx = mp.get_context(start_method)
+        self._ctx = ctx
+        self._jobs = ctx.Queue()
+        self._results = ctx.Queue()
+        self._pending = {}
+        self._progress = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._ready = set()
+        self._running = {}
+        self._closed = False
+        self._all_ready = threading.Event()
+        self._next_check = 0.0
+
+        # Workers re-import config, so pass the settings resolved in this process
+        predictor_options = {
+            'tile_size': config.INFERENCE_TILE_SIZE,
+            'batch_size': config.INFERENCE_BATCH_SIZE,
+            'model_info': model_info
+        }
+
+        self._worker_args = (model, self._jobs, self._results, self.threads_per_worker,
+                             config.INTEROP_THREADS, predictor_options)
+        self._processes = [self._start_worker() for _ in range(self.num_workers)]
+
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+        print(f"✓ Inference worker pool started ({self.num_workers} workers × "
+              f"{self.threads_per_worker} threads, {start_method})")
+
+    def _start_worker(self):
+        process = self._ctx.Process(target=_worker_main, args=self._worker_args, daemon=True)
+        process.start()
+        return process
+
+    def _collect_results(self):
+        """Resolve futures as workers report back, and watch for workers that died"""
+        while True:
+            try:
+                message = self._results.get(timeout=WATCHDOG_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                break
+            if message:
+                self._handle(*message)
+            if time.monotonic() >= self._next_check:
+                self._check_workers()
+
+    def _handle(self, job_id, kind, payload):
+        if kind == 'ready':
+            self._ready.add(payload)
+            if len(self._ready) >= self.num_workers:
+                self._all_ready.set()
+            return
+        if kind == 'started':
+            self._running[payload] = job_id
+            return
+        if kind == 'progress':
+            with self._lock:
+                callback = self._progress.get(job_id)
+            if callback is not None:
+                callback(*payload)
+            return
+        self._running = {pid: running for pid, running in self._running.items() if running != job_id}
+        with self._lock:
+            future = self._pending.pop(job_id, None)
+            self._progress.pop(job_id, None)
+        if future is None:
+            return
+        if kind == 'result':
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        """
+        Fail the job of every worker that exited unexpectedly and start a
+        replacement; workers that die before they are ready (e.g. a broken
+        checkpoint) are not replaced, and once none is left the pool is closed
+        and its pending jobs fail
+        """
+        self._next_check = time.monotonic() + WATCHDOG_INTERVAL
+        if self._closed or all(process.exitcode is None for process in self._processes):
+            return
+        # Results the dead workers sent before exiting still count
+        while True:
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if message is None:
+                self._results.put(None)
+                return
+            self._handle(*message)
+
+        with self._lock:
+            if self._closed:
+                return
+            for slot, process in enumerate(self._processes):
+                if process.exitcode is None:
+                    continue
+                error = f"Inference worker {process.pid} exited with code {process.exitcode}"
+                print(f"⚠️  {error}")
+                job_id = self._running.pop(process.pid, None)
+                future = self._pending.pop(job_id, None)
+                self._progress.pop(job_id, None)
+                if future is not None:
+                    future.set_exception(RuntimeError(error))
+                if process.pid in self._ready:
+                    self._ready.discard(process.pid)
+                    self._processes[slot] = self._start_worker()
+            self._processes = [process for process in self._processes if process.exitcode is None]
+            if not self._processes:
+                print("❌ No inference workers left")
+                self._closed = True
+                for future in self._pending.values():
+                    future.set_exception(RuntimeError("No inference workers left"))
+                self._pending.clear()
+                self._progress.clear()
+                self._all_ready.set()
+
+    @property
+    def alive_workers(self):
+        """Worker processes currently running"""
+        return sum(process.is_alive() for process in self._processes)
+
+    def submit(self, progress=None, **kwargs):
+        """
+        Queue a ChangeDetectionPredictor.predict call
+
+        Args:
+            progress: Optional callback(event, data) for the predict progress events,
+                      called from the result collector thread
+
+        Returns:
+            concurrent.futures.Future resolving to the report
+
+        Raises:
+            WorkerPoolClosed: shutdown() has been called
+        """
+        future = concurrent.futures.Future()
+        job_id = next(self._ids)
+        with self._lock:
+            # Queued under the lock, so every accepted job is ahead of the stop sentinels
+            if self._closed:
+                raise WorkerPoolClosed("Worker pool is closed")
+            self._pending[job_id] = future
+            if progress is not None:
+                self._progress[job_id] = progress
+            self._jobs.put((job_id, kwargs, progress is not None))
+        return future
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until every worker has loaded and warmed up the model; False on
+        timeout or when the workers died instead
+        """
+        return self._all_ready.wait(timeout) and not self._closed
+
+    @property
+    def queue_depth(self):
+        """Jobs submitted but not yet finished"""
+        with self._lock:
+            return len(self._pending)
+
+    def memory_usage(self):
+        """Per-worker RSS split into private and shared memory (MB)"""
+        return {p.pid: _proc_memory(p.pid) for p in self._processes}
+
+    def shutdown(self, timeout=10):
+        """
+        Stop all workers once the jobs queued before this call are done
+
+        Args:
+            timeout: Seconds to wait for each worker before terminating it,
+                     None to wait until the queue has drained
+        """
+        with self._lock:
+            self._closed = True
+            processes = list(self._processes)
+            for _ in processes:
+                self._jobs.put(None)
+        for process in processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        self._collector.join(timeout)
+
+        with self._lock:
+            for future in self._pending.values():
+                future.set_exception(RuntimeError("Worker pool shut down"))
+            self._pending.clear()
+            self._progress.clear()
@@ -39,16 +39,19 @@ router.post('/analyze', upload.fields([
       }
     }
     
-    // Add metadata
-    if (req.body.location) formData.append('location', req.body.location);
-    if (req.body.date_before) formData.append('date_before', req.body.date_before);
-    if (req.body.date_after) formData.append('date_after', req.body.date_after);
-
-    // Forward to satellite analysis backend
+    // Forward to satellite analysis backend; metadata goes in the query string,
+    // where the backend declares it (multipart fields are ignored)
     const response = await axios.post(`${SATELLITE_API_URL}/api/analyze`, formData, {
       headers: {
         ...formData.getHeaders()
       },
+      params: {
+        location: req.body.location,
+        date_before: req.body.date_before,
+        date_after: req.body.date_after,
+        roi: req.body.roi,
+        band_order: req.body.band_order
+      },
       timeout: 180000, // 3 minutes
       maxContentLength: Infinity,
       maxBodyLength: Infinity
@@ -57,6 +60,9 @@ router.post('/analyze', upload.fields([
     res.json(response.data);
   } catch (error) {
     console.error('Satellite analysis error:', error);
+    // Backend is at capacity (429/503): pass on when to retry
+    const retryAfter = error.response?.headers?.['retry-after'];
+    if (retryAfter) res.setHeader('Retry-After', retryAfter);
     res.status(error.response?.status || 500).json({
       error: 'Satellite analysis failed',
       detail: error.response?.data?.detail || error.message
@@ -64,6 +70,55 @@ router.post('/analyze', upload.fields([
   }
 });
 
+// Streaming variant: forwards the backend's Server-Sent Events as they arrive
+router.post('/analyze/stream', upload.fields([
+  { name: 'before_images', maxCount: 13 },
+  { name: 'after_images', maxCount: 13 }
+]), async (req, res) => {
+  try {
+    const formData = new FormData();
+    for (const field of ['before_images', 'after_images']) {
+      (req.files?.[field] || []).forEach(file => {
+        formData.append(field, file.buffer, {
+          filename: file.originalname,
+          contentType: file.mimetype
+        });
+      });
+    }
+
+    const response = await axios.post(`${SATELLITE_API_URL}/api/analyze/stream`, formData, {
+      headers: {
+        ...formData.getHeaders()
+      },
+      params: {
+        location: req.body.location,
+        date_before: req.body.date_before,
+        date_after: req.body.date_after,
+        roi: req.body.roi,
+        band_order: req.body.band_order
+      },
+      responseType: 'stream',
+      timeout: 0,
+      maxContentLength: Infinity,
+      maxBodyLength: Infinity
+    });
+
+    res.setHeader('Content-Type', 'text/event-stream');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('Connection', 'keep-alive');
+    res.flushHeaders();
+    response.data.pipe(res);
+  } catch (error) {
+    console.error('Satellite analysis stream error:', error);
+    const retryAfter = error.response?.headers?.['retry-after'];
+    if (retryAfter) res.setHeader('Retry-After', retryAfter);
+    res.status(error.response?.status || 500).json({
+      error: 'Satellite analysis failed',
+      detail: error.message
+    });
+  }
+});
+
 // Proxy route for getting results
 router.get('/results/:analysis_id', async (req, res) => {
   try {
@@ -80,6 +135,47 @@ router.get('/results/:analysis_id', async (req, res) => {
   }
 });
 
+// Proxy route for the LLM explanation (generated after the analysis returns)
+router.get('/results/:analysis_id/explanation', async (req, res) => {
+  try {
+    const response = await axios.get(
+      `${SATELLITE_API_URL}/api/results/${req.params.analysis_id}/explanation`,
+      { params: { wait: req.query.wait }, timeout: 60000 }
+    );
+    res.status(response.status).json(response.data);
+  } catch (error) {
+    console.error('Get explanation error:', error);
+    res.status(error.response?.status || 500).json({
+      error: 'Failed to get explanation',
+      detail: error.response?.data?.detail || error.message
+    });
+  }
+});
+
+// Proxy route for change products (COGs); forwards Range so clients fetch only the tiles they need
+router.get('/results/:analysis_id/products/:name', async (req, res) => {
+  try {
+    const response = await axios.get(
+      `${SATELLITE_API_URL}/api/results/${req.params.analysis_id}/products/${req.params.name}`,
+      {
+        headers: req.headers.range ? { Range: req.headers.range } : {},
+        responseType: 'stream'
+      }
+    );
+    res.status(response.status);
+    for (const header of ['content-type', 'content-length', 'content-range', 'accept-ranges', 'content-disposition']) {
+      if (response.headers[header]) res.setHeader(header, response.headers[header]);
+    }
+    response.data.pipe(res);
+  } catch (error) {
+    console.error('Get product error:', error);
+    res.status(error.response?.status || 500).json({
+      error: 'Failed to get product',
+      detail: error.message
+    });
+  }
+});
+
 // Proxy route for getting visualization image
 router.get('/results/:analysis_id/image', async (req, res) => {
   try {